@@ -1,3 +1,8 @@
+# Apply eventlet monkey patch; it has to run before anything imports ssl, socket or threading,
+# or clients created later (boto3 for the S3 storage backend) recurse inside the patched ssl module
+import eventlet
+eventlet.monkey_patch()
+
 from flask import Flask 
 from .extensions import db, socketio  # Re-add socketio import
 from pathlib import Path
@@ -6,15 +11,11 @@ from flask import g
 from flask_wtf.csrf import CSRFProtect
 import jinja2.filters
 import markupsafe
-import eventlet
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
-# Apply eventlet monkey patch
-eventlet.monkey_patch()
-
 login_manager = LoginManager() 
 
 def create_app():
@@ -32,12 +33,21 @@ def create_app():
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # max file size 16MB
 
     db.init_app(app)
+
+    # Audit/activity logs are written in batches by a background writer
+    from app.audit import audit_sink
+    audit_sink.init_app(app)
     # Initialize socketio with app and ensure proper configuration for WebRTC
     socketio.init_app(app, 
                      async_mode='eventlet',
                      cors_allowed_origins="*",
                      ping_timeout=60,
-                     ping_interval=25)
+                     ping_interval=25,
+                     http_compression=False)  # polling payloads go through CompressionMiddleware
+
+    # Compress HTML/JSON responses; wraps the Socket.IO middleware so long-polling is covered too
+    from app.compression import init_compression
+    init_compression(app)
     login_manager.init_app(app)
     csrf = CSRFProtect(app)
     login_manager.login_view = 'auth.login' 
@@ -50,6 +60,17 @@ def create_app():
     
     app.jinja_env.filters['nl2br'] = nl2br
     
+    # srcset/URL helpers for the resized image derivatives
+    from .images import init_images
+    init_images(app)
+
+    from .media import init_media
+    init_media(app)
+
+    # Fingerprinted static bundles (`flask assets build`) and the asset_url() helper
+    from .assets import init_assets
+    init_assets(app)
+    
     from .auth.routes import auth_bp
     from .main.routes import main_bp
     from .admin import admin_bp
@@ -73,12 +94,60 @@ def create_app():
         return dict(current_user=current_user)
     
     with app.app_context():
+        # `flask schema setup` brings an existing database up to the models
+        from app.schema import init_schema
+        init_schema(app)
+        
         # Initialize websocket handlers
         from app.websockets import init_websockets
         init_websockets()
+
+        # Quality samples of calls that were never ended are flushed once they go quiet
+        from app.websockets.quality import quality_aggregator
+        quality_aggregator.init_app(app)
+        
+        # Initialize the background job queue
+        from app.jobs import init_jobs
+        init_jobs(app)
+        
+        # Background exports are written to EXPORT_FOLDER and kept for EXPORT_TTL_SECONDS
+        from app.exports import init_exports
+        init_exports(app)
+        
+        # Where uploads are kept: the local static folder or an S3-compatible bucket
+        from app.storage import init_storage
+        init_storage(app)
+        
+        # Chunked attachment uploads: size limit, suggested chunk size and expiry of unfinished ones
+        from app.uploads import init_uploads
+        init_uploads(app)
+
+        # Session recordings that stop receiving chunks are closed after RECORDING_IDLE_SECONDS
+        from app.recordings import init_recordings
+        init_recordings(app)
+
+        from app.storage_usage import init_storage_usage
+        init_storage_usage(app)
+        
+        # Register the log partition and search maintenance commands
+        from app.partitions import init_partitions
+        init_partitions(app)
+        
+        from app.log_search import init_log_search
+        init_log_search(app)
+        
+        from app.log_timeline import init_log_timeline
+        init_log_timeline(app)
+
+        from app.auth_events import init_auth_events
+        init_auth_events(app)
+
+        # Change counters and the ETag/304 layer for the JSON polling endpoints
+        from app.versioning import init_versioning
+        init_versioning(app)
         
         # Initialize the video session scheduler
-        from app.office.routes.office_counseling import init_scheduler
+        from app.scheduler import init_scheduler
         init_scheduler(app)
     
     return app
\ No newline at end of file
@@ -9,6 +9,8 @@ import random
 import os
 from app.admin import admin_bp
 from app.admin.utils import save_profile_picture, delete_profile_picture
+from app.pagination import keyset_paginate
+from app.jobs.tasks import build_profile_pic_variants
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, validators
 from flask_wtf.file import FileField, FileAllowed
@@ -154,10 +156,12 @@ def update_profile_picture():
                 # Save the new profile picture
                 filename = save_profile_picture(form.profile_pic.data)
                 
-                # Delete old profile picture if exists
-                if current_user.profile_pic:
+                # Delete old profile picture if exists (re-uploading the same picture keeps its file)
+                if current_user.profile_pic and current_user.profile_pic != filename:
                     delete_profile_picture(current_user.profile_pic)
                 
+                if current_user.profile_pic != filename:
+                    current_user.profile_pic_variants = None
                 current_user.profile_pic = filename
                 
                 # Log the action
@@ -172,6 +176,8 @@ def update_profile_picture():
                 )
                 
                 db.session.commit()
+                if not current_user.profile_pic_variants:
+                    build_profile_pic_variants.delay(user_id=current_user.id, profile_pic=filename)
                 flash('Profile picture updated successfully.', 'success')
         except Exception as e:
             db.session.rollback()
@@ -196,6 +202,7 @@ def remove_profile_picture():
         
         # Update user record
         current_user.profile_pic = None
+        current_user.profile_pic_variants = None
         
         # Log the action
         SuperAdminActivityLog.log_action(
@@ -276,14 +283,15 @@ def login_history():
         flash('Permission denied.', 'error')
         return redirect(url_for('admin.dashboard'))
     
-    # Get login history for the current user
-    # This is a placeholder - implement based on your login tracking system
-    login_logs = AuditLog.query.filter(
-        AuditLog.actor_id == current_user.id,
-        AuditLog.action.in_(['Login', 'Logout'])
-    ).order_by(AuditLog.timestamp.desc()).limit(30).all()
+    # Login, failed login and logout entries for the current user, newest first
+    per_page = request.args.get('per_page', 20, type=int)
+    pagination = keyset_paginate(
+        AuditLog.authentication_events(current_user.id),
+        (AuditLog.timestamp, AuditLog.id),
+        per_page=min(max(per_page, 1), 100)
+    )
     
-    return render_template('admin/login_history.html', login_logs=login_logs)
+    return render_template('admin/login_history.html', login_logs=pagination.items, pagination=pagination)
 
 @admin_bp.route('/deactivate-account', methods=['POST'])
 @login_required
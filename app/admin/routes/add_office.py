@@ -75,7 +75,7 @@ def add_office():
         db.session.add(log)
         
         # Also add to general audit log
-        audit_log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Created Office",
             target_type="office",
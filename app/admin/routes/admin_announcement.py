@@ -6,9 +6,10 @@ from app.models import Announcement, Office, AuditLog, User, AnnouncementImage
 from datetime import datetime, timedelta
 from sqlalchemy import desc
 from app.admin import admin_bp
-import os
-from werkzeug.utils import secure_filename
-from uuid import uuid4
+from app.storage import store_upload, release_announcement_image
+from app.jobs.tasks import build_announcement_image_variants
+from app.media import media_url
+from app.versioning import versioned_json, current_versions, ANNOUNCEMENTS_SCOPE
 
 
 def allowed_file(filename):
@@ -18,22 +19,10 @@ def allowed_file(filename):
 
 
 def save_image(image_file):
-    """Save image file and return the path"""
+    """Store an announcement image and return its path below the static folder"""
     if image_file and allowed_file(image_file.filename):
-        filename = secure_filename(image_file.filename)
-        # Create unique filename to prevent overwriting
-        unique_filename = f"{uuid4().hex}_{filename}"
-        # Ensure directory exists
-        upload_folder = os.path.join('static', 'uploads', 'announcements')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Save the file
-        file_path = os.path.join(upload_folder, unique_filename)
-        image_file.save(file_path)
-        
-        # Return the relative path for database storage
-        relative_path = os.path.join('uploads', 'announcements', unique_filename)
-        return relative_path.replace(os.sep, '/')
+        # Content-addressed, so re-posting the same image reuses the stored file
+        return store_upload(image_file, 'announcements').path
     return None
 
 
@@ -133,6 +122,7 @@ def create_announcement():
         db.session.flush()  # Flush to get the announcement ID for image association
         
         # Handle image uploads
+        new_images = []
         if 'images[]' in request.files:
             image_files = request.files.getlist('images[]')
             captions = request.form.getlist('captions[]')
@@ -152,9 +142,10 @@ def create_announcement():
                             display_order=order
                         )
                         db.session.add(image)
+                        new_images.append(image)
         
         if current_user.role == 'super_admin':
-            log = AuditLog.log_action(
+            AuditLog.log_action(
                 actor=current_user,
                 action="Created Announcement",
                 target_type="announcement",
@@ -164,6 +155,9 @@ def create_announcement():
             )
         
         db.session.commit()
+        # Resized derivatives are built once the rows exist
+        for image in new_images:
+            build_announcement_image_variants.delay(image_id=image.id)
         flash('Announcement created successfully!', 'success')
         
     except Exception as e:
@@ -190,7 +184,7 @@ def get_announcement(announcement_id):
     images = AnnouncementImage.query.filter_by(announcement_id=announcement_id).all()
     images_data = [{
         'id': image.id,
-        'image_path': url_for('static', filename=image.image_path),
+        'image_path': media_url(image.image_path),
         'caption': image.caption,
         'display_order': image.display_order
     } for image in images]
@@ -248,6 +242,7 @@ def update_announcement():
             announcement.target_office_id = None
         
         # Handle new image uploads
+        new_images = []
         if 'new_images[]' in request.files:
             image_files = request.files.getlist('new_images[]')
             captions = request.form.getlist('new_captions[]')
@@ -267,6 +262,7 @@ def update_announcement():
                             display_order=order
                         )
                         db.session.add(image)
+                        new_images.append(image)
         
         # Handle updates to existing images (captions and display orders)
         existing_image_ids = request.form.getlist('existing_image_ids[]')
@@ -283,7 +279,7 @@ def update_announcement():
                         image.display_order = int(existing_display_orders[i])
         
         if current_user.role == 'super_admin':
-            log = AuditLog.log_action(
+            AuditLog.log_action(
                 actor=current_user,
                 action="Updated Announcement",
                 target_type="announcement",
@@ -293,6 +289,9 @@ def update_announcement():
             )
         
         db.session.commit()
+        # Resized derivatives are built once the rows exist
+        for image in new_images:
+            build_announcement_image_variants.delay(image_id=image.id)
         flash('Announcement updated successfully!', 'success')
         
     except Exception as e:
@@ -323,9 +322,7 @@ def delete_announcement():
         for image in images:
             # Optionally delete the physical file
             try:
-                file_path = os.path.join('app', 'static', image.image_path)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                release_announcement_image(image)
             except Exception as e:
                 # Log error but continue with database deletion
                 print(f"Error removing image file: {str(e)}")
@@ -333,7 +330,7 @@ def delete_announcement():
             db.session.delete(image)
         
         if current_user.role == 'super_admin':
-            log = AuditLog.log_action(
+            AuditLog.log_action(
                 actor=current_user,
                 action="Deleted Announcement",
                 target_type="announcement",
@@ -381,9 +378,7 @@ def delete_announcement_image():
         
         # Delete the physical file
         try:
-            file_path = os.path.join('app', 'static', image.image_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            release_announcement_image(image)
         except Exception as e:
             # Log error but continue with database deletion
             print(f"Error removing image file: {str(e)}")
@@ -403,6 +398,7 @@ def delete_announcement_image():
 
 @admin_bp.route('/api/announcements', methods=['GET'])
 @login_required
+@versioned_json(lambda: current_versions(ANNOUNCEMENTS_SCOPE))
 def get_announcements_api():
     """API endpoint to get announcements for a specific office or public announcements"""
     try:
@@ -438,7 +434,7 @@ def get_announcements_api():
                     'images': [
                         {
                             'id': img.id,
-                            'image_path': url_for('static', filename=img.image_path),
+                            'image_path': media_url(img.image_path),
                             'caption': img.caption,
                             'display_order': img.display_order
                         } for img in AnnouncementImage.query.filter_by(announcement_id=a.id).order_by(AnnouncementImage.display_order).all()
@@ -47,15 +47,12 @@ def view_admin_details(admin_id):
     inquiries = Inquiry.query.filter_by(office_id=office_admin.office_id).all()
     
     # Log super admin activity
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
+    SuperAdminActivityLog.log_action(
+        current_user,
         action=f"Viewed details for admin: {office_admin.user.get_full_name()}",
-        target_type='user',  # Added target_type field which is required in the model
-        target_user_id=office_admin.user_id,  # Added target user reference
-        timestamp=datetime.utcnow()
+        target_type='user',
+        target_user=office_admin.user
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template('admin/admin_detail.html', 
                           admin=office_admin,
@@ -1,29 +1,23 @@
 from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, SuperAdminActivityLog, OfficeLoginLog, AuditLog
-from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response
+from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from sqlalchemy import func, case, or_, desc
+from sqlalchemy.orm import contains_eager
 import random
 import os
 from app.admin import admin_bp
+from app.pagination import keyset_paginate
+from app.exports import EXPORT_BATCH_SIZE, XLSX_MIMETYPE, stream_csv, write_xlsx, write_pdf, send_export
 
-@admin_bp.route('/admin_inquiries')
-@login_required
-def all_inquiries():
-    """
-    View all inquiries across offices (Superadmin only)
-    This is a read-only view for monitoring purposes
-    """
-    office_id = request.args.get('office', type=int)
-    status = request.args.get('status')
-    date_range = request.args.get('date_range')
-    search_query = request.args.get('search')
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-
-    query = Inquiry.query.join(Student).join(User).join(Office)
+def filter_inquiries(query, args):
+    """Apply the inquiry list filters (office, status, date range, search) from request args or form data"""
+    office_id = args.get('office', type=int)
+    status = args.get('status')
+    date_range = args.get('date_range')
+    search_query = args.get('search')
 
     if office_id:
         query = query.filter(Inquiry.office_id == office_id)
@@ -52,8 +46,8 @@ def all_inquiries():
         start_of_last_month = last_month.replace(day=1)
         query = query.filter(Inquiry.created_at >= start_of_last_month, Inquiry.created_at < today.replace(day=1))
     elif date_range == 'custom':
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
+        start_date = args.get('start_date')
+        end_date = args.get('end_date')
         if start_date:
             start_date = datetime.strptime(start_date, '%Y-%m-%d')
             query = query.filter(Inquiry.created_at >= start_date)
@@ -62,23 +56,36 @@ def all_inquiries():
             query = query.filter(Inquiry.created_at < end_date)
     
     if search_query:
+        # Inquiries have no body column; the message text lives in InquiryMessage
         search = f"%{search_query}%"
         query = query.filter(
             or_(
                 User.first_name.ilike(search),
                 User.last_name.ilike(search),
                 Student.student_number.ilike(search),
-                Inquiry.subject.ilike(search),
-                Inquiry.content.ilike(search)
+                Inquiry.subject.ilike(search)
             )
         )
-    
+
+    return query
+
+@admin_bp.route('/admin_inquiries')
+@login_required
+def all_inquiries():
+    """
+    View all inquiries across offices (Superadmin only)
+    This is a read-only view for monitoring purposes
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = 10
+
+    query = filter_inquiries(Inquiry.query.join(Student).join(User).join(Office), request.args)
 
     offices = Office.query.all()
     
     query = query.order_by(desc(Inquiry.created_at))
     
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = keyset_paginate(query, (Inquiry.created_at, Inquiry.id), page=page, per_page=per_page)
     inquiries = pagination.items
 
     stats = get_inquiry_stats()
@@ -201,22 +208,74 @@ def export_inquiries():
     """
     Export filtered inquiries data in various formats
     """
+    if current_user.role != 'super_admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+
     export_format = request.form.get('format', 'csv')
-    
-    office_id = request.form.get('office', type=int)
-    status = request.form.get('status')
-    date_range = request.form.get('date_range')
-    search_query = request.form.get('search')
-    
-    query = Inquiry.query.join(Student).join(User).join(Office)
 
-    inquiries = query.order_by(desc(Inquiry.created_at)).all()
+    query = filter_inquiries(Inquiry.query.join(Student).join(User).join(Office), request.form)
+    inquiries = query.order_by(desc(Inquiry.created_at))
  
     if export_format == 'csv':
-        pass
+        return export_inquiries_csv(inquiries)
     elif export_format == 'pdf':
-        pass
+        return export_inquiries_file(inquiries, write_pdf, 'pdf', "application/pdf")
     elif export_format == 'excel':
-        pass
+        return export_inquiries_file(inquiries, write_xlsx, 'xlsx', XLSX_MIMETYPE)
     
-    return jsonify({'error': 'Export format not supported'}), 400
\ No newline at end of file
+    return jsonify({'error': 'Export format not supported'}), 400
+
+INQUIRY_EXPORT_HEADER = ['ID', 'Student Name', 'Student Number', 'Email', 'Office', 'Subject', 'Status', 'Created At']
+
+
+def inquiry_export_row(inquiry):
+    student_user = inquiry.student.user
+    return [
+        inquiry.id,
+        f"{student_user.first_name} {student_user.last_name}",
+        inquiry.student.student_number or '',
+        student_user.email,
+        inquiry.office.name,
+        inquiry.subject,
+        inquiry.status,
+        inquiry.created_at.strftime('%Y-%m-%d %H:%M:%S') if inquiry.created_at else ''
+    ]
+
+
+def inquiry_export_query(query):
+    # Student, user and office come back in the same row, so each batch is one query
+    return query.options(
+        contains_eager(Inquiry.student).contains_eager(Student.user),
+        contains_eager(Inquiry.office)
+    )
+
+
+def inquiry_export_rows(query):
+    return (inquiry_export_row(inquiry) for inquiry in inquiry_export_query(query).yield_per(EXPORT_BATCH_SIZE))
+
+
+def inquiry_export_source(export_format, params):
+    """Header, ordered query, row formatter and title for an inquiry export; used by the background export job"""
+    query = inquiry_export_query(filter_inquiries(Inquiry.query.join(Student).join(User).join(Office), params).order_by(desc(Inquiry.created_at)))
+    if export_format == 'json':
+        return INQUIRY_EXPORT_HEADER, query, lambda inquiry: dict(zip(INQUIRY_EXPORT_HEADER, inquiry_export_row(inquiry))), "Inquiries"
+    return INQUIRY_EXPORT_HEADER, query, inquiry_export_row, "Inquiries"
+
+
+def export_inquiries_csv(query):
+    """Stream inquiries as a CSV file, reading them through a server-side cursor"""
+    rows = inquiry_export_rows(query)
+
+    return Response(
+        stream_with_context(stream_csv(INQUIRY_EXPORT_HEADER, rows)),
+        mimetype="text/csv",
+        headers={"Content-disposition": f"attachment; filename=inquiries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+    )
+
+
+def export_inquiries_file(query, write, extension, mimetype):
+    """Export inquiries as an Excel or PDF file built from the same row stream as the CSV"""
+    return send_export(
+        write, INQUIRY_EXPORT_HEADER, inquiry_export_rows(query), "Inquiries",
+        f"inquiries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}", mimetype
+    )
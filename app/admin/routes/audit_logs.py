@@ -1,5 +1,5 @@
 from app.models import Inquiry, InquiryMessage, User, Office, db, OfficeAdmin, Student, CounselingSession, StudentActivityLog, SuperAdminActivityLog, OfficeLoginLog, AuditLog
-from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response
+from flask import Blueprint, redirect, url_for, render_template, jsonify, request, flash, Response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
@@ -8,6 +8,11 @@ from sqlalchemy import func, case, or_
 import random
 import os
 from app.admin import admin_bp
+from app.log_search import log_search_filter
+from app.log_timeline import INVOLVEMENTS, fetch_timeline
+from app.serializers import LOG_SERIALIZERS, dumps
+from app.pagination import keyset_paginate
+from app.exports import EXPORT_BATCH_SIZE, XLSX_MIMETYPE, stream_csv, write_xlsx, write_pdf, send_export
 
 ################################# AUDIT LOGS ###############################################
 
@@ -57,14 +62,7 @@ def handle_student_logs(filter_params):
     ).order_by(StudentActivityLog.timestamp.desc())
     
     if filter_params['search']:
-        student_logs_query = student_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                StudentActivityLog.action.ilike(f"%{filter_params['search']}%")
-            )
-        )
+        student_logs_query = student_logs_query.filter(log_search_filter(StudentActivityLog, filter_params['search']))
     
     if filter_params['date_from']:
         student_logs_query = student_logs_query.filter(StudentActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -91,7 +89,7 @@ def handle_student_logs(filter_params):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    paginated_logs = student_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = keyset_paginate(student_logs_query, (StudentActivityLog.timestamp, StudentActivityLog.id), page=page, per_page=per_page)
     
     # Format student logs for display
     formatted_logs = []
@@ -129,14 +127,7 @@ def handle_office_logs(filter_params):
     ).order_by(OfficeLoginLog.login_time.desc())
     
     if filter_params['search']:
-        office_logs_query = office_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                Office.name.ilike(f"%{filter_params['search']}%")
-            )
-        )
+        office_logs_query = office_logs_query.filter(log_search_filter(OfficeLoginLog, filter_params['search']))
     
     if filter_params['date_from']:
         office_logs_query = office_logs_query.filter(OfficeLoginLog.login_time >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -161,7 +152,7 @@ def handle_office_logs(filter_params):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    paginated_logs = office_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = keyset_paginate(office_logs_query, (OfficeLoginLog.login_time, OfficeLoginLog.id), page=page, per_page=per_page)
     
     # Format office logs for display
     formatted_logs = []
@@ -198,15 +189,7 @@ def handle_superadmin_logs(filter_params):
     ).order_by(SuperAdminActivityLog.timestamp.desc())
     
     if filter_params['search']:
-        superadmin_logs_query = superadmin_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                SuperAdminActivityLog.action.ilike(f"%{filter_params['search']}%"),
-                SuperAdminActivityLog.target_type.ilike(f"%{filter_params['search']}%")
-            )
-        )
+        superadmin_logs_query = superadmin_logs_query.filter(log_search_filter(SuperAdminActivityLog, filter_params['search']))
     
     if filter_params['date_from']:
         superadmin_logs_query = superadmin_logs_query.filter(SuperAdminActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -228,7 +211,7 @@ def handle_superadmin_logs(filter_params):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    paginated_logs = superadmin_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = keyset_paginate(superadmin_logs_query, (SuperAdminActivityLog.timestamp, SuperAdminActivityLog.id), page=page, per_page=per_page)
     
     # Format super admin logs for display
     formatted_logs = []
@@ -268,15 +251,7 @@ def handle_all_logs(filter_params):
     ).order_by(AuditLog.timestamp.desc())
     
     if filter_params['search']:
-        audit_logs_query = audit_logs_query.filter(
-            or_(
-                User.first_name.ilike(f"%{filter_params['search']}%"),
-                User.last_name.ilike(f"%{filter_params['search']}%"),
-                User.email.ilike(f"%{filter_params['search']}%"),
-                AuditLog.action.ilike(f"%{filter_params['search']}%"),
-                AuditLog.target_type.ilike(f"%{filter_params['search']}%")
-            )
-        )
+        audit_logs_query = audit_logs_query.filter(log_search_filter(AuditLog, filter_params['search']))
     
     if filter_params['date_from']:
         audit_logs_query = audit_logs_query.filter(AuditLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -287,7 +262,7 @@ def handle_all_logs(filter_params):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    paginated_logs = audit_logs_query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_logs = keyset_paginate(audit_logs_query, (AuditLog.timestamp, AuditLog.id), page=page, per_page=per_page)
     
     # Format audit logs for display
     formatted_logs = []
@@ -313,6 +288,46 @@ def handle_all_logs(filter_params):
                           view_type='all')
 
 
+@admin_bp.route('/audit-logs/timeline')
+@login_required
+def audit_log_timeline():
+    """
+    Every log entry for one user (or everyone) across the four log tables, newest first,
+    as JSON. Pass `cursor` from the previous response to read further back.
+    """
+    if current_user.role != 'super_admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+
+    user_id = request.args.get('user_id', type=int)
+    involvement = request.args.get('involvement', 'any')
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+    try:
+        start = datetime.strptime(request.args['date_from'], '%Y-%m-%d') if request.args.get('date_from') else None
+        end = datetime.strptime(request.args['date_to'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('date_to') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+
+    if involvement not in INVOLVEMENTS:
+        return jsonify({'success': False, 'message': f"involvement must be one of {', '.join(INVOLVEMENTS)}"}), 400
+
+    entries, next_cursor = fetch_timeline(
+        user_id=user_id,
+        involvement=involvement,
+        start=start,
+        end=end,
+        cursor=request.args.get('cursor'),
+        per_page=per_page
+    )
+
+    return Response(dumps({
+        'success': True,
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }), mimetype='application/json')
+
+
 @admin_bp.route('/export-logs', methods=['GET'])
 @login_required
 def export_logs():
@@ -342,13 +357,15 @@ def export_logs():
         return export_logs_excel(logs, log_type)
     elif export_format == 'pdf':
         return export_logs_pdf(logs, log_type)
+    elif export_format == 'json':
+        return export_logs_json(logs, log_type)
     else:
         flash('Unsupported export format', 'error')
         return redirect(url_for('admin.audit_logs', filter_type=log_type))
 
 
 def get_logs_based_on_type_and_filters(log_type, filter_params):
-    """Get logs based on type and applied filters."""
+    """Build the ordered query for logs of the given type and filters; callers iterate or stream it."""
     if log_type == 'student':
         query = db.session.query(
             StudentActivityLog, Student, User
@@ -359,14 +376,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    StudentActivityLog.action.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(log_search_filter(StudentActivityLog, filter_params['search']))
             
         if filter_params['date_from']:
             query = query.filter(StudentActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -374,7 +384,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         if filter_params['date_to']:
             query = query.filter(StudentActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
             
-        return query.order_by(StudentActivityLog.timestamp.desc()).all()
+        return query.order_by(StudentActivityLog.timestamp.desc())
         
     elif log_type == 'office':
         query = db.session.query(
@@ -388,14 +398,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    Office.name.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(log_search_filter(OfficeLoginLog, filter_params['search']))
             
         if filter_params['date_from']:
             query = query.filter(OfficeLoginLog.login_time >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -403,7 +406,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         if filter_params['date_to']:
             query = query.filter(OfficeLoginLog.login_time <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
             
-        return query.order_by(OfficeLoginLog.login_time.desc()).all()
+        return query.order_by(OfficeLoginLog.login_time.desc())
         
     elif log_type == 'superadmin':
         query = db.session.query(
@@ -413,15 +416,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%'),
-                    User.last_name.ilike(f'%{filter_params["search"]}%'),
-                    User.email.ilike(f'%{filter_params["search"]}%'),
-                    SuperAdminActivityLog.action.ilike(f'%{filter_params["search"]}%'),
-                    SuperAdminActivityLog.target_type.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(log_search_filter(SuperAdminActivityLog, filter_params['search']))
             
         if filter_params['date_from']:
             query = query.filter(SuperAdminActivityLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -429,7 +424,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         if filter_params['date_to']:
             query = query.filter(SuperAdminActivityLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
             
-        return query.order_by(SuperAdminActivityLog.timestamp.desc()).all()
+        return query.order_by(SuperAdminActivityLog.timestamp.desc())
         
     else:  # 'all' or any other value
         query = db.session.query(
@@ -439,15 +434,7 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         )
         
         if filter_params['search']:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{filter_params["search"]}%') if User else False,
-                    User.last_name.ilike(f'%{filter_params["search"]}%') if User else False,
-                    User.email.ilike(f'%{filter_params["search"]}%') if User else False,
-                    AuditLog.action.ilike(f'%{filter_params["search"]}%'),
-                    AuditLog.target_type.ilike(f'%{filter_params["search"]}%')
-                )
-            )
+            query = query.filter(log_search_filter(AuditLog, filter_params['search']))
             
         if filter_params['date_from']:
             query = query.filter(AuditLog.timestamp >= datetime.strptime(filter_params['date_from'], '%Y-%m-%d'))
@@ -455,268 +442,157 @@ def get_logs_based_on_type_and_filters(log_type, filter_params):
         if filter_params['date_to']:
             query = query.filter(AuditLog.timestamp <= datetime.strptime(filter_params['date_to'] + ' 23:59:59', '%Y-%m-%d %H:%M:%S'))
             
-        return query.order_by(AuditLog.timestamp.desc()).all()
+        return query.order_by(AuditLog.timestamp.desc())
 
 
-def export_logs_csv(logs, log_type):
-    """Export logs as CSV file."""
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
+def log_export_header(log_type):
+    """Column headings shared by the log exports."""
     if log_type == 'student':
-        writer.writerow(['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, student, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
+        return ['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address']
     elif log_type == 'office':
-        writer.writerow(['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration (sec)', 'Status', 'IP Address'])
-        
-        for log, office_admin, user, office in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                log.session_duration or '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
-            
+        return ['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration (sec)', 'Status', 'IP Address']
     elif log_type == 'superadmin':
-        writer.writerow(['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                log.details or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    else:  # 'all' or any other value
-        writer.writerow(['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            writer.writerow([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    output.seek(0)
-    
+        return ['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address']
+    return ['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']
+
+
+def log_export_row(row, log_type):
+    """Format one result row of get_logs_based_on_type_and_filters for export."""
+    if log_type == 'student':
+        log, student, user = row
+        return [
+            log.id,
+            f"{user.first_name} {user.last_name}",
+            user.email,
+            log.action,
+            log.related_type or '',
+            'Success' if log.is_success else 'Failed',
+            log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            log.ip_address or ''
+        ]
+    elif log_type == 'office':
+        log, office_admin, user, office = row
+        return [
+            log.id,
+            f"{user.first_name} {user.last_name}",
+            user.email,
+            office.name,
+            log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
+            log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
+            log.session_duration or '',
+            'Success' if log.is_success else 'Failed',
+            log.ip_address or ''
+        ]
+    elif log_type == 'superadmin':
+        log, user = row
+        return [
+            log.id,
+            f"{user.first_name} {user.last_name}" if user else 'Unknown',
+            user.email if user else '',
+            log.action,
+            log.target_type or '',
+            log.details or '',
+            'Success' if log.is_success else 'Failed',
+            log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            log.ip_address or ''
+        ]
+    log, user = row
+    return [
+        log.id,
+        f"{user.first_name} {user.last_name}" if user else 'Unknown',
+        user.role if user else '',
+        log.action,
+        log.target_type or '',
+        'Success' if log.is_success else 'Failed',
+        log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        log.ip_address or ''
+    ]
+
+
+def log_export_source(log_type, export_format, filter_params):
+    """Header, ordered query, row formatter and title for a log export; used by the background export job."""
+    filter_params = {key: filter_params.get(key, '') for key in ('search', 'date_from', 'date_to', 'role', 'status', 'action')}
+    query = get_logs_based_on_type_and_filters(log_type, filter_params)
+
+    if export_format == 'pdf':
+        columns = log_pdf_columns(log_type)
+        return log_pdf_header(log_type, columns), query, lambda row: log_pdf_row(row, log_type, columns), f"{log_type.capitalize()} Audit Logs Export"
+
+    if export_format == 'json':
+        serializer = LOG_SERIALIZERS[LOG_TYPE_MODELS.get(log_type, AuditLog)]
+        return serializer.keys, query.with_entities(*serializer.columns), serializer.to_dict, f"{log_type.capitalize()} Logs"
+
+    return log_export_header(log_type), query, lambda row: log_export_row(row, log_type), f"{log_type.capitalize()} Logs"
+
+
+# The log table each export type reads; JSON exports carry its raw columns
+LOG_TYPE_MODELS = {
+    'student': StudentActivityLog,
+    'office': OfficeLoginLog,
+    'superadmin': SuperAdminActivityLog,
+    'all': AuditLog
+}
+
+
+def export_logs_json(logs, log_type):
+    """Stream the raw log columns as JSON Lines, straight from result rows."""
+    serializer = LOG_SERIALIZERS[LOG_TYPE_MODELS.get(log_type, AuditLog)]
+    rows = logs.with_entities(*serializer.columns).yield_per(EXPORT_BATCH_SIZE)
+
+    return Response(
+        stream_with_context(serializer.dumps_lines(rows)),
+        mimetype="application/x-ndjson",
+        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"}
+    )
+
+
+def export_logs_csv(logs, log_type):
+    """Stream logs as a CSV file, reading them through a server-side cursor."""
+    rows = (log_export_row(row, log_type) for row in logs.yield_per(EXPORT_BATCH_SIZE))
+
     return Response(
-        output.getvalue(),
+        stream_with_context(stream_csv(log_export_header(log_type), rows)),
         mimetype="text/csv",
         headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
     )
 
 
 def export_logs_excel(logs, log_type):
-    """Export logs as Excel file."""
-    import openpyxl
-    from io import BytesIO
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"{log_type.capitalize()} Logs"
-    
-    if log_type == 'student':
-        ws.append(['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, student, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'office':
-        ws.append(['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration (sec)', 'Status', 'IP Address'])
-        
-        for log, office_admin, user, office in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                log.session_duration or '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'superadmin':
-        ws.append(['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Details', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                log.details or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    else:  # 'all' or any other value
-        ws.append(['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address'])
-        
-        for log, user in logs:
-            ws.append([
-                log.id,
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return Response(
-        output.getvalue(),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"}
+    """Export logs as Excel file, writing rows as they are read."""
+    rows = (log_export_row(row, log_type) for row in logs.yield_per(EXPORT_BATCH_SIZE))
+
+    return send_export(
+        write_xlsx, log_export_header(log_type), rows, f"{log_type.capitalize()} Logs",
+        f"{log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", XLSX_MIMETYPE
     )
 
 
+def log_pdf_columns(log_type):
+    """Indexes of the export columns shown in the PDF; free-text details do not fit a table cell."""
+    return [i for i, name in enumerate(log_export_header(log_type)) if name != 'Details']
+
+
+def log_pdf_header(log_type, columns):
+    header = [log_export_header(log_type)[i] for i in columns]
+    if log_type == 'office':
+        header[6] = 'Duration'
+    return header
+
+
+def log_pdf_row(row, log_type, columns):
+    values = log_export_row(row, log_type)
+    if log_type == 'office' and values[6]:
+        values[6] = f"{values[6]} sec"
+    return [values[i] for i in columns]
+
+
 def export_logs_pdf(logs, log_type):
-    """Export logs as PDF file."""
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.pagesizes import letter, landscape
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet
-    from io import BytesIO
-    
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter))
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    
-    elements.append(Paragraph(f"{log_type.capitalize()} Audit Logs Export", title_style))
-    elements.append(Spacer(1, 12))
-    
-    if log_type == 'student':
-        data = [['ID', 'Student Name', 'Email', 'Action', 'Related Type', 'Status', 'Timestamp', 'IP Address']]
-        
-        for log, student, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                log.action,
-                log.related_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'office':
-        data = [['ID', 'Admin Name', 'Email', 'Office', 'Login Time', 'Logout Time', 'Duration', 'Status', 'IP Address']]
-        
-        for log, office_admin, user, office in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}",
-                user.email,
-                office.name,
-                log.login_time.strftime('%Y-%m-%d %H:%M:%S'),
-                log.logout_time.strftime('%Y-%m-%d %H:%M:%S') if log.logout_time else '',
-                str(log.session_duration) + ' sec' if log.session_duration else '',
-                'Success' if log.is_success else 'Failed',
-                log.ip_address or ''
-            ])
-            
-    elif log_type == 'superadmin':
-        data = [['ID', 'Admin Name', 'Email', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']]
-        
-        for log, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.email if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-            
-    else:  # 'all' or any other value
-        data = [['ID', 'User', 'Role', 'Action', 'Target Type', 'Status', 'Timestamp', 'IP Address']]
-        
-        for log, user in logs:
-            data.append([
-                str(log.id),
-                f"{user.first_name} {user.last_name}" if user else 'Unknown',
-                user.role if user else '',
-                log.action,
-                log.target_type or '',
-                'Success' if log.is_success else 'Failed',
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.ip_address or ''
-            ])
-    
-    # Create the table with appropriate styling
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table)
-    doc.build(elements)
-    
-    buffer.seek(0)
-    
-    return Response(
-        buffer.getvalue(),
-        mimetype="application/pdf",
-        headers={"Content-disposition": f"attachment; filename={log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
+    """Export logs as PDF file, one page-sized table at a time."""
+    columns = log_pdf_columns(log_type)
+    header = log_pdf_header(log_type, columns)
+    rows = (log_pdf_row(row, log_type, columns) for row in logs.yield_per(EXPORT_BATCH_SIZE))
+
+    return send_export(
+        write_pdf, header, rows, f"{log_type.capitalize()} Audit Logs Export",
+        f"{log_type}_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", "application/pdf"
     )
\ No newline at end of file
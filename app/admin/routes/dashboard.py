@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import func, case, or_
 from app.admin import admin_bp
 from app.websockets.dashboard import broadcast_resolved_inquiry, broadcast_new_session
+from app.scheduler import schedule_session_reminders, clear_sent_reminders
 
 
 @admin_bp.route('/dashboard')
@@ -272,6 +273,7 @@ def update_session(session_id):
         
         if 'scheduled_at' in data and data['scheduled_at']:
             session.scheduled_at = datetime.fromisoformat(data['scheduled_at'])
+            clear_sent_reminders(session.id)
         
         # Log this action
         AuditLog.log_action(
@@ -284,6 +286,9 @@ def update_session(session_id):
         
         db.session.commit()
         
+        # Status or start time may have changed, so re-register the reminder jobs
+        schedule_session_reminders(session)
+        
         return jsonify({'status': 'success', 'message': 'Session updated successfully'})
     
     except Exception as e:
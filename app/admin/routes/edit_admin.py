@@ -10,6 +10,8 @@ from sqlalchemy import func, case, or_
 import random
 import os
 from app.admin import admin_bp
+from app.admin.routes.admin_announcement import allowed_file
+from app.admin.utils import save_profile_picture
 
 ################################# EDIT ADMIN ###############################################
 
@@ -75,18 +77,10 @@ def edit_office_admin(admin_id):
         if 'profile_pic' in request.files and request.files['profile_pic'].filename != '':
             file = request.files['profile_pic']
             if file and allowed_file(file.filename):
-                filename = secure_filename(f"{office_admin.user_id}_{file.filename}")
-                
-                # Get upload folder from config, making sure it's properly imported
                 try:
-                    from flask import current_app
-                    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profile_pics', filename)
-                
-                    # Create directory if it doesn't exist
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    
-                    file.save(filepath)
-                    office_admin.user.profile_pic = f"/static/uploads/profile_pics/{filename}"
+                    # Same form as account settings, so shared pictures are reference-counted correctly
+                    office_admin.user.profile_pic = save_profile_picture(file)
+                    office_admin.user.profile_pic_variants = None
                 except Exception as e:
                     flash(f'Error uploading profile picture: {str(e)}', 'error')
         
@@ -101,7 +95,7 @@ def edit_office_admin(admin_id):
         db.session.add(super_admin_log)
         
         # Create audit log entry using the correct fields for AuditLog model
-        audit_log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Updated Office Admin",
             target_type="user",
@@ -111,6 +105,11 @@ def edit_office_admin(admin_id):
         
         try:
             db.session.commit()
+            if office_admin.user.profile_pic and not office_admin.user.profile_pic_variants:
+                from app.jobs.tasks import build_profile_pic_variants
+                build_profile_pic_variants.delay(
+                    user_id=office_admin.user_id, profile_pic=office_admin.user.profile_pic
+                )
             flash('Admin information updated successfully.', 'success')
             return redirect(url_for('admin.view_admin_details', admin_id=admin_id))
         except Exception as e:
@@ -66,7 +66,7 @@ def edit_office(office_id):
                 db.session.add(new_office_concern)
         
         # Log activity
-        log = SuperAdminActivityLog.log_action(
+        SuperAdminActivityLog.log_action(
             super_admin=current_user,
             action="Updated office",
             target_type="office",
@@ -77,7 +77,7 @@ def edit_office(office_id):
         )
         
         # Add to general audit log
-        audit_log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Updated Office",
             target_type="office",
@@ -0,0 +1,70 @@
+from app.models import db, ExportJob
+from flask import jsonify, request, url_for, send_file
+from flask_login import login_required, current_user
+from datetime import datetime
+import os
+from app.admin import admin_bp
+from app.exports import EXPORT_FORMATS, export_params, start_export
+
+
+################################################ BACKGROUND EXPORTS #################################################
+
+@admin_bp.route('/exports', methods=['POST'])
+@login_required
+def create_export():
+    """Queue a log or inquiry export and return its id; progress is pushed on the /dashboard socket"""
+    if current_user.role != 'super_admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+
+    export_type = request.form.get('kind', 'logs')
+    export_format = request.form.get('format', 'csv')
+    if export_type not in ('logs', 'inquiries') or export_format not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'Export type or format not supported'}), 400
+
+    try:
+        export, reused = start_export(export_type, export_format, export_params(export_type, request.form), current_user)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error starting export: {str(e)}'}), 500
+
+    return jsonify({
+        'success': True,
+        'export_id': export.id,
+        'status': export.status,
+        'reused': reused,
+        'status_url': url_for('admin.export_status', export_id=export.id),
+        'download_url': url_for('admin.download_export', export_id=export.id)
+    }), 202
+
+
+@admin_bp.route('/exports/<int:export_id>')
+@login_required
+def export_status(export_id):
+    """Polling fallback for clients without a socket connection"""
+    if current_user.role != 'super_admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+
+    export = ExportJob.query.get_or_404(export_id)
+    return jsonify({'success': True, 'export': export.to_dict()})
+
+
+@admin_bp.route('/exports/<int:export_id>/download')
+@login_required
+def download_export(export_id):
+    if current_user.role != 'super_admin':
+        return jsonify({'success': False, 'message': 'Unauthorized access'}), 403
+
+    export = ExportJob.query.get_or_404(export_id)
+    if export.status != 'completed':
+        return jsonify({'success': False, 'message': 'Export is not ready', 'status': export.status}), 409
+    if export.expires_at <= datetime.utcnow() or not os.path.exists(export.file_path):
+        return jsonify({'success': False, 'message': 'Export has expired'}), 410
+
+    _, extension, mimetype = EXPORT_FORMATS[export.export_format]
+    created = export.created_at.strftime('%Y%m%d_%H%M%S')
+    return send_file(
+        export.file_path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f"{export.export_type}_{created}.{extension}"
+    )
@@ -5,6 +5,7 @@ from flask_login import login_required, current_user
 from datetime import datetime
 from sqlalchemy import func, or_, desc
 from app.admin import admin_bp
+from app.pagination import keyset_paginate
 
 @admin_bp.route('/manage-admins')
 @login_required
@@ -61,11 +62,9 @@ def manage_admins():
     # Order by created date (most recent first)
     query = query.order_by(desc(User.created_at))
     
-    # Get total count for pagination
-    total_count = query.count()
-    
     # Apply pagination
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = keyset_paginate(query, (User.created_at, User.id), page=page, per_page=per_page)
+    total_count = pagination.total
     admin_results = pagination.items
     
     # Transform results for template
@@ -47,7 +47,7 @@ def manage_concern_types():
                 db.session.add(new_concern)
                 
                 # Log action
-                log = SuperAdminActivityLog.log_action(
+                SuperAdminActivityLog.log_action(
                     super_admin=current_user,
                     action="Created concern type",
                     target_type="concern_type",
@@ -90,7 +90,7 @@ def manage_concern_types():
                     concern.allows_other = allows_other
                     
                     # Log action
-                    log = SuperAdminActivityLog.log_action(
+                    SuperAdminActivityLog.log_action(
                         super_admin=current_user,
                         action="Updated concern type",
                         target_type="concern_type",
@@ -126,7 +126,7 @@ def manage_concern_types():
                     name = concern.name
                     
                     # Log action
-                    log = SuperAdminActivityLog.log_action(
+                    SuperAdminActivityLog.log_action(
                         super_admin=current_user,
                         action="Deleted concern type",
                         target_type="concern_type",
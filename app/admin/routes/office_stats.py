@@ -59,13 +59,10 @@ def office_stats():
     pending_inquiries = Inquiry.query.filter_by(status='pending').count()
     
     # Log this activity
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
-        action="Viewed office statistics",
-        timestamp=datetime.utcnow()
+    SuperAdminActivityLog.log_action(
+        current_user,
+        action="Viewed office statistics"
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template('admin/office_stats.html', 
                            offices=offices,
@@ -112,13 +109,12 @@ def view_office_details(office_id):
     available_admins = [user for user in admin_users if user.id not in assigned_admin_ids]
     
     # Log activity
-    log = SuperAdminActivityLog(
-        super_admin_id=current_user.id,
+    SuperAdminActivityLog.log_action(
+        current_user,
         action=f"Viewed details for office: {office.name}",
-        timestamp=datetime.utcnow()
+        target_type='office',
+        target_office=office
     )
-    db.session.add(log)
-    db.session.commit()
     
     return render_template('admin/office_detail.html', 
                           office=office, 
@@ -0,0 +1,36 @@
+from app.models import Office, User
+from flask import render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from app.admin import admin_bp
+from app.storage_usage import usage_report
+
+
+################################################ STORAGE USAGE #################################################
+
+@admin_bp.route('/storage-usage')
+@login_required
+def storage_usage():
+    """Upload storage per office and per user, read from the usage ledger"""
+    if current_user.role != 'super_admin':
+        flash('Unauthorized access', 'error')
+        return redirect(url_for('main.index'))
+
+    office_usage = usage_report('office')
+    user_usage = usage_report('user', limit=50)
+
+    offices = {office.id: office for office in Office.query.filter(
+        Office.id.in_([row.owner_id for row in office_usage])
+    )} if office_usage else {}
+    users = {user.id: user for user in User.query.filter(
+        User.id.in_([row.owner_id for row in user_usage])
+    )} if user_usage else {}
+
+    return render_template(
+        'admin/storage_usage.html',
+        office_usage=office_usage,
+        user_usage=user_usage,
+        offices=offices,
+        users=users,
+        total_bytes=sum(row.bytes_used for row in office_usage),
+        total_files=sum(row.file_count for row in office_usage)
+    )
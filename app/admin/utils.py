@@ -1,7 +1,6 @@
-import os
-import uuid
-from werkzeug.utils import secure_filename
-from flask import current_app
+from app.models import User
+from app.storage import store_upload, delete_stored_file
+from app.images import delete_variants, profile_pic_path
 
 def save_profile_picture(file):
     """
@@ -11,22 +10,11 @@ def save_profile_picture(file):
         file: The file object from the form
         
     Returns:
-        str: The filename that was saved
+        str: The filename that was saved, relative to uploads/profile_pics
     """
-    # Create a unique filename to prevent overwriting
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    
-    # Create directory if it doesn't exist
-    upload_folder = os.path.join(current_app.static_folder, 'uploads', 'profile_pics')
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-    
-    # Save the file
-    file_path = os.path.join(upload_folder, unique_filename)
-    file.save(file_path)
-    
-    return unique_filename
+    # Content-addressed: the same picture uploaded twice is stored once
+    stored = store_upload(file, 'profile_pics')
+    return stored.path[len('uploads/profile_pics/'):]
 
 def delete_profile_picture(filename):
     """
@@ -38,6 +26,14 @@ def delete_profile_picture(filename):
     if not filename:
         return
     
-    file_path = os.path.join(current_app.static_folder, 'uploads', 'profile_pics', filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
\ No newline at end of file
+    relative_path = profile_pic_path(filename)
+    # Another account may use the same stored picture, saved in any of the forms profile_pic has held;
+    # the caller's own row still counts as one
+    forms = {relative_path, f"/static/{relative_path}"}
+    if relative_path.startswith('uploads/profile_pics/'):
+        forms.add(relative_path[len('uploads/profile_pics/'):])
+    if User.query.filter(User.profile_pic.in_(forms)).count() > 1:
+        return
+    
+    delete_stored_file(relative_path)
+    delete_variants(relative_path)
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; gzip is always written
+    brotli = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # files are bundled and fingerprinted unminified
+    rcssmin = rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+# Built files live below static/dist so they can get far-future cache headers as a whole
+ASSET_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Only text compresses usefully; images and sounds are already compressed formats
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt')
+
+# Output name -> source files concatenated in order; anything else is built from the file of the same name
+ASSET_BUNDLES = {
+    'css/base.css': ('css/customs.css',),
+}
+
+# Literal asset names used by the templates decide what gets built
+ASSET_REFERENCE = re.compile(r"""asset_url\(\s*['"]([^'"]+)['"]\s*\)""")
+
+# name -> path below static of the fingerprinted file, e.g. css/base.css -> dist/css/base.3fa9c2d1e0b4.css
+_manifest = {}
+
+
+def asset_sources(name):
+    return ASSET_BUNDLES.get(name, (name,))
+
+
+def template_assets(template_folder):
+    """Asset names referenced with asset_url('...') anywhere in the templates"""
+    names = set()
+    for root, _, files in os.walk(template_folder):
+        for filename in files:
+            if filename.endswith('.html'):
+                with open(os.path.join(root, filename), encoding='utf-8') as f:
+                    names.update(ASSET_REFERENCE.findall(f.read()))
+    return sorted(names)
+
+
+def read_sources(static_folder, name):
+    """Concatenated bytes of an asset's sources; missing sources are skipped, None when none exist"""
+    parts = []
+    for source in asset_sources(name):
+        path = os.path.join(static_folder, *source.split('/'))
+        if not os.path.isfile(path):
+            logger.warning(f"Asset {name}: {source} does not exist")
+            continue
+        with open(path, 'rb') as f:
+            parts.append(f.read())
+    return b'\n'.join(parts) if parts else None
+
+
+def minify(name, data):
+    if name.endswith('.css') and rcssmin:
+        return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+    if name.endswith('.js') and rjsmin:
+        return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def fingerprint(name, data):
+    """dist/<name> with a content hash before the extension"""
+    stem, extension = os.path.splitext(name)
+    return f"{ASSET_FOLDER}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def write_compressed(path, data):
+    """Write .gz (and .br) next to a built file when it is text and compression helps"""
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return
+    # mtime=0 keeps rebuilds of unchanged files byte-identical
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        _write(f"{path}.gz", compressed)
+    if brotli:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            _write(f"{path}.br", compressed)
+
+
+def build_assets(static_folder, template_folder):
+    """
+    Rebuild static/dist: bundle and minify each asset the templates use, fingerprint it,
+    write compressed variants and the manifest. Returns the manifest.
+    """
+    output_root = os.path.join(static_folder, ASSET_FOLDER)
+    shutil.rmtree(output_root, ignore_errors=True)
+
+    manifest = {}
+    for name in template_assets(template_folder):
+        data = read_sources(static_folder, name)
+        if data is None:
+            continue
+        data = minify(name, data)
+        output = fingerprint(name, data)
+        path = os.path.join(static_folder, *output.split('/'))
+        _write(path, data)
+        write_compressed(path, data)
+        manifest[name] = output
+
+    _write(os.path.join(output_root, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, ASSET_FOLDER, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def asset_url(name):
+    """URL of a built asset, or of its source when no build has been run"""
+    built = _manifest.get(name)
+    return url_for('static', filename=built or name)
+
+
+def _serve_asset():
+    """
+    Serve fingerprinted files with immutable caching, picking the .br/.gz variant the client accepts.
+    Without a build, bundle names are assembled from their sources on the fly.
+    """
+    if request.endpoint != 'static':
+        return None
+    filename = (request.view_args or {}).get('filename', '')
+
+    if filename in ASSET_BUNDLES and filename not in _manifest:
+        data = read_sources(current_app.static_folder, filename)
+        if data is None:
+            return None
+        response = current_app.response_class(data, mimetype=mimetypes.guess_type(filename)[0])
+        response.cache_control.no_cache = True
+        return response
+
+    if not filename.startswith(f"{ASSET_FOLDER}/") or filename.endswith(MANIFEST_NAME):
+        return None
+    path = os.path.join(current_app.static_folder, *filename.split('/'))
+    if not os.path.isfile(path):
+        return None
+
+    mimetype = mimetypes.guess_type(path)[0]
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(f"{path}{suffix}"):
+            response = send_file(f"{path}{suffix}", mimetype=mimetype, conditional=True, max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=ASSET_MAX_AGE)
+
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    """Load the asset manifest, register asset_url() and the `flask assets build` command"""
+    global _manifest
+    _manifest = load_manifest(app.static_folder)
+
+    app.jinja_env.globals.update(asset_url=asset_url)
+    app.before_request(_serve_asset)
+
+    @app.cli.group('assets')
+    def assets_cli():
+        """Static asset build"""
+
+    @assets_cli.command('build')
+    def build():
+        """Bundle, minify, fingerprint and precompress the CSS/JS/images the templates use"""
+        global _manifest
+        _manifest = build_assets(app.static_folder, os.path.join(app.root_path, app.template_folder))
+        for name, output in sorted(_manifest.items()):
+            click.echo(f"{name} -> {output}")
+        if not brotli:
+            click.echo("brotli is not installed; only .gz variants were written")
+        if not rjsmin:
+            click.echo("rjsmin/rcssmin are not installed; CSS and JS were not minified")
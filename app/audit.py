@@ -0,0 +1,214 @@
+from collections import deque
+import atexit
+import logging
+import threading
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('flush', 'drop_oldest', 'drop_newest')
+
+# session.info keys: rows logged in the open transaction, and whether to drop them unless it commits
+PENDING_KEY = 'audit_pending'
+DISCARD_KEY = 'audit_discard'
+
+
+class AuditSink:
+    """
+    Buffers audit/activity log rows in memory and bulk-inserts them from a background
+    greenlet, so logging never adds a write to the request's own transaction.
+    Rows logged inside a transaction are held on the session until it commits and dropped
+    if it is rolled back, see the session hooks at the bottom.
+    A flush happens every AUDIT_FLUSH_INTERVAL_MS or as soon as AUDIT_FLUSH_BATCH_SIZE rows are queued.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.buffer = deque()
+        self.dropped = 0
+        self.written = 0
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_SINK_ENABLED', True)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL_MS', 500)
+        app.config.setdefault('AUDIT_FLUSH_BATCH_SIZE', 200)
+        app.config.setdefault('AUDIT_BUFFER_SIZE', 10000)
+        # What to do when the buffer is full:
+        # 'flush' writes the backlog inline in the caller, 'drop_oldest'/'drop_newest' discard rows
+        app.config.setdefault('AUDIT_OVERFLOW_POLICY', 'flush')
+
+        if app.config['AUDIT_OVERFLOW_POLICY'] not in OVERFLOW_POLICIES:
+            raise RuntimeError(f"AUDIT_OVERFLOW_POLICY must be one of {', '.join(OVERFLOW_POLICIES)}")
+
+        self.app = app
+        self.enabled = app.config['AUDIT_SINK_ENABLED']
+        self.interval = app.config['AUDIT_FLUSH_INTERVAL_MS'] / 1000
+        self.batch_size = app.config['AUDIT_FLUSH_BATCH_SIZE']
+        self.buffer_size = app.config['AUDIT_BUFFER_SIZE']
+        self.overflow_policy = app.config['AUDIT_OVERFLOW_POLICY']
+
+        if not self.enabled:
+            return
+
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, model, values):
+        """
+        Queue one row for `model` once the current transaction commits, so an action whose commit
+        fails is not logged as done; writes it through the current session if the sink is off
+        """
+        if not self.enabled:
+            db.session.add(model(**values))
+            return
+
+        session = db.session()
+        if not session.in_transaction():
+            self._enqueue(model, values)
+            return
+        session.info.setdefault(PENDING_KEY, []).append((model, values))
+
+    def _enqueue(self, model, values):
+        if len(self.buffer) >= self.buffer_size:
+            if self.overflow_policy == 'drop_newest':
+                self.dropped += 1
+                logger.warning(f"Audit buffer full, dropped {model.__tablename__} row")
+                return
+            if self.overflow_policy == 'drop_oldest':
+                self.buffer.popleft()
+                self.dropped += 1
+                logger.warning("Audit buffer full, dropped the oldest queued row")
+            else:
+                self.flush()
+
+        self.buffer.append((model, values))
+        if len(self.buffer) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far; safe to call from any thread"""
+        with self._flush_lock:
+            rows = []
+            while self.buffer:
+                rows.append(self.buffer.popleft())
+            if not rows:
+                return
+
+            # Group per table so each gets a single executemany INSERT
+            by_model = {}
+            for model, values in rows:
+                by_model.setdefault(model, []).append(values)
+
+            with self.app.app_context():
+                for model, values in by_model.items():
+                    self._write(model, values)
+
+    def _write(self, model, rows):
+        try:
+            db.session.execute(insert(model), rows)
+            db.session.commit()
+            self.written += len(rows)
+            return
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Bulk insert into {model.__tablename__} failed, retrying row by row: {str(e)}")
+
+        # A referenced row (e.g. a deleted inquiry) may be gone by the time we write;
+        # fall back to NULL references, the same result ON DELETE SET NULL would have given
+        optional_refs = [
+            column.name for column in model.__table__.columns
+            if column.foreign_keys and column.nullable
+        ]
+        for values in rows:
+            for attempt in (values, {**values, **{name: None for name in optional_refs}}):
+                try:
+                    db.session.execute(insert(model), [attempt])
+                    db.session.commit()
+                    self.written += 1
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    error = str(e)
+            else:
+                self.dropped += 1
+                logger.error(f"Dropped {model.__tablename__} row {values.get('action')}: {error}")
+
+    def stop(self):
+        """Stop the writer and flush what is left; registered to run at interpreter exit"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing audit logs on shutdown: {str(e)}")
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'queued': len(self.buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+            'overflow_policy': self.overflow_policy if self.app else None
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing audit logs: {str(e)}")
+
+
+audit_sink = AuditSink()
+
+
+def _release_pending(session, submit):
+    pending = session.info.pop(PENDING_KEY, None)
+    session.info.pop(DISCARD_KEY, None)
+    if pending and submit:
+        for model, values in pending:
+            audit_sink._enqueue(model, values)
+
+
+@event.listens_for(Session, 'before_flush')
+def _note_flushed_writes(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        session.info[DISCARD_KEY] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_statement_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[DISCARD_KEY] = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _note_rollback(session):
+    session.info[DISCARD_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_committed(session):
+    _release_pending(session, submit=True)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _release_uncommitted(session, transaction):
+    # Reached without a commit. Rows of a rolled back transaction or one that wrote describe undone
+    # work; a transaction that only read (a page view, a denied request) is simply closed, losing nothing
+    if transaction.parent is None:
+        _release_pending(session, submit=not session.info.get(DISCARD_KEY))
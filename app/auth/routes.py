@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, session, request
 from werkzeug.security import check_password_hash, generate_password_hash  
 from flask_login import login_user, logout_user, login_required, current_user
-from app.models import User, Student, AuditLog
+from app.models import User, Student, AuditLog, AUTHENTICATION_TARGET_TYPE
 from datetime import datetime
 from app.extensions import db  
 from flask_wtf.csrf import CSRFProtect
@@ -32,7 +32,7 @@ def login():
                 actor_id=user.id,
                 actor_role=user.role,
                 action='Logged in',
-                target_type='authentication',
+                target_type=AUTHENTICATION_TARGET_TYPE,
                 status_snapshot='success',
                 is_success=True,
                 ip_address=request.remote_addr,
@@ -67,7 +67,7 @@ def login():
                 actor_id=user.id if user else None,
                 actor_role=user.role if user else None,
                 action='Failed login attempt',
-                target_type='authentication',
+                target_type=AUTHENTICATION_TARGET_TYPE,
                 status_snapshot='failed',
                 is_success=False,
                 ip_address=request.remote_addr,
@@ -149,7 +149,7 @@ def logout():
             actor_id=current_user.id,
             actor_role=current_user.role,
             action='Logged out',
-            target_type='authentication',
+            target_type=AUTHENTICATION_TARGET_TYPE,
             status_snapshot='success',
             is_success=True,
             ip_address=request.remote_addr,
@@ -160,10 +160,7 @@ def logout():
         if current_user.role == 'office_admin' and current_user.office_admin:
             from app.models import OfficeLoginLog
             # Find the most recent login log for this admin that doesn't have a logout time
-            login_log = OfficeLoginLog.query.filter_by(
-                office_admin_id=current_user.office_admin.id,
-                logout_time=None
-            ).order_by(OfficeLoginLog.login_time.desc()).first()
+            login_log = OfficeLoginLog.open_session(current_user.office_admin.id)
             
             if login_log:
                 login_log.update_logout()
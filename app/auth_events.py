@@ -0,0 +1,47 @@
+import click
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import AuditLog, OfficeLoginLog
+
+# Partial indexes over the authentication events: login history reads and the logout lookup
+AUTH_EVENT_INDEXES = (
+    (AuditLog, 'ix_audit_logs_auth_actor_timestamp'),
+    (OfficeLoginLog, 'ix_office_login_logs_open_sessions'),
+)
+
+
+def create_auth_event_indexes(connection):
+    """Build any missing authentication-event partial indexes; returns the names created"""
+    existing = {
+        name for (name,) in connection.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'"
+        ))
+    }
+    created = []
+    for model, name in AUTH_EVENT_INDEXES:
+        if name in existing:
+            continue
+        index = next(index for index in model.__table__.indexes if index.name == name)
+        index.create(bind=connection)
+        created.append(name)
+    return created
+
+
+def init_auth_events(app):
+    """Register the `flask logs auth-setup` command"""
+    logs_cli = app.cli.commands['logs']
+
+    @logs_cli.command('auth-setup')
+    def auth_setup():
+        """Build the partial indexes behind login history and the office logout lookup"""
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            raise click.ClickException("Index setup reads pg_indexes and needs PostgreSQL")
+
+        with db.engine.begin() as connection:
+            created = create_auth_event_indexes(connection)
+
+        for name in created:
+            click.echo(f"created {name}")
+        if not created:
+            click.echo("All authentication event indexes already exist")
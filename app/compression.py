@@ -0,0 +1,228 @@
+import zlib
+
+from werkzeug.http import parse_accept_header, parse_etags, unquote_etag
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+# Text responses worth compressing; images, media and archives already are
+COMPRESS_MIMETYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml', 'image/svg+xml',
+)
+
+
+class _Gzip:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits=31 writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Sync flush emits everything so far without ending the stream
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _header(headers, name):
+    name = name.lower()
+    return next((value for key, value in headers if key.lower() == name), None)
+
+
+def _without(headers, name):
+    name = name.lower()
+    return [(key, value) for key, value in headers if key.lower() != name]
+
+
+def _vary_on_encoding(headers):
+    vary = _header(headers, 'Vary')
+    if not vary:
+        return headers + [('Vary', 'Accept-Encoding')]
+    if '*' in vary or 'accept-encoding' in vary.lower():
+        return headers
+    return _without(headers, 'Vary') + [('Vary', f"{vary}, Accept-Encoding")]
+
+
+def _weak_etag(headers):
+    etag = _header(headers, 'ETag')
+    if not etag or etag.startswith('W/'):
+        return headers
+    return _without(headers, 'ETag') + [('ETag', f"W/{etag}")]
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing text responses with brotli or gzip, chosen from Accept-Encoding.
+
+    Responses with a Content-Length are compressed when at least `minimum_size` bytes; up to
+    `buffer_size` they are compressed whole and keep an exact Content-Length. Larger files and
+    responses without a length (streamed generators) are compressed chunk by chunk with a flush
+    after each, so nothing is held in memory or back from the client.
+    Already encoded, partial and no-transform responses, HEAD requests and WebSocket upgrades
+    pass through untouched.
+    """
+
+    def __init__(self, app, mimetypes=COMPRESS_MIMETYPES, minimum_size=1024, buffer_size=1024 * 1024,
+                 level=6, brotli_quality=4):
+        self.app = app
+        self.mimetypes = frozenset(mimetypes)
+        self.minimum_size = minimum_size
+        self.buffer_size = buffer_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli and accepted['br']:
+            return _Brotli(self.brotli_quality)
+        if accepted['gzip']:
+            return _Gzip(self.level)
+        return None
+
+    @staticmethod
+    def _revalidates_weak(environ, headers):
+        tag, weak = unquote_etag(_header(headers, 'ETag'))
+        if tag is None or weak:
+            return False
+        return parse_etags(environ.get('HTTP_IF_NONE_MATCH')).is_weak(tag)
+
+    def _allowed_type(self, headers):
+        content_type = (_header(headers, 'Content-Type') or '').split(';')[0].strip().lower()
+        return content_type in self.mimetypes
+
+    def _compressible(self, status, headers):
+        if int(status.split(' ', 1)[0]) in (204, 206, 304):
+            return False
+        if _header(headers, 'Content-Encoding') or _header(headers, 'Content-Range'):
+            return False
+        return 'no-transform' not in (_header(headers, 'Cache-Control') or '').lower()
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or environ.get('HTTP_UPGRADE'):
+            return self.app(environ, start_response)
+
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            # Legacy write() callable; its data is sent ahead of the iterable
+            return captured.setdefault('written', []).append
+
+        app_iter = self.app(environ, capture)
+        return self._respond(environ, start_response, app_iter, captured)
+
+    def _respond(self, environ, start_response, app_iter, captured):
+        try:
+            chunks = iter(app_iter)
+            # start_response must have been called before the first body chunk is produced
+            first = next(chunks, None)
+            body_start = captured.pop('written', []) + ([first] if first is not None else [])
+            status, headers = captured['status'], list(captured['headers'])
+
+            if status.startswith('304') and self._revalidates_weak(environ, headers):
+                # Werkzeug drops Content-Type from 304s; a client holding the weak ETag was sent the compressed 200
+                headers = _vary_on_encoding(_weak_etag(headers))
+                start_response(status, headers, captured['exc_info'])
+                yield from body_start
+                yield from chunks
+                return
+
+            if not self._allowed_type(headers):
+                start_response(status, headers, captured['exc_info'])
+                yield from body_start
+                yield from chunks
+                return
+
+            # The representation depends on Accept-Encoding whether or not this response gets compressed
+            headers = _vary_on_encoding(headers)
+
+            if not self._compressible(status, headers):
+                start_response(status, headers, captured['exc_info'])
+                yield from body_start
+                yield from chunks
+                return
+
+            compressor = self._compressor(environ)
+            length = _header(headers, 'Content-Length')
+            if length is None and isinstance(app_iter, (list, tuple)):
+                # e.g. Engine.IO polling payloads: a complete body without a length header
+                length = sum(len(chunk) for chunk in body_start) + sum(len(chunk) for chunk in app_iter[1:])
+            if compressor is None or (length is not None and int(length) < self.minimum_size):
+                start_response(status, headers, captured['exc_info'])
+                yield from body_start
+                yield from chunks
+                return
+
+            # Byte ranges of the identity body do not apply to the compressed one
+            headers = _without(_without(headers, 'Content-Length'), 'Accept-Ranges')
+            headers.append(('Content-Encoding', compressor.name))
+            # The compressed bytes are a different representation of the same resource
+            headers = _weak_etag(headers)
+
+            if length is not None and int(length) <= self.buffer_size:
+                # Whole body known up front: compress it in one go and send an exact length
+                data = b''.join(body_start) + b''.join(chunks)
+                compressed = compressor.compress(data) + compressor.finish()
+                start_response(status, headers + [('Content-Length', str(len(compressed)))], captured['exc_info'])
+                yield compressed
+                return
+
+            start_response(status, headers, captured['exc_info'])
+            for chunk in body_start:
+                yield compressor.compress(chunk) + compressor.flush()
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def init_compression(app):
+    """
+    Wrap the WSGI app (including the Socket.IO middleware, so long-polling payloads are covered)
+    in response compression. Set COMPRESS_ENABLED to False when a front proxy compresses instead.
+    """
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIMETYPES', COMPRESS_MIMETYPES)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_BUFFER_SIZE', 1024 * 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+
+    if app.config['COMPRESS_ENABLED']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            mimetypes=app.config['COMPRESS_MIMETYPES'],
+            minimum_size=app.config['COMPRESS_MIN_SIZE'],
+            buffer_size=app.config['COMPRESS_BUFFER_SIZE'],
+            level=app.config['COMPRESS_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+        )
@@ -0,0 +1,337 @@
+from datetime import datetime, timedelta
+from io import StringIO
+import csv
+import hashlib
+import json
+import logging
+import os
+
+from flask import current_app
+from sqlalchemy import and_, or_
+from werkzeug.datastructures import MultiDict
+
+from app.extensions import db
+from app.leader import leader_only
+from app.models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip when an export walks a query with yield_per
+EXPORT_BATCH_SIZE = 1000
+
+# Characters buffered before a chunk is handed to the response
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def stream_csv(header, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV text in chunks of roughly chunk_size characters, so memory stays flat however many rows there are"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+
+def write_csv(header, rows, title, output):
+    """Write rows to a binary file object as UTF-8 CSV"""
+    for chunk in stream_csv(header, rows):
+        output.write(chunk.encode('utf-8'))
+
+
+def write_jsonl(header, rows, title, output):
+    """Write rows that are already dicts as JSON Lines"""
+    from app.serializers import dumps
+
+    for row in rows:
+        output.write(dumps(row) + b'\n')
+
+
+def write_xlsx(header, rows, title, output):
+    """Write rows to an .xlsx file object with openpyxl's write-only mode, which streams rows to disk as they come"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(output)
+
+
+PDF_MARGIN = 72
+PDF_HEADER_HEIGHT = 30
+PDF_ROW_HEIGHT = 18
+
+PDF_TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), 'grey'),
+    ('TEXTCOLOR', (0, 0), (-1, 0), 'whitesmoke'),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 1), (-1, -1), 'beige'),
+    ('GRID', (0, 0), (-1, -1), 1, 'black')
+]
+
+
+def write_pdf(header, rows, title, output):
+    """
+    Write rows to a landscape PDF one page-sized table at a time.
+    Only the rows for the page being drawn are held in memory, instead of a single
+    Table for the whole export that reportlab has to lay out before emitting anything.
+    """
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    page_width, page_height = landscape(letter)
+    frame_width = page_width - 2 * PDF_MARGIN
+    pdf = canvas.Canvas(output, pagesize=(page_width, page_height))
+    style = TableStyle(PDF_TABLE_STYLE)
+
+    heading = Paragraph(title, getSampleStyleSheet()['Heading1'])
+    _, heading_height = heading.wrapOn(pdf, frame_width, page_height)
+    heading.drawOn(pdf, PDF_MARGIN, page_height - PDF_MARGIN - heading_height)
+    top = page_height - PDF_MARGIN - heading_height - 12
+
+    def rows_per_page(top):
+        return max(int((top - PDF_MARGIN - PDF_HEADER_HEIGHT) // PDF_ROW_HEIGHT), 1)
+
+    def draw_page(batch, top):
+        table = Table([header] + batch, rowHeights=[PDF_HEADER_HEIGHT] + [PDF_ROW_HEIGHT] * len(batch))
+        table.setStyle(style)
+        width, height = table.wrapOn(pdf, frame_width, top - PDF_MARGIN)
+        table.drawOn(pdf, (page_width - width) / 2, top - height)
+        pdf.showPage()
+
+    batch = []
+    drawn = False
+    for row in rows:
+        batch.append(['' if value is None else str(value) for value in row])
+        if len(batch) == rows_per_page(top):
+            draw_page(batch, top)
+            batch = []
+            drawn = True
+            top = page_height - PDF_MARGIN
+
+    if batch or not drawn:
+        draw_page(batch, top)
+    pdf.save()
+
+
+def send_export(write, header, rows, title, download_name, mimetype):
+    """Build an export into a temporary file and send it; the file is closed once the response is sent"""
+    import tempfile
+    from flask import send_file
+
+    output = tempfile.TemporaryFile()
+    try:
+        write(header, rows, title, output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return send_file(output, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+
+# Background exports
+
+# Filters each export type accepts; anything else in the request is ignored
+EXPORT_PARAMS = {
+    'logs': ('type', 'search', 'date_from', 'date_to', 'role', 'status', 'action'),
+    'inquiries': ('office', 'status', 'date_range', 'search', 'start_date', 'end_date'),
+}
+
+# format -> (writer, file extension, mimetype)
+EXPORT_FORMATS = {
+    'csv': (write_csv, 'csv', 'text/csv'),
+    'excel': (write_xlsx, 'xlsx', XLSX_MIMETYPE),
+    'pdf': (write_pdf, 'pdf', 'application/pdf'),
+    'json': (write_jsonl, 'jsonl', 'application/x-ndjson'),
+}
+
+flask_app = None
+
+
+def export_params(export_type, args):
+    """The non-empty filters for an export, taken from request args or form data"""
+    return {key: args.get(key) for key in EXPORT_PARAMS[export_type] if args.get(key)}
+
+
+def export_cache_key(export_type, export_format, params):
+    payload = json.dumps([export_type, export_format, params], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def export_source(export_type, export_format, params):
+    """(header, ordered query, row formatter, title) for an export; the row builders live with their routes"""
+    if export_type == 'logs':
+        from app.admin.routes.audit_logs import log_export_source
+        return log_export_source(params.get('type', 'all'), export_format, params)
+    if export_type == 'inquiries':
+        from app.admin.routes.admin_inquiries import inquiry_export_source
+        return inquiry_export_source(export_format, MultiDict(params))
+    raise ValueError(f"Unknown export type {export_type}")
+
+
+def start_export(export_type, export_format, params, user):
+    """
+    Queue an export and return (ExportJob, reused).
+    A request with the same type, format and filters as a finished, unexpired export (or one
+    still being built) gets that export back instead of starting a new run.
+    """
+    from app.jobs.tasks import build_export
+
+    if export_type not in EXPORT_PARAMS:
+        raise ValueError(f"Unknown export type {export_type}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {export_format}")
+
+    cache_key = export_cache_key(export_type, export_format, params)
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=current_app.config['EXPORT_TTL_SECONDS'])
+
+    existing = ExportJob.query.filter(
+        ExportJob.cache_key == cache_key,
+        or_(
+            and_(ExportJob.status == 'completed', ExportJob.expires_at > now),
+            # A run older than the TTL that never finished is assumed lost
+            and_(ExportJob.status.in_(['queued', 'running']), ExportJob.created_at > now - ttl)
+        )
+    ).order_by(ExportJob.created_at.desc()).first()
+
+    if existing and (existing.status != 'completed' or os.path.exists(existing.file_path)):
+        return existing, True
+
+    export = ExportJob(
+        requested_by_id=user.id,
+        export_type=export_type,
+        export_format=export_format,
+        params=json.dumps(params),
+        cache_key=cache_key,
+        status='queued'
+    )
+    db.session.add(export)
+    db.session.commit()
+
+    build_export.delay(export_id=export.id)
+    return export, False
+
+
+def _report_progress(export, rows):
+    """Pass rows through, pushing a progress event to the export's watchers every batch"""
+    from app.websockets.dashboard import broadcast_export_progress
+
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % EXPORT_BATCH_SIZE == 0:
+            broadcast_export_progress(export, written)
+
+
+def run_export(export_id):
+    """Build the file for an ExportJob into EXPORT_FOLDER; runs on a job worker"""
+    from app.websockets.dashboard import broadcast_export_progress
+
+    export = db.session.get(ExportJob, export_id)
+    if export is None or export.status == 'completed':
+        return
+
+    export.status = 'running'
+    export.error = None
+    export.started_at = datetime.utcnow()
+    db.session.commit()
+
+    folder = current_app.config['EXPORT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    write, extension, _ = EXPORT_FORMATS[export.export_format]
+    file_path = os.path.join(folder, f"{export.cache_key[:16]}_{export.id}.{extension}")
+    temp_path = f"{file_path}.part"
+
+    try:
+        header, query, to_row, title = export_source(
+            export.export_type, export.export_format, json.loads(export.params or '{}')
+        )
+        export.total_rows = query.order_by(None).count()
+        db.session.commit()
+        broadcast_export_progress(export, 0)
+
+        rows = _report_progress(export, (to_row(row) for row in query.yield_per(EXPORT_BATCH_SIZE)))
+        with open(temp_path, 'wb') as output:
+            write(header, rows, title, output)
+        os.replace(temp_path, file_path)
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        export.status = 'failed'
+        export.error = str(e)[:255]
+        db.session.commit()
+        broadcast_export_progress(export, 0)
+        # Let the job queue retry it
+        raise
+
+    now = datetime.utcnow()
+    export.status = 'completed'
+    export.file_path = file_path
+    export.file_size = os.path.getsize(file_path)
+    export.completed_at = now
+    export.expires_at = now + timedelta(seconds=current_app.config['EXPORT_TTL_SECONDS'])
+    db.session.commit()
+    broadcast_export_progress(export, export.total_rows)
+    logger.info(f"Export {export.id} ({export.export_type}/{export.export_format}) finished: {export.total_rows} rows")
+
+
+def purge_expired_exports(now=None):
+    """Delete export files past their TTL and forget failed runs; returns the number of exports removed"""
+    now = now or datetime.utcnow()
+    ttl = timedelta(seconds=current_app.config['EXPORT_TTL_SECONDS'])
+
+    expired = ExportJob.query.filter(or_(
+        ExportJob.expires_at <= now,
+        and_(ExportJob.status != 'completed', ExportJob.created_at <= now - ttl)
+    )).all()
+
+    for export in expired:
+        if export.file_path and os.path.exists(export.file_path):
+            try:
+                os.remove(export.file_path)
+            except OSError as e:
+                logger.warning(f"Could not remove export file {export.file_path}: {str(e)}")
+                continue
+        db.session.delete(export)
+
+    db.session.commit()
+    return len(expired)
+
+
+@leader_only
+def run_export_cleanup():
+    """Scheduler job; removes expired export files"""
+    with flask_app.app_context():
+        try:
+            removed = purge_expired_exports()
+            if removed:
+                logger.info(f"Removed {removed} expired exports")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error removing expired exports: {str(e)}")
+
+
+def init_exports(app):
+    """Configure where background exports are written and how long they are kept"""
+    global flask_app
+    flask_app = app
+
+    app.config.setdefault('EXPORT_FOLDER', os.path.join(app.instance_path, 'exports'))
+    app.config.setdefault('EXPORT_TTL_SECONDS', 3600)
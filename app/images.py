@@ -0,0 +1,120 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+from app.media import media_url
+from app.storage import delete_stored_file, get_storage
+
+# Longest edge in pixels for each derivative, smallest first
+IMAGE_VARIANTS = (
+    ('thumb', 160),
+    ('feed', 720),
+    ('full', 1600),
+)
+
+# Every variant is written in each format: WebP for browsers that take it, JPEG as the fallback
+IMAGE_FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def derivative_path(relative_path, variant, extension):
+    """
+    Path of a derivative next to its source, e.g. uploads/announcements/3f/3fa9..._feed.webp.
+    Sources are content-addressed, so derivatives are shared by identical uploads too.
+    """
+    stem = os.path.splitext(relative_path)[0]
+    return f"{stem}_{variant}.{extension}"
+
+
+def profile_pic_path(profile_pic):
+    """Path below the static folder for a User.profile_pic value, whichever form it was stored in"""
+    if profile_pic.startswith('/static/'):
+        return profile_pic[len('/static/'):]
+    if profile_pic.startswith('uploads/'):
+        return profile_pic
+    return f"uploads/profile_pics/{profile_pic}"
+
+
+def _flatten(image):
+    # JPEG has no alpha channel; composite transparent images onto white
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _save(image, relative_path, pil_format, options):
+    storage = get_storage()
+    if storage.exists(relative_path):
+        return
+    # Derivatives are small; encode in memory and store in one write
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, **options)
+    storage.put_bytes(relative_path, buffer.getvalue())
+
+
+def build_variants(relative_path):
+    """
+    Write the thumb/feed/full derivatives of a stored image in WebP and JPEG.
+    Images are only ever scaled down. Returns the JSON stored on the model:
+    {'thumb': {'width': 160, 'height': 120, 'webp': path, 'jpeg': path}, ...}
+    """
+    variants = {}
+    with get_storage().local_copy(relative_path) as path, Image.open(path) as source:
+        # Phone photos carry their rotation in EXIF, which the re-encoded files drop
+        image = _flatten(ImageOps.exif_transpose(source))
+
+    for name, edge in IMAGE_VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for extension, pil_format, options in IMAGE_FORMATS:
+            variant[extension] = derivative_path(relative_path, name, extension)
+            _save(resized, variant[extension], pil_format, options)
+        variants[name] = variant
+    return variants
+
+
+def delete_variants(relative_path):
+    """Remove the derivatives of a stored image; callers check the source is no longer referenced"""
+    for name, _ in IMAGE_VARIANTS:
+        for extension, _, _ in IMAGE_FORMATS:
+            delete_stored_file(derivative_path(relative_path, name, extension))
+
+
+def image_srcset(variants, image_format='webp'):
+    """`srcset` value listing every derivative of one format with its width"""
+    if not variants:
+        return ''
+    return ', '.join(
+        f"{media_url(variants[name][image_format])} {variants[name]['width']}w"
+        for name, _ in IMAGE_VARIANTS if name in variants
+    )
+
+
+def image_url(variants, variant, fallback_path):
+    """JPEG URL of one derivative, or the original upload while the derivatives are still being built"""
+    if variants and variant in variants:
+        return media_url(variants[variant]['jpeg'])
+    return media_url(fallback_path)
+
+
+def profile_pic_url(user, variant='thumb'):
+    """Avatar URL for a user, preferring the resized derivative"""
+    if not user.profile_pic:
+        return None
+    return image_url(user.profile_pic_variants, variant, profile_pic_path(user.profile_pic))
+
+
+def init_images(app):
+    """Expose the derivative helpers to templates"""
+    app.jinja_env.globals.update(
+        image_srcset=image_srcset,
+        image_url=image_url,
+        profile_pic_url=profile_pic_url,
+    )
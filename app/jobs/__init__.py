@@ -0,0 +1,39 @@
+import logging
+
+import click
+
+from app.jobs.queue import job, job_queue, registry
+from app.jobs.backends import LocalBackend, RedisBackend
+
+logger = logging.getLogger(__name__)
+
+
+def init_jobs(app):
+    """Set up the background job queue and the `flask jobs worker` command"""
+    app.config.setdefault('JOB_QUEUE_BACKEND', 'local')  # 'local' or 'redis'
+    app.config.setdefault('JOB_QUEUE_LOCAL_WORKERS', 2)
+
+    # Register the job functions
+    from app.jobs import tasks
+
+    if app.config['JOB_QUEUE_BACKEND'] == 'redis':
+        if not app.config.get('REDIS_URL'):
+            raise RuntimeError("JOB_QUEUE_BACKEND is 'redis' but REDIS_URL is not configured")
+        backend = RedisBackend(job_queue, app.config['REDIS_URL'])
+    else:
+        backend = LocalBackend(job_queue, workers=app.config['JOB_QUEUE_LOCAL_WORKERS'])
+
+    job_queue.init_app(app, backend)
+    logger.info(f"Job queue initialized with {backend.name} backend ({len(registry)} job types)")
+
+    @app.cli.group('jobs')
+    def jobs_cli():
+        """Background job queue commands"""
+
+    @jobs_cli.command('worker')
+    @click.option('--recover', is_flag=True, help='Requeue jobs left in progress by a crashed worker.')
+    def worker(recover):
+        """Run a Redis job worker in the foreground"""
+        if job_queue.backend.name != 'redis':
+            raise click.ClickException("The worker command needs JOB_QUEUE_BACKEND = 'redis'")
+        job_queue.backend.work(recover=recover)
@@ -0,0 +1,124 @@
+import base64
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value):
+    """JSON hook for job arguments that are not plain JSON (bytes payloads)"""
+    if isinstance(value, (bytes, bytearray)):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Job argument of type {type(value).__name__} is not serializable")
+
+
+def _decode(obj):
+    if '__bytes__' in obj and len(obj) == 1:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+class LocalBackend:
+    """
+    In-process queue drained by a small pool of worker threads (green threads under eventlet).
+    Jobs are lost if the process exits, which is acceptable for development and single-host setups.
+    """
+    name = 'local'
+
+    def __init__(self, job_queue, workers=2):
+        self.job_queue = job_queue
+        self.queue = queue.Queue()
+        self.workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def push(self, message, delay=0):
+        if delay > 0:
+            timer = threading.Timer(delay, self.queue.put, args=[message])
+            timer.daemon = True
+            timer.start()
+        else:
+            self.queue.put(message)
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _work(self):
+        while True:
+            message = self.queue.get()
+            try:
+                self.job_queue.execute(message)
+            except Exception as e:
+                logger.error(f"Unexpected error running job {message.get('id')}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+
+class RedisBackend:
+    """
+    Redis lists for ready jobs plus a sorted set for delayed retries.
+    Web processes only push; `flask jobs worker` processes pop and run.
+    """
+    name = 'redis'
+
+    # Move due delayed jobs onto the ready list atomically
+    PROMOTE_SCRIPT = """
+    local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+    for _, message in ipairs(due) do
+        redis.call('zrem', KEYS[1], message)
+        redis.call('lpush', KEYS[2], message)
+    end
+    return #due
+    """
+
+    def __init__(self, job_queue, url, prefix='piyuguide:jobs'):
+        import redis
+
+        self.job_queue = job_queue
+        self.client = redis.Redis.from_url(url)
+        self.ready_key = f"{prefix}:ready"
+        self.delayed_key = f"{prefix}:delayed"
+        self.processing_key = f"{prefix}:processing"
+
+    def push(self, message, delay=0):
+        payload = json.dumps(message, default=_encode)
+        if delay > 0:
+            self.client.zadd(self.delayed_key, {payload: time.time() + delay})
+        else:
+            self.client.lpush(self.ready_key, payload)
+
+    def pending(self):
+        return self.client.llen(self.ready_key) + self.client.zcard(self.delayed_key)
+
+    def recover(self):
+        """
+        Put back jobs left in the processing list by a worker that died mid-job.
+        Only safe when no other worker is running.
+        """
+        while self.client.rpoplpush(self.processing_key, self.ready_key):
+            pass
+
+    def work(self, poll_timeout=1, recover=False):
+        """Blocking worker loop"""
+        if recover:
+            self.recover()
+        logger.info("Redis job worker started")
+        while True:
+            self.client.eval(self.PROMOTE_SCRIPT, 2, self.delayed_key, self.ready_key, time.time())
+
+            payload = self.client.brpoplpush(self.ready_key, self.processing_key, timeout=poll_timeout)
+            if payload is None:
+                continue
+
+            try:
+                message = json.loads(payload, object_hook=_decode)
+                self.job_queue.execute(message)
+            except Exception as e:
+                logger.error(f"Unexpected error running job: {str(e)}")
+            finally:
+                self.client.lrem(self.processing_key, 1, payload)
@@ -0,0 +1,257 @@
+from datetime import datetime
+from threading import Lock
+import inspect
+import json
+import logging
+import random
+import time
+import traceback
+import typing
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# name -> JobFunction, filled by the @job decorator at import time
+registry = {}
+
+
+class JobFunction:
+    """A registered background job; call .delay(...) to enqueue it"""
+
+    def __init__(self, func, name, max_retries, backoff_seconds, max_backoff_seconds):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.signature = inspect.signature(func)
+        self.type_hints = typing.get_type_hints(func)
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __call__(self, *args, **kwargs):
+        # Calling the job directly runs it inline, like a normal function
+        return self.func(*args, **kwargs)
+
+    def delay(self, **kwargs):
+        """Validate the arguments against the job signature and enqueue it"""
+        self.validate(kwargs)
+        return job_queue.enqueue(self.name, kwargs)
+
+    def validate(self, kwargs):
+        try:
+            bound = self.signature.bind(**kwargs)
+        except TypeError as e:
+            raise TypeError(f"Invalid arguments for job {self.name}: {str(e)}")
+
+        for arg_name, value in bound.arguments.items():
+            expected = self.type_hints.get(arg_name)
+            if not _matches_type(value, expected):
+                raise TypeError(
+                    f"Job {self.name} expects {arg_name} to be {expected}, got {type(value).__name__}"
+                )
+
+    def retry_delay(self, attempt):
+        """Exponential backoff with jitter for the given (1-based) attempt"""
+        delay = min(self.backoff_seconds * (2 ** (attempt - 1)), self.max_backoff_seconds)
+        return delay * random.uniform(0.8, 1.2)
+
+
+def _matches_type(value, expected):
+    if expected is None or expected is typing.Any:
+        return True
+
+    origin = typing.get_origin(expected)
+    if origin is typing.Union:
+        return any(_matches_type(value, arg) for arg in typing.get_args(expected))
+    if expected is type(None):
+        return value is None
+    if origin is not None:
+        expected = origin
+    if expected is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(expected, type):
+        return isinstance(value, expected)
+    return True
+
+
+def _describe(value):
+    """Stand-in for non-JSON arguments (e.g. file bytes) when storing dead letters"""
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return repr(value)
+
+
+def job(name=None, max_retries=3, backoff_seconds=2, max_backoff_seconds=300):
+    """
+    Register a function as a background job.
+    Arguments are passed by keyword and checked against the function's type hints on enqueue.
+    """
+    def decorator(func):
+        job_function = JobFunction(
+            func,
+            name or func.__name__,
+            max_retries,
+            backoff_seconds,
+            max_backoff_seconds
+        )
+        registry[job_function.name] = job_function
+        return job_function
+    return decorator
+
+
+class JobMetrics:
+    """In-process counters and latency figures per job name"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}
+
+    def _get(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = {
+                'enqueued': 0,
+                'succeeded': 0,
+                'failed': 0,
+                'retried': 0,
+                'dead_lettered': 0,
+                'run_time_total_ms': 0.0,
+                'run_time_max_ms': 0.0,
+                'run_time_last_ms': None,
+                'queue_wait_total_ms': 0.0,
+                'queue_wait_max_ms': 0.0
+            }
+        return stats
+
+    def record_enqueued(self, name):
+        with self._lock:
+            self._get(name)['enqueued'] += 1
+
+    def record_run(self, name, succeeded, run_time_ms, queue_wait_ms):
+        with self._lock:
+            stats = self._get(name)
+            stats['succeeded' if succeeded else 'failed'] += 1
+            stats['run_time_total_ms'] += run_time_ms
+            stats['run_time_max_ms'] = max(stats['run_time_max_ms'], run_time_ms)
+            stats['run_time_last_ms'] = run_time_ms
+            stats['queue_wait_total_ms'] += queue_wait_ms
+            stats['queue_wait_max_ms'] = max(stats['queue_wait_max_ms'], queue_wait_ms)
+
+    def record_retry(self, name):
+        with self._lock:
+            self._get(name)['retried'] += 1
+
+    def record_dead_letter(self, name):
+        with self._lock:
+            self._get(name)['dead_lettered'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                runs = stats['succeeded'] + stats['failed']
+                result[name] = dict(stats)
+                result[name]['run_time_avg_ms'] = round(stats['run_time_total_ms'] / runs, 2) if runs else None
+                result[name]['queue_wait_avg_ms'] = round(stats['queue_wait_total_ms'] / runs, 2) if runs else None
+            return result
+
+
+class JobQueue:
+    """Front end shared by request handlers and workers; delegates transport to a backend"""
+
+    def __init__(self):
+        self.app = None
+        self.backend = None
+        self.metrics = JobMetrics()
+
+    def init_app(self, app, backend):
+        self.app = app
+        self.backend = backend
+
+    def enqueue(self, name, kwargs, attempt=0, delay=0, job_id=None):
+        if self.backend is None:
+            raise RuntimeError("Job queue is not initialized")
+
+        message = {
+            'id': job_id or uuid.uuid4().hex,
+            'name': name,
+            'kwargs': kwargs,
+            'attempt': attempt,
+            'enqueued_at': time.time() + delay
+        }
+        self.backend.push(message, delay)
+        if attempt == 0:
+            self.metrics.record_enqueued(name)
+        return message['id']
+
+    def execute(self, message):
+        """Run one job message; used by every backend's worker loop"""
+        name = message['name']
+        job_function = registry.get(name)
+        queue_wait_ms = max(0.0, (time.time() - message['enqueued_at']) * 1000)
+
+        if job_function is None:
+            logger.error(f"Unknown job {name}, sending to dead letters")
+            self._dead_letter(message, f"Unknown job {name}", None)
+            return
+
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                job_function.func(**message['kwargs'])
+        except Exception as e:
+            run_time_ms = (time.perf_counter() - started) * 1000
+            self.metrics.record_run(name, False, run_time_ms, queue_wait_ms)
+            self._handle_failure(job_function, message, e)
+            return
+
+        run_time_ms = (time.perf_counter() - started) * 1000
+        self.metrics.record_run(name, True, run_time_ms, queue_wait_ms)
+        logger.debug(f"Job {name} ({message['id']}) finished in {run_time_ms:.1f} ms")
+
+    def _handle_failure(self, job_function, message, error):
+        attempt = message['attempt'] + 1
+        if attempt <= job_function.max_retries:
+            delay = job_function.retry_delay(attempt)
+            logger.warning(
+                f"Job {job_function.name} ({message['id']}) failed: {str(error)}; "
+                f"retry {attempt}/{job_function.max_retries} in {delay:.1f}s"
+            )
+            self.metrics.record_retry(job_function.name)
+            self.enqueue(job_function.name, message['kwargs'], attempt=attempt, delay=delay, job_id=message['id'])
+        else:
+            logger.error(f"Job {job_function.name} ({message['id']}) failed permanently: {str(error)}")
+            self._dead_letter(message, str(error), traceback.format_exc())
+
+    def _dead_letter(self, message, error, error_traceback):
+        from app.extensions import db
+        from app.models import DeadLetterJob
+
+        self.metrics.record_dead_letter(message['name'])
+        try:
+            with self.app.app_context():
+                db.session.add(DeadLetterJob(
+                    job_id=message['id'],
+                    job_name=message['name'],
+                    payload=json.dumps(message['kwargs'], default=_describe),
+                    attempts=message['attempt'] + 1,
+                    error=error[:255] if error else None,
+                    traceback=error_traceback,
+                    backend=self.backend.name,
+                    enqueued_at=datetime.utcfromtimestamp(message['enqueued_at']),
+                    failed_at=datetime.utcnow()
+                ))
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error writing dead letter for job {message['id']}: {str(e)}")
+
+    def status(self):
+        return {
+            'backend': self.backend.name if self.backend else None,
+            'pending': self.backend.pending() if self.backend else None,
+            'jobs': self.metrics.snapshot()
+        }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.jobs.queue import job
+from app.models import Inquiry, OfficeAdmin, Notification, AnnouncementImage, User
+
+
+@job(max_retries=5)
+def build_announcement_image_variants(image_id: int) -> None:
+    """Generate the resized derivatives of an announcement image"""
+    from app.images import build_variants
+    from app.storage import get_storage
+
+    image = AnnouncementImage.query.get(image_id)
+    if not image or image.variants:
+        return
+
+    # Identical uploads share a stored file, so their derivatives may already exist
+    built = AnnouncementImage.query.filter(
+        AnnouncementImage.image_path == image.image_path,
+        AnnouncementImage.variants.isnot(None)
+    ).first()
+    image.variants = built.variants if built else build_variants(image.image_path)
+    # Charged to the storage usage ledger on commit
+    image.file_size = get_storage().size(image.image_path)
+    db.session.commit()
+
+
+@job(max_retries=5)
+def build_profile_pic_variants(user_id: int, profile_pic: str) -> None:
+    """Generate the resized derivatives of a profile picture"""
+    from app.images import build_variants, profile_pic_path
+
+    user = User.query.get(user_id)
+    # Skip pictures that were replaced or removed before the job ran
+    if not user or user.profile_pic != profile_pic:
+        return
+
+    user.profile_pic_variants = build_variants(profile_pic_path(profile_pic))
+    db.session.commit()
+
+
+@job()
+def notify_office_admins(inquiry_id: int, sender_name: str) -> None:
+    """Fan out a 'New Message' notification to every admin of the inquiry's office"""
+    inquiry = Inquiry.query.get(inquiry_id)
+    if not inquiry:
+        return
+
+    admin_user_ids = [
+        user_id for (user_id,) in db.session.query(OfficeAdmin.user_id).filter(
+            OfficeAdmin.office_id == inquiry.office_id
+        )
+    ]
+    if not admin_user_ids:
+        return
+
+    now = datetime.utcnow()
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': user_id,
+            'title': "New Message",
+            'message': f"New message from {sender_name} in inquiry '{inquiry.subject}'",
+            'is_read': False,
+            'notification_type': 'inquiry_reply',
+            'inquiry_id': inquiry_id,
+            'created_at': now
+        }
+        for user_id in admin_user_ids
+    ])
+    db.session.commit()
+
+
+@job(max_retries=2, backoff_seconds=10)
+def build_export(export_id: int) -> None:
+    """Produce the file for a queued ExportJob"""
+    from app.exports import run_export
+    run_export(export_id)
@@ -0,0 +1,254 @@
+from datetime import datetime
+from functools import wraps
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import text
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary 64-bit key shared by every process that runs the scheduler
+ADVISORY_LOCK_KEY = 727100401
+
+
+class _LocalLock:
+    """Single-process fallback (SQLite/dev): this instance is always the leader"""
+    name = 'local'
+
+    def acquire(self):
+        return True
+
+    def renew(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class _PostgresAdvisoryLock:
+    """
+    Session-level pg_try_advisory_lock held on a dedicated connection.
+    Postgres releases it automatically if the process or connection dies.
+    """
+    name = 'postgres'
+
+    def __init__(self, app, key):
+        self.app = app
+        self.key = key
+        self.connection = None
+
+    def acquire(self):
+        with self.app.app_context():
+            connection = db.engine.connect()
+        try:
+            acquired = connection.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key}
+            ).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+
+        if acquired:
+            self.connection = connection
+        else:
+            connection.close()
+        return bool(acquired)
+
+    def renew(self):
+        # The lock lives as long as the connection; make sure it is still alive
+        if self.connection is None:
+            return False
+        try:
+            self.connection.execute(text("SELECT 1")).scalar()
+            self.connection.commit()
+            return True
+        except Exception:
+            self._close()
+            return False
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+            self.connection.commit()
+        except Exception as e:
+            logger.warning(f"Error releasing advisory lock: {str(e)}")
+        self._close()
+
+    def _close(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+
+
+class _RedisLock:
+    """SET NX PX lock whose TTL is extended on every renewal by the current holder only"""
+    name = 'redis'
+
+    # Extend/delete only if we still own the key
+    RENEW_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+    RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url, key, token, ttl_ms):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+        self.token = token
+        self.ttl_ms = ttl_ms
+
+    def acquire(self):
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    def renew(self):
+        return bool(self.client.eval(self.RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    def release(self):
+        try:
+            self.client.eval(self.RELEASE_SCRIPT, 1, self.key, self.token)
+        except Exception as e:
+            logger.warning(f"Error releasing redis lock: {str(e)}")
+
+
+class LeaderElector:
+    """
+    Keeps trying to become the scheduler leader in the background.
+    The leader runs the APScheduler jobs; every other process keeps its scheduler
+    started but paused so it can take over as soon as the lock is free.
+    """
+
+    def __init__(self):
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.leader_since = None
+        self.last_check_at = None
+        self.last_error = None
+        self.lock = None
+        self.on_elected = None
+        self.on_demoted = None
+        self.on_renewed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def backend(self):
+        return self.lock.name if self.lock else None
+
+    def init_app(self, app, on_elected=None, on_demoted=None, on_renewed=None):
+        app.config.setdefault('LEADER_RENEW_SECONDS', 10)
+        app.config.setdefault('LEADER_LOCK_TTL_SECONDS', 30)
+        app.config.setdefault('LEADER_LOCK_NAME', 'piyuguide:scheduler-leader')
+
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_renewed = on_renewed
+        self.renew_seconds = app.config['LEADER_RENEW_SECONDS']
+
+        if app.config.get('REDIS_URL'):
+            self.lock = _RedisLock(
+                app.config['REDIS_URL'],
+                app.config['LEADER_LOCK_NAME'],
+                self.instance_id,
+                app.config['LEADER_LOCK_TTL_SECONDS'] * 1000
+            )
+        elif app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            self.lock = _PostgresAdvisoryLock(app, ADVISORY_LOCK_KEY)
+        else:
+            self.lock = _LocalLock()
+
+        # Try once synchronously so a single instance is leader right after startup
+        self._tick()
+
+        self._thread = threading.Thread(target=self._run, name='scheduler-leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.is_leader:
+            self.lock.release()
+            self._set_leader(False)
+
+    def status(self):
+        return {
+            'instance_id': self.instance_id,
+            'backend': self.backend,
+            'is_leader': self.is_leader,
+            'leader_since': self.leader_since.isoformat() if self.leader_since else None,
+            'last_check_at': self.last_check_at.isoformat() if self.last_check_at else None,
+            'last_error': self.last_error
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.renew_seconds):
+            self._tick()
+
+    def _tick(self):
+        try:
+            if self.is_leader:
+                held = self.lock.renew()
+            else:
+                held = self.lock.acquire()
+            self.last_error = None
+        except Exception as e:
+            logger.error(f"Leader election error: {str(e)}")
+            self.last_error = str(e)
+            held = False
+
+        self.last_check_at = datetime.utcnow()
+        if held != self.is_leader:
+            self._set_leader(held)
+        elif held and self.on_renewed:
+            try:
+                self.on_renewed()
+            except Exception as e:
+                logger.error(f"Error in leadership callback: {str(e)}")
+
+    def _set_leader(self, is_leader):
+        self.is_leader = is_leader
+        if is_leader:
+            self.leader_since = datetime.utcnow()
+            logger.info(f"Instance {self.instance_id} became scheduler leader ({self.backend})")
+            callback = self.on_elected
+        else:
+            self.leader_since = None
+            logger.info(f"Instance {self.instance_id} is now a scheduler standby")
+            callback = self.on_demoted
+
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in leadership callback: {str(e)}")
+
+
+leader = LeaderElector()
+
+
+def leader_only(f):
+    """Skip a scheduled job on instances that do not currently hold leadership"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not leader.is_leader:
+            logger.info(f"Skipping {f.__name__}: this instance is not the scheduler leader")
+            return None
+        return f(*args, **kwargs)
+    return decorated_function
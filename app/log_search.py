@@ -0,0 +1,109 @@
+import click
+from sqlalchemy import or_, select, text
+
+from app.extensions import db
+from app.models import (
+    User, Student, Office, OfficeAdmin,
+    AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog
+)
+
+# Tables carrying the *_trgm GIN indexes declared on the models (Postgres only)
+TRGM_MODELS = (User, Office, AuditLog, StudentActivityLog, SuperAdminActivityLog)
+
+
+def contains_pattern(term):
+    """ILIKE pattern for a substring search with the user's wildcards escaped"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _ilike(column, pattern):
+    return column.ilike(pattern, escape='\\')
+
+
+def _matching_user_ids(pattern):
+    # users is small next to the log tables; each column has its own trigram index
+    return select(User.id).where(or_(
+        _ilike(User.first_name, pattern),
+        _ilike(User.last_name, pattern),
+        _ilike(User.email, pattern)
+    ))
+
+
+def log_search_filter(model, term):
+    """
+    WHERE clause for a free-text log search.
+    Actor name/email matches are resolved against users first, so the log table is only
+    probed through its actor index and the trigram indexes on its own text columns instead
+    of an OR across a join, which Postgres can only answer with a sequential scan.
+    On SQLite the same SQL runs without the indexes.
+    """
+    pattern = contains_pattern(term)
+
+    if model is AuditLog:
+        return or_(
+            AuditLog.actor_id.in_(_matching_user_ids(pattern)),
+            _ilike(AuditLog.action, pattern),
+            _ilike(AuditLog.target_type, pattern)
+        )
+
+    if model is StudentActivityLog:
+        student_ids = select(Student.id).where(Student.user_id.in_(_matching_user_ids(pattern)))
+        return or_(
+            StudentActivityLog.student_id.in_(student_ids),
+            _ilike(StudentActivityLog.action, pattern)
+        )
+
+    if model is SuperAdminActivityLog:
+        return or_(
+            SuperAdminActivityLog.super_admin_id.in_(_matching_user_ids(pattern)),
+            _ilike(SuperAdminActivityLog.action, pattern),
+            _ilike(SuperAdminActivityLog.target_type, pattern)
+        )
+
+    if model is OfficeLoginLog:
+        office_admin_ids = select(OfficeAdmin.id).join(Office, OfficeAdmin.office_id == Office.id).where(or_(
+            OfficeAdmin.user_id.in_(_matching_user_ids(pattern)),
+            _ilike(Office.name, pattern)
+        ))
+        return OfficeLoginLog.office_admin_id.in_(office_admin_ids)
+
+    raise ValueError(f"No log search defined for {model.__name__}")
+
+
+def create_search_indexes(connection):
+    """Install pg_trgm and build any missing trigram indexes; returns the names created"""
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    existing = {
+        name for (name,) in connection.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'"
+        ))
+    }
+    created = []
+    for model in TRGM_MODELS:
+        for index in model.__table__.indexes:
+            if index.name.endswith('_trgm') and index.name not in existing:
+                index.create(bind=connection)
+                created.append(index.name)
+    return created
+
+
+def init_log_search(app):
+    """Register the `flask logs search-setup` command"""
+    # The `logs` command group is created by init_partitions
+    logs_cli = app.cli.commands['logs']
+
+    @logs_cli.command('search-setup')
+    def log_search_setup():
+        """Install pg_trgm and build the trigram indexes used by the audit log search"""
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            raise click.ClickException("Trigram indexes need PostgreSQL; SQLite searches run unindexed")
+
+        with db.engine.begin() as connection:
+            created = create_search_indexes(connection)
+
+        for name in created:
+            click.echo(f"created {name}")
+        if not created:
+            click.echo("All search indexes already exist")
@@ -0,0 +1,260 @@
+from datetime import datetime
+import base64
+import json
+
+import click
+from sqlalchemy import Integer, String, and_, cast, literal, null, or_, select, text, union_all
+
+from app.extensions import db
+from app.models import (
+    User, Student, OfficeAdmin,
+    AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog
+)
+
+# Composite indexes that let every branch of the timeline read newest-first for one user
+TIMELINE_MODELS = (AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog)
+TIMELINE_INDEX_COLUMNS = ('actor_id', 'student_id', 'office_admin_id', 'super_admin_id', 'target_user_id')
+
+INVOLVEMENTS = ('any', 'actor', 'target')
+
+
+def encode_timeline_cursor(row):
+    payload = {'t': row.timestamp.isoformat(), 's': row.source, 'i': row.log_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_timeline_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['t']), payload['s'], int(payload['i'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _null(type_):
+    # Untyped NULLs in a UNION branch make Postgres guess text
+    return cast(null(), type_)
+
+
+def _seek(source, timestamp_column, id_column, cursor):
+    """
+    Rows strictly after the cursor in (timestamp desc, source desc, id desc) order.
+    The source is constant within a branch, so the comparison reduces to a plain range on
+    (timestamp, id) that the branch's index can answer.
+    """
+    cursor_time, cursor_source, cursor_id = cursor
+    if source < cursor_source:
+        return timestamp_column <= cursor_time
+    if source == cursor_source:
+        return or_(
+            timestamp_column < cursor_time,
+            and_(timestamp_column == cursor_time, id_column < cursor_id)
+        )
+    return timestamp_column < cursor_time
+
+
+def _branch(source, query, timestamp_column, id_column, conditions, cursor, limit):
+    if cursor:
+        conditions = conditions + [_seek(source, timestamp_column, id_column, cursor)]
+    # Each branch is cut to the page size first, so the UNION only merges a few rows per table
+    return select(
+        query.where(*conditions).order_by(timestamp_column.desc(), id_column.desc()).limit(limit).subquery()
+    )
+
+
+def timeline_query(user_id=None, involvement='any', start=None, end=None, cursor=None, limit=50):
+    """
+    UNION ALL over the four log tables with a common projection:
+    source, log_id, actor_user_id, actor_role, action, target_type, related_id,
+    target_user_id, office_id, is_success, ip_address, timestamp.
+    Filters by the user who acted (`actor`), was acted on (`target`) or either (`any`),
+    and by a [start, end) time range.
+    """
+    if involvement not in INVOLVEMENTS:
+        raise ValueError(f"involvement must be one of {', '.join(INVOLVEMENTS)}")
+
+    as_actor = user_id is not None and involvement in ('any', 'actor')
+    as_target = user_id is not None and involvement in ('any', 'target')
+    branches = []
+
+    def time_range(column):
+        conditions = []
+        if start:
+            conditions.append(column >= start)
+        if end:
+            conditions.append(column < end)
+        return conditions
+
+    # Only super admin actions record a target user, so the other tables only match as actor
+    if user_id is None or as_actor:
+        conditions = time_range(AuditLog.timestamp)
+        if user_id is not None:
+            conditions.append(AuditLog.actor_id == user_id)
+        branches.append(_branch('audit', select(
+            literal('audit', String).label('source'),
+            AuditLog.id.label('log_id'),
+            AuditLog.actor_id.label('actor_user_id'),
+            AuditLog.actor_role.label('actor_role'),
+            AuditLog.action.label('action'),
+            AuditLog.target_type.label('target_type'),
+            AuditLog.inquiry_id.label('related_id'),
+            _null(Integer).label('target_user_id'),
+            AuditLog.office_id.label('office_id'),
+            AuditLog.is_success.label('is_success'),
+            AuditLog.ip_address.label('ip_address'),
+            AuditLog.timestamp.label('timestamp')
+        ), AuditLog.timestamp, AuditLog.id, conditions, cursor, limit))
+
+        conditions = time_range(StudentActivityLog.timestamp)
+        if user_id is not None:
+            conditions.append(StudentActivityLog.student_id.in_(
+                select(Student.id).where(Student.user_id == user_id)
+            ))
+        branches.append(_branch('student', select(
+            literal('student', String).label('source'),
+            StudentActivityLog.id.label('log_id'),
+            Student.user_id.label('actor_user_id'),
+            literal('student', String).label('actor_role'),
+            StudentActivityLog.action.label('action'),
+            StudentActivityLog.related_type.label('target_type'),
+            StudentActivityLog.related_id.label('related_id'),
+            _null(Integer).label('target_user_id'),
+            _null(Integer).label('office_id'),
+            StudentActivityLog.is_success.label('is_success'),
+            StudentActivityLog.ip_address.label('ip_address'),
+            StudentActivityLog.timestamp.label('timestamp')
+        ).outerjoin(Student, StudentActivityLog.student_id == Student.id),
+            StudentActivityLog.timestamp, StudentActivityLog.id, conditions, cursor, limit))
+
+        conditions = time_range(OfficeLoginLog.login_time)
+        if user_id is not None:
+            conditions.append(OfficeLoginLog.office_admin_id.in_(
+                select(OfficeAdmin.id).where(OfficeAdmin.user_id == user_id)
+            ))
+        branches.append(_branch('office_login', select(
+            literal('office_login', String).label('source'),
+            OfficeLoginLog.id.label('log_id'),
+            OfficeAdmin.user_id.label('actor_user_id'),
+            literal('office_admin', String).label('actor_role'),
+            literal('Login', String).label('action'),
+            literal('authentication', String).label('target_type'),
+            _null(Integer).label('related_id'),
+            _null(Integer).label('target_user_id'),
+            OfficeAdmin.office_id.label('office_id'),
+            OfficeLoginLog.is_success.label('is_success'),
+            OfficeLoginLog.ip_address.label('ip_address'),
+            OfficeLoginLog.login_time.label('timestamp')
+        ).outerjoin(OfficeAdmin, OfficeLoginLog.office_admin_id == OfficeAdmin.id),
+            OfficeLoginLog.login_time, OfficeLoginLog.id, conditions, cursor, limit))
+
+    conditions = time_range(SuperAdminActivityLog.timestamp)
+    if as_actor and as_target:
+        conditions.append(or_(
+            SuperAdminActivityLog.super_admin_id == user_id,
+            SuperAdminActivityLog.target_user_id == user_id
+        ))
+    elif as_actor:
+        conditions.append(SuperAdminActivityLog.super_admin_id == user_id)
+    elif as_target:
+        conditions.append(SuperAdminActivityLog.target_user_id == user_id)
+    branches.append(_branch('super_admin', select(
+        literal('super_admin', String).label('source'),
+        SuperAdminActivityLog.id.label('log_id'),
+        SuperAdminActivityLog.super_admin_id.label('actor_user_id'),
+        literal('super_admin', String).label('actor_role'),
+        SuperAdminActivityLog.action.label('action'),
+        SuperAdminActivityLog.target_type.label('target_type'),
+        _null(Integer).label('related_id'),
+        SuperAdminActivityLog.target_user_id.label('target_user_id'),
+        SuperAdminActivityLog.target_office_id.label('office_id'),
+        SuperAdminActivityLog.is_success.label('is_success'),
+        SuperAdminActivityLog.ip_address.label('ip_address'),
+        SuperAdminActivityLog.timestamp.label('timestamp')
+    ), SuperAdminActivityLog.timestamp, SuperAdminActivityLog.id, conditions, cursor, limit))
+
+    timeline = union_all(*branches).subquery('timeline')
+    return select(timeline).order_by(
+        timeline.c.timestamp.desc(), timeline.c.source.desc(), timeline.c.log_id.desc()
+    ).limit(limit)
+
+
+def fetch_timeline(user_id=None, involvement='any', start=None, end=None, cursor=None, per_page=50):
+    """
+    One page of the timeline, newest first: (entries, next_cursor).
+    Pass next_cursor back to read older entries; it is None on the last page.
+    """
+    decoded = decode_timeline_cursor(cursor) if cursor else None
+    rows = db.session.execute(
+        timeline_query(user_id, involvement, start, end, decoded, per_page + 1)
+    ).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    # Actor and target names for the whole page in one query
+    user_ids = {row.actor_user_id for row in rows} | {row.target_user_id for row in rows}
+    user_ids.discard(None)
+    users = {
+        user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()
+    } if user_ids else {}
+
+    def describe(user_id):
+        user = users.get(user_id)
+        if not user:
+            return None
+        return {'id': user.id, 'name': f"{user.first_name} {user.last_name}", 'email': user.email, 'role': user.role}
+
+    entries = [
+        {
+            'source': row.source,
+            'id': row.log_id,
+            'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+            'actor': describe(row.actor_user_id),
+            'actor_role': row.actor_role,
+            'action': row.action,
+            'target_type': row.target_type,
+            'related_id': row.related_id,
+            'target_user': describe(row.target_user_id),
+            'office_id': row.office_id,
+            'is_success': row.is_success,
+            'ip_address': row.ip_address
+        }
+        for row in rows
+    ]
+    return entries, encode_timeline_cursor(rows[-1]) if has_more else None
+
+
+def create_timeline_indexes(connection):
+    """Build any missing (user, timestamp) indexes used by the timeline; returns the names created"""
+    existing = {
+        name for (name,) in connection.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public'"
+        ))
+    }
+    created = []
+    for model in TIMELINE_MODELS:
+        for index in model.__table__.indexes:
+            if len(index.columns) == 2 and index.columns[0].name in TIMELINE_INDEX_COLUMNS and index.name not in existing:
+                index.create(bind=connection)
+                created.append(index.name)
+    return created
+
+
+def init_log_timeline(app):
+    """Register the `flask logs timeline-setup` command"""
+    logs_cli = app.cli.commands['logs']
+
+    @logs_cli.command('timeline-setup')
+    def timeline_setup():
+        """Build the (user, timestamp) indexes used by the cross-log timeline"""
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            raise click.ClickException("Index setup reads pg_indexes and needs PostgreSQL")
+
+        with db.engine.begin() as connection:
+            created = create_timeline_indexes(connection)
+
+        for name in created:
+            click.echo(f"created {name}")
+        if not created:
+            click.echo("All timeline indexes already exist")
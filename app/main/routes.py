@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify, request, url_for, current_app, abort
+from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
-from app.models import Office, Inquiry, OfficeAdmin
+from app.models import Office, Inquiry, OfficeAdmin, ChunkedUpload, db
 
 # Replace 'admin' with any password you want to hash
 plain_password = "admin"
@@ -85,4 +86,138 @@ def securityprivacy():
 
 @main_bp.route('/register')
 def register():
-    return render_template('auth/register.html')
\ No newline at end of file
+    return render_template('auth/register.html')
+
+@main_bp.route('/health/scheduler')
+def scheduler_health():
+    """Report whether this process holds scheduler leadership"""
+    from app.leader import leader
+    from app.scheduler import scheduler
+
+    status = leader.status()
+    status['scheduler_running'] = scheduler.running
+    status['scheduler_state'] = {0: 'stopped', 1: 'running', 2: 'paused'}.get(scheduler.state, 'unknown')
+    return jsonify(status)
+
+
+@main_bp.route('/health/jobs')
+def jobs_health():
+    """Report job queue backlog and per-job latency for this process"""
+    from app.jobs import job_queue
+
+    return jsonify(job_queue.status())
+
+
+################################################ CHUNKED UPLOADS #################################################
+
+def upload_response(upload, status_code=200, **extra):
+    data = upload.to_dict()
+    data.update(extra, success=True)
+    data['upload_url'] = url_for('main.upload_chunk', upload_id=upload.id)
+    data['finalize_url'] = url_for('main.finalize_chunked_upload', upload_id=upload.id)
+    return jsonify(data), status_code
+
+
+def upload_error(error):
+    data = {'success': False, 'message': str(error)}
+    if error.upload is not None:
+        # Lets the client resume from the bytes the server actually has
+        data['offset'] = error.upload.received_size
+        data['status'] = error.upload.status
+    return jsonify(data), error.status_code
+
+
+def owned_upload(upload_id):
+    return ChunkedUpload.query.filter_by(id=upload_id, user_id=current_user.id).first_or_404()
+
+
+@main_bp.route('/uploads', methods=['POST'])
+@login_required
+def initiate_chunked_upload():
+    """Start a chunked upload: JSON {filename, size, content_type}; answers with the upload id and chunk size"""
+    from app.uploads import initiate_upload, UploadError
+
+    data = request.get_json(silent=True) or {}
+    try:
+        size = int(data.get('size') or 0)
+        upload = initiate_upload(current_user, data.get('filename'), size, data.get('content_type'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'The file size must be given in bytes'}), 400
+    except UploadError as e:
+        return upload_error(e)
+
+    return upload_response(upload, 201, chunk_size=current_app.config['UPLOAD_CHUNK_SIZE'])
+
+
+@main_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def chunked_upload_status(upload_id):
+    """Current offset of an upload, for resuming after a dropped connection"""
+    return upload_response(owned_upload(upload_id))
+
+
+@main_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    """Append the raw request body at ?offset=N"""
+    from app.uploads import append_chunk, UploadError
+
+    upload = ChunkedUpload.query.filter_by(
+        id=upload_id, user_id=current_user.id
+    ).with_for_update().first_or_404()
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'success': False, 'message': 'offset is required'}), 400
+
+    try:
+        append_chunk(upload, offset, request.stream)
+    except UploadError as e:
+        db.session.rollback()
+        return upload_error(e)
+    return upload_response(upload)
+
+
+@main_bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_chunked_upload(upload_id):
+    """Store the completed file; optional JSON {sha256} is checked against the server-side hash"""
+    from app.uploads import finalize_upload, UploadError
+
+    upload = owned_upload(upload_id)
+    data = request.get_json(silent=True) or {}
+    try:
+        finalize_upload(upload, data.get('sha256'))
+    except UploadError as e:
+        db.session.rollback()
+        return upload_error(e)
+    return upload_response(upload)
+
+
+@main_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def cancel_chunked_upload(upload_id):
+    from app.uploads import discard_upload
+
+    upload = owned_upload(upload_id)
+    if upload.status == 'attached':
+        return jsonify({'success': False, 'message': 'The upload is already attached'}), 409
+    discard_upload(upload)
+    return jsonify({'success': True})
+
+
+@main_bp.route('/media/<path:path>')
+@login_required
+def serve_media(path):
+    """Serve a stored upload after checking the current user may read it"""
+    from app.media import can_access_media, send_media
+
+    parts = path.split('/')
+    # Scratch directories and partial files are never served
+    if len(parts) < 2 or any(not part or part.startswith('.') for part in parts) or path.endswith('.part'):
+        abort(404)
+
+    relative_path = f"uploads/{path}"
+    if not can_access_media(current_user, relative_path):
+        abort(404)
+    return send_media(relative_path)
+
@@ -0,0 +1,165 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import abort, current_app, redirect, request, send_file, url_for
+from sqlalchemy.orm import with_polymorphic
+
+from app.extensions import db
+from app.models import (
+    ChunkedUpload, FileAttachment, InquiryAttachment, MessageAttachment, OfficeAdmin,
+    SessionRecording, Student
+)
+from app.storage import get_storage, static_path, stored_path_forms, upload_relative_path
+
+# Blobs and their image derivatives are named after their sha256, so their bytes never change
+CONTENT_ADDRESSED_NAME = re.compile(r'^(?P<sha256>[0-9a-f]{64})(_[a-z]+)?\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Attachment folders below static/uploads; older code saved them to inquiries/ and messages/
+ATTACHMENT_FOLDERS = ('attachments', 'inquiries', 'messages')
+# Folders below static/uploads that only the media endpoint may serve
+PROTECTED_FOLDERS = ATTACHMENT_FOLDERS + ('recordings',)
+# Folders any signed-in user may read through the media endpoint
+SHARED_FOLDERS = ('announcements', 'profile_pics')
+
+
+def media_url(relative_path):
+    """URL of a stored file (uploads/<folder>/...) on the media endpoint"""
+    relative_path = upload_relative_path(relative_path)
+    if not relative_path.startswith('uploads/'):
+        # Bundled files that never went through upload storage
+        return url_for('static', filename=relative_path)
+    return url_for('main.serve_media', path=relative_path[len('uploads/'):])
+
+
+def _office_id(user):
+    office_admin = OfficeAdmin.query.filter_by(user_id=user.id).first()
+    return office_admin.office_id if office_admin else None
+
+
+def _student_id(user):
+    student = Student.query.filter_by(user_id=user.id).first()
+    return student.id if student else None
+
+
+def _can_see(user, student_id, office_id):
+    """Students see their own records, office admins those of their office"""
+    if user.role == 'super_admin':
+        return True
+    if user.role == 'student':
+        return _student_id(user) == student_id
+    if user.role == 'office_admin':
+        return _office_id(user) == office_id
+    return False
+
+
+def can_access_attachment(user, relative_path):
+    """
+    Blobs are shared by content, so the file is readable when any attachment row pointing at it is,
+    or when it is the user's own finished upload that is not attached yet.
+    """
+    attachment = with_polymorphic(FileAttachment, [InquiryAttachment, MessageAttachment])
+    for row in db.session.query(attachment).filter(attachment.file_path.in_(stored_path_forms(relative_path))):
+        if isinstance(row, InquiryAttachment):
+            inquiry = row.inquiry
+        elif isinstance(row, MessageAttachment):
+            inquiry = row.message.inquiry if row.message else None
+        else:
+            inquiry = None
+        if inquiry and _can_see(user, inquiry.student_id, inquiry.office_id):
+            return True
+
+    return ChunkedUpload.query.filter_by(file_path=relative_path, user_id=user.id).first() is not None
+
+
+def can_access_recording(user, relative_path):
+    """Finished recordings are readable by the session's student, counselor and office"""
+    recording = SessionRecording.query.filter(
+        SessionRecording.recording_path.in_(stored_path_forms(relative_path)),
+        SessionRecording.status == 'completed'
+    ).first()
+    if not recording or not recording.session:
+        return False
+    session = recording.session
+    return session.counselor_id == user.id or _can_see(user, session.student_id, session.office_id)
+
+
+def can_access_media(user, relative_path):
+    folder = relative_path.split('/')[1]
+    if folder in ATTACHMENT_FOLDERS:
+        return can_access_attachment(user, relative_path)
+    if folder == 'recordings':
+        return can_access_recording(user, relative_path)
+    return folder in SHARED_FOLDERS
+
+
+def send_media(relative_path):
+    """
+    Answer with a stored file. Flask handles If-None-Match/If-Modified-Since and Range;
+    with MEDIA_ACCEL_REDIRECT set, nginx is told to send the file from its internal location instead
+    (Flask's own USE_X_SENDFILE works too). Object storage answers a redirect to a presigned URL.
+    """
+    storage = get_storage()
+    if storage.redirects:
+        return _redirect_to_storage(storage, relative_path)
+
+    path = static_path(relative_path)
+    if not os.path.isfile(path):
+        abort(404)
+
+    match = CONTENT_ADDRESSED_NAME.match(relative_path.rsplit('/', 1)[-1])
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT')
+
+    if accel_prefix:
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+    else:
+        response = send_file(
+            path,
+            conditional=True,
+            etag=match.group('sha256') if match else True,
+            max_age=IMMUTABLE_MAX_AGE if match else None
+        )
+
+    # Access is checked per user, so shared caches must not keep a copy
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if match:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Revalidate every time; an unchanged file costs a 304
+        response.cache_control.no_cache = True
+    return response
+
+
+def _redirect_to_storage(storage, relative_path):
+    expires_in = current_app.config['STORAGE_URL_EXPIRES']
+    response = redirect(storage.url(relative_path, expires_in))
+    # The browser may reuse the signed URL while it is still comfortably valid
+    response.cache_control.private = True
+    response.cache_control.max_age = expires_in // 2
+    return response
+
+
+def _block_protected_static():
+    # Attachments and recordings are access-checked; the plain static route must not bypass that
+    if request.endpoint == 'static':
+        # The static view normalizes the path, so uploads/./attachments or uploads/x/../attachments reach the same file
+        filename = posixpath.normpath((request.view_args or {}).get('filename', ''))
+        if any(filename.startswith(f"uploads/{folder}/") for folder in PROTECTED_FOLDERS):
+            abort(404)
+
+
+def init_media(app):
+    """
+    Register the media URL helper and keep protected uploads off the static route.
+    MEDIA_ACCEL_REDIRECT is the nginx `internal` location aliased to static/, e.g. /_protected.
+    """
+    app.config.setdefault('MEDIA_ACCEL_REDIRECT', None)
+    app.jinja_env.globals.update(media_url=media_url)
+    app.before_request(_block_protected_static)
@@ -1,4 +1,5 @@
 from app.extensions import db
+from app.audit import audit_sink
 from datetime import datetime
 from flask_login import UserMixin
 
@@ -7,9 +8,22 @@ class JsonSerializableMixin:
     def to_dict(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
+def trgm_index(table, column):
+    """GIN trigram index so ILIKE '%term%' searches on `column` can use an index (PostgreSQL only)"""
+    return db.Index(
+        f"ix_{table}_{column}_trgm", column,
+        postgresql_using='gin',
+        postgresql_ops={column: 'gin_trgm_ops'}
+    ).ddl_if(dialect='postgresql')
+
 # Table of Different Kind of User Student, office_admin, super_admin
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        trgm_index('users', 'first_name'),
+        trgm_index('users', 'last_name'),
+        trgm_index('users', 'email'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     middle_name = db.Column(db.String(50))  # optional
@@ -18,6 +32,7 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False, index=True)  # 'student', 'office_admin', 'super_admin'
     profile_pic = db.Column(db.String(255))
+    profile_pic_variants = db.Column(db.JSON)  # Resized derivatives, see app.images.build_variants
     is_active = db.Column(db.Boolean, default=True, index=True)  # Controls login permission
     video_call_notifications = db.Column(db.Boolean, default=True)
     video_call_email_reminders = db.Column(db.Boolean, default=True)
@@ -114,6 +129,7 @@ class AccountLockHistory(db.Model):
 
 class Office(db.Model):
     __tablename__ = 'offices'
+    __table_args__ = (trgm_index('offices', 'name'),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
@@ -302,6 +318,7 @@ class FileAttachment(db.Model):
     file_path = db.Column(db.String(255), nullable=False)  # Storage path
     file_size = db.Column(db.Integer)  # Size in bytes
     file_type = db.Column(db.String(100))  # MIME type
+    sha256 = db.Column(db.String(64), index=True)  # Content hash; file_path is derived from it
     uploaded_by_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -424,7 +441,11 @@ class SessionRecording(db.Model):
     session_id = db.Column(db.Integer, db.ForeignKey('counseling_sessions.id', ondelete='CASCADE'), nullable=False, unique=True)
     recording_path = db.Column(db.String(255), nullable=False)
     duration_seconds = db.Column(db.Integer)
+    file_size = db.Column(db.BigInteger)  # Bytes stored so far while recording, final size afterwards
+    status = db.Column(db.String(20), default='completed', index=True)  # 'recording' while chunks arrive
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime)  # Last chunk stored; idle recordings are finalized by app.recordings
+    finalized_at = db.Column(db.DateTime)
     
     # For consent tracking
     student_consent = db.Column(db.Boolean, default=False)
@@ -447,13 +468,50 @@ class SessionParticipation(db.Model):
     session = db.relationship('CounselingSession')
     user = db.relationship('User')
 
+# Per-participant call quality summary, written once when a video session ends
+class SessionQualitySummary(db.Model):
+    __tablename__ = 'session_quality_summaries'
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('counseling_sessions.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    sample_count = db.Column(db.Integer, default=0)
+    first_sample_at = db.Column(db.DateTime)
+    last_sample_at = db.Column(db.DateTime)
+
+    # Round-trip time in milliseconds
+    rtt_min = db.Column(db.Float)
+    rtt_avg = db.Column(db.Float)
+    rtt_p95 = db.Column(db.Float)
+
+    # Packet loss as a fraction between 0 and 1
+    packet_loss_min = db.Column(db.Float)
+    packet_loss_avg = db.Column(db.Float)
+    packet_loss_p95 = db.Column(db.Float)
+
+    # Inbound bitrate in kbps
+    bitrate_min = db.Column(db.Float)
+    bitrate_avg = db.Column(db.Float)
+    bitrate_p95 = db.Column(db.Float)
+
+    overall_quality = db.Column(db.String(20))  # 'excellent', 'good', 'fair', 'poor'
+    time_series = db.Column(db.JSON)  # One averaged point per minute
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    session = db.relationship('CounselingSession', backref=db.backref('quality_summaries', lazy=True, cascade='all, delete-orphan'))
+    user = db.relationship('User')
+
 # New model for session invitations and reminders
 class SessionReminder(db.Model):
     __tablename__ = 'session_reminders'
+    __table_args__ = (
+        # One reminder of each type per user and session; used to deduplicate scheduled reminders.
+        # Existing databases get it from `flask reminders setup`
+        db.UniqueConstraint('session_id', 'user_id', 'reminder_type', name='uq_session_reminders_session_user_type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('counseling_sessions.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
-    reminder_type = db.Column(db.String(20), nullable=False)  # 'email', 'sms', 'in_app'
+    reminder_type = db.Column(db.String(20), nullable=False)  # 'email', 'sms', 'in_app', 'session_15min', 'session_start'
     scheduled_at = db.Column(db.DateTime, nullable=False)
     sent_at = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'sent', 'failed'
@@ -481,15 +539,29 @@ class AnnouncementImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     announcement_id = db.Column(db.Integer, db.ForeignKey('announcements.id', ondelete='CASCADE'), nullable=False, index=True)
     image_path = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.BigInteger)  # Bytes of the original upload, set once it is on disk
+    variants = db.Column(db.JSON)  # Resized derivatives, see app.images.build_variants
     caption = db.Column(db.String(255))
     display_order = db.Column(db.Integer, default=0)  # For ordering images
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     announcement = db.relationship('Announcement', back_populates='images')
 
+# target_type of the login, failed login and logout entries in the audit log
+AUTHENTICATION_TARGET_TYPE = 'authentication'
+
 # Audit log to track all actions by users (students, office admins, super admins all does they do in system)
 class AuditLog(db.Model, JsonSerializableMixin):
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        trgm_index('audit_logs', 'action'),
+        trgm_index('audit_logs', 'target_type'),
+        db.Index('ix_audit_logs_actor_timestamp', 'actor_id', 'timestamp'),
+        # Login/logout events only; backs the login history without touching the rest of the log
+        db.Index('ix_audit_logs_auth_actor_timestamp', 'actor_id', 'timestamp', 'id',
+                 postgresql_where=db.text("target_type = 'authentication'"),
+                 sqlite_where=db.text("target_type = 'authentication'")),
+    )
     id = db.Column(db.Integer, primary_key=True)
     actor_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)
     actor_role = db.Column(db.String(20), index=True)  # 'student', 'office_admin', 'super_admin'
@@ -512,8 +584,8 @@ class AuditLog(db.Model, JsonSerializableMixin):
     @classmethod
     def log_action(cls, actor, action, target_type=None, inquiry=None, office=None, status=None, is_success=True, 
                   failure_reason=None, ip_address=None, user_agent=None, retention_days=365):
-        """Helper method to create a new audit log entry"""
-        log = cls(
+        """Helper method to queue a new audit log entry for the background writer"""
+        audit_sink.submit(cls, dict(
             actor_id=actor.id if actor else None,
             actor_role=actor.role if actor else None,
             action=action,
@@ -525,15 +597,26 @@ class AuditLog(db.Model, JsonSerializableMixin):
             failure_reason=failure_reason,
             ip_address=ip_address,
             user_agent=user_agent,
+            timestamp=datetime.utcnow(),
             retention_days=retention_days
+        ))
+
+    @classmethod
+    def authentication_events(cls, actor_id):
+        """Login, failed login and logout entries for one user, answered by the partial authentication index"""
+        return cls.query.filter(
+            cls.target_type == AUTHENTICATION_TARGET_TYPE,
+            cls.actor_id == actor_id
         )
-        db.session.add(log)
-        return log
 
 
 # Student activity log for tracking actions performed by students
 class StudentActivityLog(db.Model, JsonSerializableMixin):
     __tablename__ = 'student_activity_logs'
+    __table_args__ = (
+        trgm_index('student_activity_logs', 'action'),
+        db.Index('ix_student_activity_logs_student_timestamp', 'student_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), index=True)
     action = db.Column(db.String(100), nullable=False, index=True)  # e.g. 'Requested Counseling'
@@ -551,8 +634,8 @@ class StudentActivityLog(db.Model, JsonSerializableMixin):
     @classmethod
     def log_action(cls, student, action, related_id=None, related_type=None, is_success=True, 
                   failure_reason=None, ip_address=None, user_agent=None, retention_days=365):
-        """Helper method to create a new student activity log entry"""
-        log = cls(
+        """Helper method to queue a new student activity log entry for the background writer"""
+        audit_sink.submit(cls, dict(
             student_id=student.id,
             action=action,
             related_id=related_id,
@@ -561,14 +644,20 @@ class StudentActivityLog(db.Model, JsonSerializableMixin):
             failure_reason=failure_reason,
             ip_address=ip_address,
             user_agent=user_agent,
+            timestamp=datetime.utcnow(),
             retention_days=retention_days
-        )
-        db.session.add(log)
-        return log
+        ))
 
 # Office login logs to track the time when office admins log in
 class OfficeLoginLog(db.Model, JsonSerializableMixin):
     __tablename__ = 'office_login_logs'
+    __table_args__ = (
+        db.Index('ix_office_login_logs_admin_login_time', 'office_admin_id', 'login_time'),
+        # Sessions still open; the logout lookup reads one entry from it
+        db.Index('ix_office_login_logs_open_sessions', 'office_admin_id', 'login_time',
+                 postgresql_where=db.text('logout_time IS NULL'),
+                 sqlite_where=db.text('logout_time IS NULL')),
+    )
     id = db.Column(db.Integer, primary_key=True)
     office_admin_id = db.Column(db.Integer, db.ForeignKey('office_admins.id', ondelete='CASCADE'), index=True)
     login_time = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -597,6 +686,14 @@ class OfficeLoginLog(db.Model, JsonSerializableMixin):
         db.session.add(log)
         return log
 
+    @classmethod
+    def open_session(cls, office_admin_id):
+        """The most recent login of an office admin that has not been logged out yet"""
+        return cls.query.filter(
+            cls.office_admin_id == office_admin_id,
+            cls.logout_time.is_(None)
+        ).order_by(cls.login_time.desc()).first()
+
     def update_logout(self, logout_time=None):
         """Update the logout time and calculate session duration"""
         self.logout_time = logout_time or datetime.utcnow()
@@ -607,6 +704,12 @@ class OfficeLoginLog(db.Model, JsonSerializableMixin):
 # Super admin activity log to track super admin actions
 class SuperAdminActivityLog(db.Model, JsonSerializableMixin):
     __tablename__ = 'super_admin_activity_logs'
+    __table_args__ = (
+        trgm_index('super_admin_activity_logs', 'action'),
+        trgm_index('super_admin_activity_logs', 'target_type'),
+        db.Index('ix_super_admin_activity_logs_admin_timestamp', 'super_admin_id', 'timestamp'),
+        db.Index('ix_super_admin_activity_logs_target_timestamp', 'target_user_id', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     super_admin_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)
     action = db.Column(db.String(100), nullable=False, index=True)  # e.g. 'Activated Student', 'Reset Password'
@@ -629,8 +732,8 @@ class SuperAdminActivityLog(db.Model, JsonSerializableMixin):
     def log_action(cls, super_admin, action, target_type=None, target_user=None, target_office=None, 
                   details=None, is_success=True, failure_reason=None, ip_address=None, 
                   user_agent=None, retention_days=730):
-        """Helper method to create a new super admin activity log entry"""
-        log = cls(
+        """Helper method to queue a new super admin activity log entry for the background writer"""
+        audit_sink.submit(cls, dict(
             super_admin_id=super_admin.id,
             action=action,
             target_type=target_type,
@@ -641,7 +744,103 @@ class SuperAdminActivityLog(db.Model, JsonSerializableMixin):
             failure_reason=failure_reason,
             ip_address=ip_address,
             user_agent=user_agent,
+            timestamp=datetime.utcnow(),
             retention_days=retention_days
-        )
-        db.session.add(log)
-        return log
\ No newline at end of file
+        ))
+
+# Background jobs that exhausted their retries
+class DeadLetterJob(db.Model):
+    __tablename__ = 'dead_letter_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), nullable=False, index=True)
+    job_name = db.Column(db.String(100), nullable=False, index=True)
+    payload = db.Column(db.Text)  # JSON kwargs; binary arguments are stored as a size placeholder
+    attempts = db.Column(db.Integer, default=1)
+    error = db.Column(db.String(255))
+    traceback = db.Column(db.Text)
+    backend = db.Column(db.String(20))  # 'local' or 'redis'
+    enqueued_at = db.Column(db.DateTime)
+    failed_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    requested_by_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True, index=True)
+    export_type = db.Column(db.String(20), nullable=False)  # 'logs' or 'inquiries'
+    export_format = db.Column(db.String(10), nullable=False)  # 'csv', 'excel' or 'pdf'
+    params = db.Column(db.Text)  # JSON filters the export was requested with
+    cache_key = db.Column(db.String(64), nullable=False, index=True)  # identical requests share a file
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed
+    total_rows = db.Column(db.Integer)
+    file_path = db.Column(db.String(255))
+    file_size = db.Column(db.BigInteger)
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    requested_by = db.relationship('User', foreign_keys=[requested_by_id])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'export_type': self.export_type,
+            'export_format': self.export_format,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'file_size': self.file_size,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+# Attachment uploaded in chunks; becomes an InquiryAttachment or MessageAttachment once finalized
+class ChunkedUpload(db.Model):
+    __tablename__ = 'chunked_uploads'
+    id = db.Column(db.String(32), primary_key=True)  # Random hex token handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100))
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_size = db.Column(db.BigInteger, default=0, nullable=False)
+    status = db.Column(db.String(20), default='uploading', index=True)  # uploading, complete, attached
+    sha256 = db.Column(db.String(64))
+    file_path = db.Column(db.String(255))  # Content-addressed path below static, set when finalized
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    user = db.relationship('User')
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'offset': self.received_size,
+            'size': self.total_size,
+            'sha256': self.sha256,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+# Change counter per scope (e.g. 'office:3', 'inquiry:12'); bumped on flush, see app.versioning
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Bytes and files stored per uploader and per office, kept current on flush (see app.storage_usage)
+class StorageUsage(db.Model):
+    __tablename__ = 'storage_usage'
+    owner_type = db.Column(db.String(10), primary_key=True)  # 'user' or 'office'
+    owner_id = db.Column(db.Integer, primary_key=True)
+    bytes_used = db.Column(db.BigInteger, default=0, nullable=False)
+    file_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
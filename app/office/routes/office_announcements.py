@@ -11,9 +11,10 @@ from sqlalchemy import func, case, desc, or_
 from app.office import office_bp
 from app.utils import role_required
 from app.office.routes.office_dashboard import get_office_context
-import os
-from werkzeug.utils import secure_filename
-from uuid import uuid4
+from app.storage import store_upload, release_announcement_image
+from app.jobs.tasks import build_announcement_image_variants
+from app.media import media_url
+from app.versioning import versioned_json, current_versions, ANNOUNCEMENTS_SCOPE
 
 
 def allowed_file(filename):
@@ -23,22 +24,10 @@ def allowed_file(filename):
 
 
 def save_image(image_file):
-    """Save image file and return the path"""
+    """Store an announcement image and return its path below the static folder"""
     if image_file and allowed_file(image_file.filename):
-        filename = secure_filename(image_file.filename)
-        # Create unique filename to prevent overwriting
-        unique_filename = f"{uuid4().hex}_{filename}"
-        # Ensure directory exists
-        upload_folder = os.path.join('static', 'uploads', 'announcements')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Save the file
-        file_path = os.path.join(upload_folder, unique_filename)
-        image_file.save(file_path)
-        
-        # Return the relative path for database storage
-        relative_path = os.path.join('uploads', 'announcements', unique_filename)
-        return relative_path.replace(os.sep, '/')
+        # Content-addressed, so re-posting the same image reuses the stored file
+        return store_upload(image_file, 'announcements').path
     return None
 
 
@@ -128,6 +117,7 @@ def create_announcement():
         db.session.flush()  # Flush to get the announcement ID for image association
         
         # Handle image uploads
+        new_images = []
         if 'images[]' in request.files:
             image_files = request.files.getlist('images[]')
             captions = request.form.getlist('captions[]')
@@ -147,9 +137,10 @@ def create_announcement():
                             display_order=order
                         )
                         db.session.add(image)
+                        new_images.append(image)
         
         # Log the action
-        log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Created Announcement",
             target_type="announcement",
@@ -159,6 +150,9 @@ def create_announcement():
         )
         
         db.session.commit()
+        # Resized derivatives are built once the rows exist
+        for image in new_images:
+            build_announcement_image_variants.delay(image_id=image.id)
         flash('Announcement created successfully!', 'success')
         
     except Exception as e:
@@ -182,7 +176,7 @@ def get_announcement(announcement_id):
     images = AnnouncementImage.query.filter_by(announcement_id=announcement_id).all()
     images_data = [{
         'id': image.id,
-        'image_path': url_for('static', filename=image.image_path),
+        'image_path': media_url(image.image_path),
         'caption': image.caption,
         'display_order': image.display_order
     } for image in images]
@@ -236,6 +230,7 @@ def update_announcement():
             announcement.target_office_id = None
         
         # Handle new image uploads
+        new_images = []
         if 'new_images[]' in request.files:
             image_files = request.files.getlist('new_images[]')
             captions = request.form.getlist('new_captions[]')
@@ -255,6 +250,7 @@ def update_announcement():
                             display_order=order
                         )
                         db.session.add(image)
+                        new_images.append(image)
         
         # Handle updates to existing images (captions and display orders)
         existing_image_ids = request.form.getlist('existing_image_ids[]')
@@ -271,7 +267,7 @@ def update_announcement():
                         image.display_order = int(existing_display_orders[i])
         
         # Log the action
-        log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Updated Announcement",
             target_type="announcement",
@@ -281,6 +277,9 @@ def update_announcement():
         )
         
         db.session.commit()
+        # Resized derivatives are built once the rows exist
+        for image in new_images:
+            build_announcement_image_variants.delay(image_id=image.id)
         flash('Announcement updated successfully!', 'success')
         
     except Exception as e:
@@ -314,9 +313,7 @@ def delete_announcement():
         for image in images:
             # Optionally delete the physical file
             try:
-                file_path = os.path.join('app', 'static', image.image_path)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                release_announcement_image(image)
             except Exception as e:
                 # Log error but continue with database deletion
                 print(f"Error removing image file: {str(e)}")
@@ -324,7 +321,7 @@ def delete_announcement():
             db.session.delete(image)
         
         # Log the action
-        log = AuditLog.log_action(
+        AuditLog.log_action(
             actor=current_user,
             action="Deleted Announcement",
             target_type="announcement",
@@ -369,9 +366,7 @@ def delete_announcement_image():
         
         # Delete the physical file
         try:
-            file_path = os.path.join('app', 'static', image.image_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            release_announcement_image(image)
         except Exception as e:
             # Log error but continue with database deletion
             print(f"Error removing image file: {str(e)}")
@@ -392,6 +387,8 @@ def delete_announcement_image():
 @office_bp.route('/api/office-announcements', methods=['GET'])
 @login_required
 @role_required(['office_admin'])
+# can_edit and office_name depend on the user
+@versioned_json(lambda: (current_user.id, current_versions(ANNOUNCEMENTS_SCOPE)))
 def get_office_announcements_api():
     """API endpoint to get announcements for the office"""
     try:
@@ -424,7 +421,7 @@ def get_office_announcements_api():
                     'images': [
                         {
                             'id': img.id,
-                            'image_path': url_for('static', filename=img.image_path),
+                            'image_path': media_url(img.image_path),
                             'caption': img.caption,
                             'display_order': img.display_order
                         } for img in AnnouncementImage.query.filter_by(announcement_id=a.id).order_by(AnnouncementImage.display_order).all()
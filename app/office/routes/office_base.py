@@ -5,6 +5,7 @@ from app.models import Inquiry, CounselingSession, Student, User, OfficeAdmin, A
 from app.utils import role_required
 from .office_dashboard import get_dashboard_stats, get_chart_data
 from app.office import office_bp
+from app.versioning import versioned_json, current_versions, office_scope
 
 
 @office_bp.route('/dashboard')
@@ -94,9 +95,18 @@ def dashboard():
                           now=now)
 
 
+def dashboard_data_version():
+    if not getattr(current_user, 'office_admin', None):
+        return None
+    office_id = current_user.office_admin.office_id
+    # The stats count relative to now ("next session in 2h 15m"), so the minute is part of the version
+    return office_id, current_versions(office_scope(office_id)), datetime.utcnow().strftime('%Y%m%d%H%M')
+
+
 @office_bp.route('/dashboard_data')
 @login_required
 @role_required(['office_admin'])
+@versioned_json(dashboard_data_version)
 def dashboard_data():
     """API endpoint to get updated dashboard data for AJAX refreshes"""
     if not hasattr(current_user, 'office_admin'):
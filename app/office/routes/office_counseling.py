@@ -10,96 +10,9 @@ from datetime import datetime, timedelta
 from sqlalchemy import func, desc
 from app.office import office_bp
 from app.office.routes.office_dashboard import get_office_context
-import uuid
-import os
-from flask_apscheduler import APScheduler
-
-# Create the scheduler but don't initialize it yet
-scheduler = APScheduler()
-
-# Store a reference to the Flask app
-flask_app = None
-
-# Function to initialize the scheduler with the Flask app
-def init_scheduler(app):
-    global flask_app
-    flask_app = app
-    scheduler.init_app(app)
-    scheduler.start()
-
-# Define the scheduled task
-@scheduler.task('interval', id='check_upcoming_sessions', seconds=60)
-def check_upcoming_sessions():
-    """
-    Check for upcoming sessions and automatically change status to in_progress
-    and send notifications to students with video links when appropriate
-    """
-    global flask_app
-    
-    if not flask_app:
-        print("Error: Flask app not initialized for scheduler")
-        return
-    
-    # Use the application context from the stored Flask app
-    with flask_app.app_context():
-        now = datetime.utcnow()
-        
-        # Find sessions that are scheduled to start within the next 15 minutes but not yet started
-        upcoming_sessions = CounselingSession.query.filter(
-            CounselingSession.status.in_(['confirmed', 'pending']),
-            CounselingSession.is_video_session == True,
-            CounselingSession.scheduled_at <= now + timedelta(minutes=15),
-            CounselingSession.scheduled_at >= now
-        ).all()
-        
-        for session in upcoming_sessions:
-            # Generate meeting details if they don't exist
-            if not session.meeting_id:
-                session.generate_meeting_details()
-            
-            # Set status to in_progress if within 5 minutes of start time
-            if session.scheduled_at <= now + timedelta(minutes=5):
-                session.status = 'in_progress'
-                
-                # Send notification to student with the video link
-                student = Student.query.get(session.student_id)
-                if student:
-                    notification = Notification(
-                        user_id=student.user_id,
-                        title="Your Video Session is Ready",
-                        message=f"Your counseling session is starting soon. Click here to join the video call.",
-                        source_office_id=session.office_id,
-                        is_read=False,
-                        link=f"/student/view-session/{session.id}",
-                        notification_type="video_session"
-                    )
-                    db.session.add(notification)
-            
-            # Send reminder notification at 15 minutes before session
-            elif session.scheduled_at <= now + timedelta(minutes=15):
-                student = Student.query.get(session.student_id)
-                if student:
-                    # Check if a reminder was already sent in the last hour
-                    recent_reminder = Notification.query.filter(
-                        Notification.user_id == student.user_id,
-                        Notification.title.like("%Video Session Reminder%"),
-                        Notification.created_at >= now - timedelta(hours=1),
-                        Notification.source_office_id == session.office_id
-                    ).first()
-                    
-                    if not recent_reminder:
-                        notification = Notification(
-                            user_id=student.user_id,
-                            title="Video Session Reminder",
-                            message=f"Your counseling session is scheduled to begin in {int((session.scheduled_at - now).total_seconds() / 60)} minutes.",
-                            source_office_id=session.office_id,
-                            is_read=False,
-                            link=f"/student/view-session/{session.id}",
-                            notification_type="reminder"
-                        )
-                        db.session.add(notification)
-        
-        db.session.commit()
+from app.websockets.quality import quality_aggregator
+from app.scheduler import schedule_session_reminders, cancel_session_reminders, clear_sent_reminders
+from app.recordings import finalize_session_recording
 
 
 @office_bp.route('/video-counseling')
@@ -392,30 +305,8 @@ def end_video_session(session_id):
     if notes:
         session.notes = notes
     
-    # Handle recording if it exists
-    recording_data = request.form.get('recording_data')
-    if recording_data:
-        # Create directory if it doesn't exist
-        recordings_dir = os.path.join('static', 'uploads', 'recordings')
-        if not os.path.exists(recordings_dir):
-            os.makedirs(recordings_dir)
-        
-        # Save recording file
-        recording_filename = f"session_{session_id}_{uuid.uuid4().hex}.webm"
-        recording_path = os.path.join(recordings_dir, recording_filename)
-        
-        # Save recording to file
-        with open(recording_path, 'wb') as f:
-            f.write(recording_data)
-        
-        # Create recording record
-        recording = SessionRecording(
-            session_id=session_id,
-            recording_path=recording_path,
-            counselor_consent=True,  # Counselor recorded it
-            student_consent=request.form.get('student_consent', 'false') == 'true'
-        )
-        db.session.add(recording)
+    # Persist the call quality history collected by the video socket
+    quality_aggregator.flush_session(session_id)
     
     # Log activity
     AuditLog.log_action(
@@ -429,6 +320,9 @@ def end_video_session(session_id):
     
     db.session.commit()
     
+    # Recording chunks were streamed over the video socket during the call; close the file if it is still open
+    finalize_session_recording(session_id, request.form.get('recording_duration', type=int))
+    
     return jsonify({'status': 'success', 'message': 'Session ended successfully'})
 
 
@@ -511,6 +405,12 @@ def update_session_status(session_id):
     
     db.session.commit()
     
+    # Keep the one-shot reminder jobs in line with the new status
+    if new_status in ['pending', 'confirmed']:
+        schedule_session_reminders(session)
+    else:
+        cancel_session_reminders(session.id)
+    
     return jsonify({'status': 'success', 'message': f'Session status updated to {new_status}'})
 
 
@@ -533,15 +433,22 @@ def send_session_reminder(session_id):
     student = Student.query.get(session.student_id)
     student_user = User.query.get(student.user_id)
     
-    reminder = SessionReminder(
+    # One row per (session, user, type); sending the same kind of reminder again refreshes it
+    reminder = SessionReminder.query.filter_by(
         session_id=session_id,
         user_id=student_user.id,
-        reminder_type=reminder_type,
-        scheduled_at=datetime.utcnow(),
-        sent_at=datetime.utcnow(),
-        status='sent'
-    )
-    db.session.add(reminder)
+        reminder_type=reminder_type
+    ).first()
+    if not reminder:
+        reminder = SessionReminder(
+            session_id=session_id,
+            user_id=student_user.id,
+            reminder_type=reminder_type
+        )
+        db.session.add(reminder)
+    reminder.scheduled_at = datetime.utcnow()
+    reminder.sent_at = datetime.utcnow()
+    reminder.status = 'sent'
     
     # For in-app notifications, create a notification
     if reminder_type == 'in_app':
@@ -607,6 +514,9 @@ def reschedule_session(session_id):
         # Update session with new datetime
         session.scheduled_at = new_datetime
         
+        # Reminders sent for the old time should go out again for the new one
+        clear_sent_reminders(session.id)
+        
         # Set session status to confirmed since an office admin has reviewed it
         if session.status == 'pending':
             session.status = 'confirmed'
@@ -640,6 +550,9 @@ def reschedule_session(session_id):
         
         db.session.commit()
         
+        # Move the reminder jobs to the new start time
+        schedule_session_reminders(session)
+        
         return jsonify({
             'status': 'success', 
             'message': 'Session rescheduled successfully',
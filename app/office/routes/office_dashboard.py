@@ -9,6 +9,7 @@ from datetime import datetime, timedelta
 import time  # Add missing import for time module
 from sqlalchemy import func, case, desc, or_  # Add missing desc import
 from app.office import office_bp
+from app.pagination import keyset_paginate
 
 
 def get_dashboard_stats(office_id):
@@ -267,7 +268,9 @@ def inquiries():
         query = query.order_by(Inquiry.created_at)
     
     # Paginate results
-    inquiries = query.paginate(page=page, per_page=20, error_out=False)
+    inquiries = keyset_paginate(
+        query, (Inquiry.created_at, Inquiry.id), page=page, per_page=20, descending=sort_by != 'oldest'
+    )
     
     # Get stats for sidebar
     pending_count = Inquiry.query.filter_by(office_id=office_id, status='pending').count()
@@ -11,6 +11,7 @@ import time
 from sqlalchemy import func, case, desc, or_
 from app.office import office_bp
 from app.utils import role_required
+from app.versioning import versioned_json, current_versions, inquiry_scope
 
 
 def calculate_response_rate(office_id):
@@ -372,20 +373,25 @@ def reply_to_inquiry(inquiry_id):
         files = request.files.getlist('attachments')
         for file in files:
             if file and file.filename:
-                from app.utils import save_attachment
-                file_path = save_attachment(file, 'messages')
-                if file_path:
-                    attachment = MessageAttachment(
-                        filename=file.filename,
-                        file_path=file_path,
-                        file_size=file.content_length if hasattr(file, 'content_length') else 0,
-                        file_type=file.content_type if hasattr(file, 'content_type') else None,
-                        uploaded_by_id=current_user.id,
-                        uploaded_at=datetime.utcnow(),
-                        message_id=new_message.id
-                    )
-                    db.session.add(attachment)
-                    file_paths.append(file_path)
+                from app.storage import save_attachment
+                stored = save_attachment(file)
+                attachment = MessageAttachment(
+                    filename=file.filename,
+                    file_path=stored.path,
+                    file_size=stored.size,
+                    sha256=stored.sha256,
+                    file_type=file.content_type if hasattr(file, 'content_type') else None,
+                    uploaded_by_id=current_user.id,
+                    uploaded_at=datetime.utcnow(),
+                    message_id=new_message.id
+                )
+                db.session.add(attachment)
+                file_paths.append(stored.path)
+
+    # Files sent ahead through the chunked upload API
+    from app.uploads import attach_uploads
+    for attachment in attach_uploads(request.form.getlist('upload_ids'), current_user, MessageAttachment, message_id=new_message.id):
+        file_paths.append(attachment.file_path)
     
     # Create notification for student
     notification = Notification(
@@ -438,6 +444,8 @@ def reply_to_inquiry(inquiry_id):
 @office_bp.route('/api/inquiry/<int:inquiry_id>/messages', methods=['GET'])
 @login_required
 @role_required(['office_admin'])
+# The user id keeps one user's cached history (and access check) from answering another
+@versioned_json(lambda inquiry_id: (current_user.id, current_versions(inquiry_scope(inquiry_id))))
 def get_older_messages(inquiry_id):
     """API to fetch older messages for infinite scrolling in chat view"""
     try:
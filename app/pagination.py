@@ -0,0 +1,196 @@
+from datetime import datetime
+import base64
+import json
+import math
+
+from flask import current_app, request
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Row
+
+from app.extensions import db
+
+
+def _encode_cursor(page, direction, values):
+    payload = {
+        'p': page,
+        'd': direction,
+        'k': [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload['k']
+        ]
+        return payload['p'], payload['d'], values
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def estimate_count(query):
+    """Row estimate from the Postgres planner for `query`, or None on other databases"""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+
+    compiled = query.order_by(None).statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination:
+    """
+    Drop-in for Flask-SQLAlchemy's Pagination (items, page, pages, has_next, iter_pages, ...)
+    whose previous/next links carry a keyset cursor instead of relying on OFFSET.
+    `approximate` is True when `total` is a planner estimate rather than an exact count.
+    """
+
+    def __init__(self, items, page, per_page, total, approximate, has_prev, has_next, first_key, last_key, args):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.approximate = approximate
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = _encode_cursor(page - 1, 'before', first_key) if has_prev and first_key else None
+        self.next_cursor = _encode_cursor(page + 1, 'after', last_key) if has_next and last_key else None
+        self._args = args
+
+    @property
+    def pages(self):
+        pages = math.ceil(self.total / self.per_page) if self.total else 0
+        # An estimate can undershoot; never show fewer pages than we know exist
+        if self.has_next:
+            pages = max(pages, self.page + 1)
+        return max(pages, self.page if self.items else 0)
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    @property
+    def first(self):
+        return (self.page - 1) * self.per_page + 1 if self.items else 0
+
+    @property
+    def last(self):
+        return (self.page - 1) * self.per_page + len(self.items)
+
+    def url_args(self, page):
+        """Query args for a link to `page`: current filters plus the cursor when it is the next/previous page"""
+        args = {key: value for key, value in self._args.items() if key not in ('page', 'cursor')}
+        args['page'] = page
+        if page == self.next_num and self.next_cursor:
+            args['cursor'] = self.next_cursor
+        elif page == self.prev_num and self.prev_cursor:
+            args['cursor'] = self.prev_cursor
+        return args
+
+    def iter_pages(self, *, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        """Same output as Flask-SQLAlchemy's Pagination.iter_pages"""
+        pages_end = self.pages + 1
+        if pages_end == 1:
+            return
+
+        left_end = min(1 + left_edge, pages_end)
+        yield from range(1, left_end)
+        if left_end == pages_end:
+            return
+
+        mid_start = max(left_end, self.page - left_current)
+        mid_end = min(self.page + right_current + 1, pages_end)
+        if mid_start - left_end > 0:
+            yield None
+        yield from range(mid_start, mid_end)
+        if mid_end == pages_end:
+            return
+
+        right_start = max(mid_end, pages_end - right_edge)
+        if right_start - mid_end > 0:
+            yield None
+        yield from range(right_start, pages_end)
+
+    def __iter__(self):
+        yield from self.items
+
+
+def _row_key(row, order_columns):
+    # Multi-entity queries return Rows; the sort columns belong to the first entity
+    entity = row[0] if isinstance(row, Row) else row
+    values = [getattr(entity, column.key) for column in order_columns]
+    return None if any(value is None for value in values) else values
+
+
+def keyset_paginate(query, order_columns, page=None, per_page=10, descending=True, exact_count_limit=None):
+    """
+    Paginate `query` on `order_columns` (e.g. (Log.timestamp, Log.id); must be non-null and end
+    in a unique column). Prev/next navigation seeks from a cursor; jumping to an arbitrary page
+    number falls back to OFFSET. The total is counted exactly unless the planner estimates more
+    than PAGINATION_EXACT_COUNT_LIMIT rows, in which case the estimate is used.
+    """
+    if page is None:
+        page = request.args.get('page', 1, type=int)
+    page = max(page, 1)
+    if exact_count_limit is None:
+        exact_count_limit = current_app.config.get('PAGINATION_EXACT_COUNT_LIMIT', 10000)
+
+    def ordered(reverse):
+        use_desc = descending != reverse
+        return query.order_by(None).order_by(*[
+            column.desc() if use_desc else column.asc() for column in order_columns
+        ])
+
+    cursor = _decode_cursor(request.args.get('cursor', ''))
+    # Stale cursors (e.g. kept on a numbered page link) are ignored
+    if cursor and cursor[0] != page:
+        cursor = None
+
+    if cursor:
+        _, direction, values = cursor
+        key = tuple_(*order_columns)
+        # Walking "before" means reading backwards from the cursor and flipping the result
+        forward = direction == 'after'
+        seek = (key < tuple_(*values)) if descending == forward else (key > tuple_(*values))
+        rows = ordered(reverse=not forward).filter(seek).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+        if forward:
+            has_prev, has_next = True, has_more
+        else:
+            items.reverse()
+            has_prev, has_next = has_more, True
+    else:
+        rows = ordered(reverse=False).offset((page - 1) * per_page).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = page > 1
+
+    if not has_next and (items or page == 1):
+        # On the last page the total is known without counting
+        total, approximate = (page - 1) * per_page + len(items), False
+    else:
+        estimate = estimate_count(query)
+        if estimate is not None and estimate > exact_count_limit:
+            total, approximate = estimate, True
+        else:
+            total, approximate = query.order_by(None).count(), False
+
+    return KeysetPagination(
+        items, page, per_page, total, approximate, has_prev, has_next,
+        _row_key(items[0], order_columns) if items else None,
+        _row_key(items[-1], order_columns) if items else None,
+        request.args.to_dict()
+    )
@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta
+import logging
+import re
+
+import click
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint
+
+from app.extensions import db
+from app.leader import leader_only
+from app.models import AuditLog, StudentActivityLog, OfficeLoginLog, SuperAdminActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Log tables partitioned by month on their time column
+PARTITIONED_MODELS = {
+    'audit_logs': (AuditLog, 'timestamp'),
+    'student_activity_logs': (StudentActivityLog, 'timestamp'),
+    'office_login_logs': (OfficeLoginLog, 'login_time'),
+    'super_admin_activity_logs': (SuperAdminActivityLog, 'timestamp'),
+}
+
+PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+flask_app = None
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    month_index = value.month - 1 + months
+    return datetime(value.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m}"
+
+
+def is_partitioned(connection, table):
+    return bool(connection.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace
+    """), {'table': table}).scalar())
+
+
+def list_partitions(connection, table):
+    """Return the names of the monthly partitions attached to a table (the default partition excluded)"""
+    rows = connection.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table
+        ORDER BY child.relname
+    """), {'table': table})
+    return [name for (name,) in rows if PARTITION_NAME.search(name)]
+
+
+def default_retention_days(model):
+    return model.__table__.c.retention_days.default.arg
+
+
+def create_partition(connection, table, key, start):
+    """
+    Create the partition for the month starting at `start`.
+    Rows for that month already sitting in the default partition are moved into it.
+    """
+    name = partition_name(table, start)
+    end = add_months(start, 1)
+    default = f"{table}_default"
+
+    stranded = connection.execute(
+        text(f'SELECT count(*) FROM {default} WHERE "{key}" >= :start AND "{key}" < :end'),
+        {'start': start, 'end': end}
+    ).scalar()
+
+    if stranded:
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    ))
+
+    if stranded:
+        connection.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE "{key}" >= :start AND "{key}" < :end RETURNING *
+            )
+            INSERT INTO {table} SELECT * FROM moved
+        """), {'start': start, 'end': end})
+        connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+        logger.info(f"Moved {stranded} rows from {default} into {name}")
+
+    logger.info(f"Created partition {name}")
+    return name
+
+
+def convert_table(connection, table, months_ahead):
+    """
+    Rebuild a heap log table as a monthly range-partitioned table, copying its rows.
+    Takes an exclusive lock on the table for the duration of the copy, so run it in a quiet window.
+    """
+    model, key = PARTITIONED_MODELS[table]
+    heap = f"{table}_heap"
+
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {heap}"))
+    connection.execute(text(
+        f"CREATE TABLE {table} (LIKE {heap} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f'PARTITION BY RANGE ("{key}")'
+    ))
+    connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+    # One partition per month that already has data, through the look-ahead window
+    oldest = connection.execute(text(f'SELECT min("{key}") FROM {heap}')).scalar()
+    current = month_start(datetime.utcnow())
+    start = month_start(oldest) if oldest and oldest < current else current
+    while start <= add_months(current, months_ahead):
+        create_partition(connection, table, key, start)
+        start = add_months(start, 1)
+
+    # The partition key is part of the primary key, so it can no longer be NULL
+    connection.execute(text(
+        f'UPDATE {heap} SET "{key}" = now() AT TIME ZONE \'utc\' WHERE "{key}" IS NULL'
+    ))
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {heap}"))
+
+    # Keep the id sequence alive when the old table goes away
+    sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': heap}
+    ).scalar()
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    connection.execute(text(f"DROP TABLE {heap}"))
+
+    connection.execute(text(f'ALTER TABLE {table} ALTER COLUMN "{key}" SET NOT NULL'))
+    connection.execute(text(f'ALTER TABLE {table} ADD PRIMARY KEY (id, "{key}")'))
+    # The model's indexes include trigram indexes for the log search
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for index in model.__table__.indexes:
+        index.create(bind=connection)
+    for constraint in model.__table__.foreign_key_constraints:
+        connection.execute(AddConstraint(constraint))
+
+    logger.info(f"Converted {table} to a partitioned table")
+
+
+def maintain_partitions(connection, months_ahead, now=None):
+    """
+    Create the partitions for the coming months and drop months whose rows are all past retention.
+    Returns (created, dropped) partition names.
+    """
+    now = now or datetime.utcnow()
+    created = []
+    dropped = []
+
+    for table, (model, key) in PARTITIONED_MODELS.items():
+        if not is_partitioned(connection, table):
+            logger.warning(f"{table} is not partitioned yet; run `flask logs partition-setup` first")
+            continue
+
+        existing = set(list_partitions(connection, table))
+        current = month_start(now)
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            if partition_name(table, start) not in existing:
+                created.append(create_partition(connection, table, key, start))
+
+        # A month can go once its newest possible row is older than the longest retention in it
+        for name in sorted(existing):
+            match = PARTITION_NAME.search(name)
+            end = add_months(datetime(int(match.group(1)), int(match.group(2)), 1), 1)
+            if end >= current:
+                continue
+
+            retention_days = connection.execute(
+                text(f"SELECT max(retention_days) FROM {name}")
+            ).scalar() or default_retention_days(model)
+            if end + timedelta(days=retention_days) <= now:
+                connection.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+                logger.info(f"Dropped expired partition {name}")
+
+        # Rows outside every monthly range fall back to per-row retention
+        connection.execute(text(f"""
+            DELETE FROM {table}_default
+            WHERE "{key}" < :now - make_interval(days => COALESCE(retention_days, :default_days))
+        """), {'now': now, 'default_days': default_retention_days(model)})
+
+    return created, dropped
+
+
+@leader_only
+def run_partition_maintenance():
+    """Daily scheduler job; keeps the look-ahead partitions in place and purges expired months"""
+    with flask_app.app_context():
+        try:
+            with db.engine.begin() as connection:
+                created, dropped = maintain_partitions(
+                    connection, flask_app.config['LOG_PARTITION_MONTHS_AHEAD']
+                )
+            logger.info(f"Partition maintenance: {len(created)} created, {len(dropped)} dropped")
+        except Exception as e:
+            logger.error(f"Error maintaining log partitions: {str(e)}")
+
+
+def init_partitions(app):
+    """Register the `flask logs` partition commands"""
+    global flask_app
+    flask_app = app
+
+    app.config.setdefault('LOG_PARTITION_MONTHS_AHEAD', 3)
+
+    @app.cli.group('logs')
+    def logs_cli():
+        """Audit and activity log table maintenance"""
+
+    @logs_cli.command('partition-setup')
+    @click.option('--months-ahead', type=int, default=None, help='Future months to create partitions for.')
+    def partition_setup(months_ahead):
+        """Convert the log tables to monthly range partitioning (one-time, locks the tables)"""
+        months_ahead = app.config['LOG_PARTITION_MONTHS_AHEAD'] if months_ahead is None else months_ahead
+        with db.engine.begin() as connection:
+            for table in PARTITIONED_MODELS:
+                if is_partitioned(connection, table):
+                    click.echo(f"{table} is already partitioned")
+                    continue
+                convert_table(connection, table, months_ahead)
+                click.echo(f"{table} converted")
+
+    @logs_cli.command('partition-maintain')
+    @click.option('--months-ahead', type=int, default=None, help='Future months to create partitions for.')
+    def partition_maintain(months_ahead):
+        """Create upcoming monthly partitions and drop the ones past retention"""
+        months_ahead = app.config['LOG_PARTITION_MONTHS_AHEAD'] if months_ahead is None else months_ahead
+        with db.engine.begin() as connection:
+            created, dropped = maintain_partitions(connection, months_ahead)
+        for name in created:
+            click.echo(f"created {name}")
+        for name in dropped:
+            click.echo(f"dropped {name}")
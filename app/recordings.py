@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+import logging
+import os
+import uuid
+
+from flask import current_app
+
+from app.extensions import db
+from app.leader import leader_only
+from app.models import SessionRecording
+from app.storage import get_storage, static_path
+
+logger = logging.getLogger(__name__)
+
+flask_app = None
+
+RECORDING_FOLDER = 'uploads/recordings'
+
+
+class RecordingError(Exception):
+    """A recording chunk or state change that cannot be applied"""
+
+    def __init__(self, message, recording=None):
+        super().__init__(message)
+        self.recording = recording
+
+
+def partial_path(recording):
+    # Chunks are appended to local scratch on this server during the call (whatever the storage backend)
+    # and moved into storage when it is finalized
+    return f"{static_path(recording.recording_path)}.part"
+
+
+def start_recording(session, student_consent=False):
+    """
+    Open the recording of a session for chunks, or return the one already in progress
+    (e.g. the counselor reloaded the page mid-call).
+    """
+    recording = SessionRecording.query.filter_by(session_id=session.id).first()
+    if recording:
+        if recording.status != 'recording':
+            raise RecordingError("This session already has a recording", recording)
+        return recording
+
+    recording = SessionRecording(
+        session_id=session.id,
+        recording_path=f"{RECORDING_FOLDER}/session_{session.id}_{uuid.uuid4().hex}.webm",
+        status='recording',
+        file_size=0,
+        updated_at=datetime.utcnow(),
+        counselor_consent=True,  # Counselor recorded it
+        student_consent=student_consent
+    )
+    path = partial_path(recording)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    db.session.add(recording)
+    db.session.commit()
+    return recording
+
+
+def append_chunk(recording, offset, data):
+    """
+    Append one MediaRecorder chunk at `offset`, which must equal the bytes stored so far.
+    A chunk that was already stored (a resend after a lost ack) is accepted without writing.
+    """
+    if recording.status != 'recording':
+        raise RecordingError("The recording is already finalized", recording)
+    if offset + len(data) <= recording.file_size:
+        return recording
+    if offset != recording.file_size:
+        raise RecordingError("The chunk offset does not match the bytes stored", recording)
+
+    path = partial_path(recording)
+    if not os.path.exists(path):
+        # The partial file stays on the server that started the recording, see docs/UPGRADING.md
+        logger.warning(f"Recording {recording.id} has no partial file on this server; is routing sticky?")
+        raise RecordingError("The recording file is missing", recording)
+
+    with open(path, 'r+b') as f:
+        # Drop bytes left behind by an interrupted write
+        f.seek(offset)
+        f.truncate()
+        f.write(data)
+
+    recording.file_size = offset + len(data)
+    recording.updated_at = datetime.utcnow()
+    db.session.commit()
+    return recording
+
+
+def finalize_recording(recording, duration_seconds=None):
+    """
+    Move the appended file into storage and record its size and duration.
+    A recording that never received a chunk is deleted; returns None in that case.
+    """
+    if recording.status != 'recording':
+        return recording
+
+    path = partial_path(recording)
+    if not recording.file_size:
+        if os.path.exists(path):
+            os.remove(path)
+        db.session.delete(recording)
+        db.session.commit()
+        return None
+
+    now = datetime.utcnow()
+    recording.file_size = os.path.getsize(path)
+    get_storage().put_file(path, recording.recording_path)
+    # The client knows how long MediaRecorder ran; fall back to wall-clock time since the start
+    recording.duration_seconds = int(duration_seconds) if duration_seconds else int(
+        (now - recording.created_at).total_seconds()
+    )
+    recording.status = 'completed'
+    recording.finalized_at = now
+    db.session.commit()
+
+    logger.info(f"Recording for session {recording.session_id} finalized: {recording.file_size} bytes")
+    return recording
+
+
+def finalize_session_recording(session_id, duration_seconds=None):
+    """Finalize the session's recording if one is still open; used when the call ends"""
+    recording = SessionRecording.query.filter_by(session_id=session_id, status='recording').first()
+    if recording:
+        return finalize_recording(recording, duration_seconds)
+    return None
+
+
+def finalize_idle_recordings(now=None):
+    """
+    Close recordings that stopped receiving chunks RECORDING_IDLE_SECONDS ago without being finalized
+    (the counselor's browser crashed or the call dropped), keeping what was stored. Recordings whose
+    partial file is on another app server are left alone. Returns the number closed.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['RECORDING_IDLE_SECONDS'])
+    idle = SessionRecording.query.filter(
+        SessionRecording.status == 'recording',
+        db.func.coalesce(SessionRecording.updated_at, SessionRecording.created_at) <= cutoff
+    ).all()
+
+    closed = 0
+    for recording in idle:
+        if recording.file_size and not os.path.exists(partial_path(recording)):
+            logger.warning(f"Idle recording {recording.id} has no partial file on this server; left open")
+            continue
+        last_chunk_at = recording.updated_at or recording.created_at
+        finalize_recording(recording, max(1, (last_chunk_at - recording.created_at).total_seconds()))
+        closed += 1
+    return closed
+
+
+@leader_only
+def run_idle_recording_sweep():
+    """Scheduler job; closes recordings whose call ended without finalizing them"""
+    with flask_app.app_context():
+        try:
+            closed = finalize_idle_recordings()
+            if closed:
+                logger.info(f"Closed {closed} idle session recordings")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error closing idle session recordings: {str(e)}")
+
+
+def init_recordings(app):
+    """Configure how long a recording may go without chunks before it is closed"""
+    global flask_app
+    flask_app = app
+
+    app.config.setdefault('RECORDING_IDLE_SECONDS', 15 * 60)
@@ -0,0 +1,427 @@
+from datetime import datetime, timedelta
+import logging
+
+import click
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from flask_apscheduler import APScheduler
+from sqlalchemy import and_, insert, text
+from sqlalchemy.schema import AddConstraint
+
+from app.extensions import db
+from app.leader import leader, leader_only
+from app.models import CounselingSession, Student, Notification, SessionReminder
+
+logger = logging.getLogger(__name__)
+
+# Create the scheduler but don't initialize it yet
+scheduler = APScheduler()
+
+# Store a reference to the Flask app
+flask_app = None
+
+# How long before the session the reminder and the "session ready" notification go out
+REMINDER_LEAD_TIME = timedelta(minutes=15)
+START_LEAD_TIME = timedelta(minutes=5)
+
+# Sessions in these states still get reminders
+REMINDER_STATUSES = ('confirmed', 'pending')
+
+# SessionReminder.reminder_type values used to deduplicate the scheduled notifications
+REMINDER_TYPE = 'session_15min'
+START_REMINDER_TYPE = 'session_start'
+
+# Unique constraint the reminder inserts resolve conflicts against; create_all does not add it to an existing table
+REMINDER_CONSTRAINT = 'uq_session_reminders_session_user_type'
+
+
+def init_scheduler(app):
+    """Initialize the scheduler with a persistent job store so one-shot reminders survive restarts"""
+    global flask_app
+    flask_app = app
+
+    app.config.setdefault('SCHEDULER_TIMEZONE', 'UTC')
+    app.config.setdefault('SCHEDULER_JOBSTORES', {
+        'default': SQLAlchemyJobStore(
+            url=app.config['SQLALCHEMY_DATABASE_URI'],
+            tablename='apscheduler_jobs'
+        )
+    })
+    app.config.setdefault('SCHEDULER_JOB_DEFAULTS', {
+        'coalesce': True,
+        'max_instances': 1,
+        'misfire_grace_time': 300
+    })
+    app.config.setdefault('REMINDER_RECONCILE_MINUTES', 10)
+
+    scheduler.init_app(app)
+
+    @app.cli.group('reminders')
+    def reminders_cli():
+        """Session reminder maintenance"""
+
+    @reminders_cli.command('setup')
+    def reminders_setup():
+        """Remove duplicate session reminders and add the unique constraint scheduled reminders rely on"""
+        if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+            raise click.ClickException("Constraint setup reads pg_constraint and needs PostgreSQL")
+
+        with db.engine.begin() as connection:
+            removed, created = create_reminder_constraint(connection)
+
+        if removed:
+            click.echo(f"removed {removed} duplicate reminders")
+        click.echo(f"created {REMINDER_CONSTRAINT}" if created else f"{REMINDER_CONSTRAINT} already exists")
+
+    # Low-frequency safety net for reminders that were never registered or got lost
+    scheduler.add_job(
+        id='reconcile_session_reminders',
+        func=reconcile_session_reminders,
+        trigger='interval',
+        minutes=app.config['REMINDER_RECONCILE_MINUTES'],
+        replace_existing=True
+    )
+
+    from app.exports import run_export_cleanup
+    scheduler.add_job(
+        id='purge_expired_exports',
+        func=run_export_cleanup,
+        trigger='interval',
+        minutes=30,
+        replace_existing=True
+    )
+
+    from app.uploads import run_upload_cleanup
+    scheduler.add_job(
+        id='purge_stale_uploads',
+        func=run_upload_cleanup,
+        trigger='interval',
+        hours=1,
+        replace_existing=True
+    )
+
+    from app.recordings import run_idle_recording_sweep
+    scheduler.add_job(
+        id='close_idle_recordings',
+        func=run_idle_recording_sweep,
+        trigger='interval',
+        minutes=5,
+        replace_existing=True
+    )
+
+    from app.storage_usage import run_storage_scrub
+    scheduler.add_job(
+        id='scrub_upload_storage',
+        func=run_storage_scrub,
+        trigger='interval',
+        hours=24,
+        replace_existing=True
+    )
+
+    # Monthly log partitions only exist on Postgres
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        from app.partitions import run_partition_maintenance
+        scheduler.add_job(
+            id='maintain_log_partitions',
+            func=run_partition_maintenance,
+            trigger='cron',
+            hour=2,
+            replace_existing=True
+        )
+
+    # Every process starts the scheduler paused; only the elected leader resumes it
+    scheduler.start(paused=True)
+    leader.init_app(
+        app,
+        on_elected=scheduler.resume,
+        on_demoted=scheduler.pause,
+        # Jobs added to the shared store by other workers are picked up on the next renewal
+        on_renewed=scheduler.scheduler.wakeup
+    )
+
+
+def reminder_job_id(session_id):
+    return f"session_{session_id}_reminder"
+
+
+def start_job_id(session_id):
+    return f"session_{session_id}_start"
+
+
+def schedule_session_reminders(session):
+    """
+    Register (or move) the one-shot reminder jobs for a video session.
+    Call this after the session has been committed so the job can load it.
+    """
+    cancel_session_reminders(session.id)
+
+    if not session.is_video_session or session.status not in REMINDER_STATUSES:
+        return
+
+    now = datetime.utcnow()
+    if session.scheduled_at < now:
+        return
+
+    start_at = session.scheduled_at - START_LEAD_TIME
+    reminder_at = session.scheduled_at - REMINDER_LEAD_TIME
+
+    try:
+        # Skip the reminder when the session is about to start anyway
+        if start_at > now:
+            scheduler.add_job(
+                id=reminder_job_id(session.id),
+                func=send_session_reminder,
+                trigger='date',
+                run_date=max(reminder_at, now),
+                args=[session.id],
+                replace_existing=True
+            )
+
+        scheduler.add_job(
+            id=start_job_id(session.id),
+            func=start_video_session,
+            trigger='date',
+            run_date=max(start_at, now),
+            args=[session.id],
+            replace_existing=True
+        )
+    except Exception as e:
+        # The reconciliation sweep will register the jobs later
+        logger.error(f"Error scheduling reminders for session {session.id}: {str(e)}")
+
+
+def cancel_session_reminders(session_id):
+    """Remove any pending reminder jobs for a session"""
+    for job_id in (reminder_job_id(session_id), start_job_id(session_id)):
+        try:
+            if scheduler.get_job(job_id):
+                scheduler.remove_job(job_id)
+        except Exception as e:
+            logger.error(f"Error removing job {job_id}: {str(e)}")
+
+
+def create_reminder_constraint(connection):
+    """
+    Delete duplicate reminder rows (keeping the oldest of each session, user and type) and add the unique
+    constraint. Returns (rows removed, whether the constraint was created).
+    """
+    exists = connection.execute(
+        text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {'name': REMINDER_CONSTRAINT}
+    ).first()
+    if exists:
+        return 0, False
+
+    # Block inserts until the constraint is in place so no new duplicate slips in between
+    connection.execute(text("LOCK TABLE session_reminders IN SHARE ROW EXCLUSIVE MODE"))
+    removed = connection.execute(text("""
+        DELETE FROM session_reminders duplicate
+        USING session_reminders kept
+        WHERE duplicate.session_id = kept.session_id
+          AND duplicate.user_id = kept.user_id
+          AND duplicate.reminder_type = kept.reminder_type
+          AND duplicate.id > kept.id
+    """)).rowcount
+
+    constraint = next(
+        constraint for constraint in SessionReminder.__table__.constraints
+        if constraint.name == REMINDER_CONSTRAINT
+    )
+    connection.execute(AddConstraint(constraint))
+    return removed, True
+
+
+def _insert_ignoring_duplicates(model):
+    """INSERT ... ON CONFLICT DO NOTHING for the dialect in use; needs `flask reminders setup` on existing databases"""
+    if db.engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model).on_conflict_do_nothing(
+        index_elements=['session_id', 'user_id', 'reminder_type']
+    )
+
+
+def _due_sessions_query(reminder_type, lead_time, now, session_ids=None):
+    """
+    Sessions starting within lead_time joined to their student's user id,
+    excluding those that already have a reminder of this type
+    """
+    query = db.session.query(
+        CounselingSession.id,
+        CounselingSession.office_id,
+        CounselingSession.scheduled_at,
+        Student.user_id
+    ).join(
+        Student, Student.id == CounselingSession.student_id
+    ).outerjoin(
+        SessionReminder,
+        and_(
+            SessionReminder.session_id == CounselingSession.id,
+            SessionReminder.user_id == Student.user_id,
+            SessionReminder.reminder_type == reminder_type
+        )
+    ).filter(
+        SessionReminder.id.is_(None),
+        CounselingSession.status.in_(REMINDER_STATUSES),
+        CounselingSession.is_video_session == True,
+        CounselingSession.scheduled_at <= now + lead_time,
+        CounselingSession.scheduled_at >= now
+    )
+
+    if session_ids is not None:
+        query = query.filter(CounselingSession.id.in_(session_ids))
+
+    return query
+
+
+def _claim_reminders(reminder_type, lead_time, now, due):
+    """
+    Bulk insert reminder rows for the due sessions and return the (session_id, user_id)
+    pairs that were actually inserted, so concurrent runs never notify twice
+    """
+    if not due:
+        return set()
+
+    result = db.session.execute(
+        _insert_ignoring_duplicates(SessionReminder).values([
+            {
+                'session_id': row.id,
+                'user_id': row.user_id,
+                'reminder_type': reminder_type,
+                'scheduled_at': row.scheduled_at - lead_time,
+                'sent_at': now,
+                'status': 'sent'
+            }
+            for row in due
+        ]).returning(SessionReminder.session_id, SessionReminder.user_id)
+    )
+    return {(row.session_id, row.user_id) for row in result}
+
+
+def send_due_reminders(session_ids=None):
+    """
+    Send the 15-minute reminder for every due video session in one pass:
+    one select, one bulk insert of reminder rows and one bulk insert of notifications.
+    """
+    now = datetime.utcnow()
+    due = _due_sessions_query(REMINDER_TYPE, REMINDER_LEAD_TIME, now, session_ids).all()
+    claimed = _claim_reminders(REMINDER_TYPE, REMINDER_LEAD_TIME, now, due)
+
+    notifications = [
+        {
+            'user_id': row.user_id,
+            'title': "Video Session Reminder",
+            'message': f"Your counseling session is scheduled to begin in {max(0, int((row.scheduled_at - now).total_seconds() / 60))} minutes.",
+            'source_office_id': row.office_id,
+            'is_read': False,
+            'link': f"/student/view-session/{row.id}",
+            'notification_type': "reminder",
+            'created_at': now
+        }
+        for row in due if (row.id, row.user_id) in claimed
+    ]
+    if notifications:
+        db.session.execute(insert(Notification), notifications)
+
+    db.session.commit()
+    return len(notifications)
+
+
+def start_due_sessions(session_ids=None):
+    """
+    Move every video session starting within 5 minutes to in_progress and send the join link,
+    using the same set-based pattern as send_due_reminders.
+    """
+    now = datetime.utcnow()
+    due = _due_sessions_query(START_REMINDER_TYPE, START_LEAD_TIME, now, session_ids).all()
+    claimed = _claim_reminders(START_REMINDER_TYPE, START_LEAD_TIME, now, due)
+    started_ids = [row.id for row in due if (row.id, row.user_id) in claimed]
+
+    if started_ids:
+        # Meeting details are normally generated on confirmation; fill in any that are missing
+        for session in CounselingSession.query.filter(
+            CounselingSession.id.in_(started_ids),
+            CounselingSession.meeting_id.is_(None)
+        ).all():
+            session.generate_meeting_details()
+
+        CounselingSession.query.filter(
+            CounselingSession.id.in_(started_ids)
+        ).update({'status': 'in_progress'}, synchronize_session=False)
+
+        db.session.execute(insert(Notification), [
+            {
+                'user_id': row.user_id,
+                'title': "Your Video Session is Ready",
+                'message': "Your counseling session is starting soon. Click here to join the video call.",
+                'source_office_id': row.office_id,
+                'is_read': False,
+                'link': f"/student/view-session/{row.id}",
+                'notification_type': "video_session",
+                'created_at': now
+            }
+            for row in due if (row.id, row.user_id) in claimed
+        ])
+
+    db.session.commit()
+    return len(started_ids)
+
+
+def clear_sent_reminders(session_id):
+    """Forget the scheduled reminders already sent for a session, e.g. after it was rescheduled"""
+    SessionReminder.query.filter(
+        SessionReminder.session_id == session_id,
+        SessionReminder.reminder_type.in_([REMINDER_TYPE, START_REMINDER_TYPE])
+    ).delete(synchronize_session=False)
+
+
+@leader_only
+def send_session_reminder(session_id):
+    """One-shot job: remind the student 15 minutes before a video session"""
+    if not flask_app:
+        logger.error("Flask app not initialized for scheduler")
+        return
+
+    with flask_app.app_context():
+        send_due_reminders([session_id])
+
+
+@leader_only
+def start_video_session(session_id):
+    """One-shot job: open the video session 5 minutes before start and send the join link"""
+    if not flask_app:
+        logger.error("Flask app not initialized for scheduler")
+        return
+
+    with flask_app.app_context():
+        start_due_sessions([session_id])
+
+
+@leader_only
+def reconcile_session_reminders():
+    """
+    Periodic sweep that registers jobs for upcoming video sessions that have none,
+    e.g. sessions created while the scheduler was down or whose job was lost.
+    """
+    if not flask_app:
+        logger.error("Flask app not initialized for scheduler")
+        return
+
+    with flask_app.app_context():
+        now = datetime.utcnow()
+        horizon = now + REMINDER_LEAD_TIME + timedelta(minutes=2 * flask_app.config['REMINDER_RECONCILE_MINUTES'])
+
+        # Catch up on anything whose one-shot job did not run
+        start_due_sessions()
+        send_due_reminders()
+
+        upcoming_sessions = CounselingSession.query.filter(
+            CounselingSession.status.in_(REMINDER_STATUSES),
+            CounselingSession.is_video_session == True,
+            CounselingSession.scheduled_at <= horizon,
+            CounselingSession.scheduled_at >= now
+        ).all()
+
+        for session in upcoming_sessions:
+            if not scheduler.get_job(start_job_id(session.id)):
+                logger.info(f"Registering missing reminder jobs for session {session.id}")
+                schedule_session_reminders(session)
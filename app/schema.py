@@ -0,0 +1,85 @@
+import click
+from sqlalchemy import inspect, text
+
+from app.extensions import db
+from app.models import AnnouncementImage, CacheVersion, ChunkedUpload, DeadLetterJob, ExportJob, FileAttachment, SessionQualitySummary, SessionRecording, StorageUsage, User
+
+# Tables added since the shipped schema (schema.txt / kapiyu.sql); created when missing
+ADDED_TABLES = (
+    SessionQualitySummary,
+    DeadLetterJob,
+    ExportJob,
+    ChunkedUpload,
+    CacheVersion,
+    StorageUsage,
+)
+
+# (model, column name) added to tables deployed databases already have
+ADDED_COLUMNS = (
+    (FileAttachment, 'sha256'),
+    (User, 'profile_pic_variants'),
+    (AnnouncementImage, 'variants'),
+    (SessionRecording, 'file_size'),
+    (SessionRecording, 'status'),
+    (SessionRecording, 'finalized_at'),
+    (AnnouncementImage, 'file_size'),
+    (SessionRecording, 'updated_at'),
+)
+
+# Fill new columns of rows that existed before them; each runs after the columns are added
+BACKFILLS = (
+    "UPDATE session_recordings SET status = 'completed' WHERE status IS NULL",
+)
+
+
+def _add_column(connection, model, name):
+    column = model.__table__.c[name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {model.__tablename__} ADD COLUMN {name} {column_type}"))
+    # Single-column indexes declared with index=True
+    for index in model.__table__.indexes:
+        if [indexed.name for indexed in index.columns] == [name]:
+            index.create(bind=connection, checkfirst=True)
+
+
+def apply_schema(connection):
+    """Create the missing tables and columns and backfill existing rows; returns what was changed"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    changes = []
+
+    for model in ADDED_TABLES:
+        if model.__tablename__ not in existing_tables:
+            model.__table__.create(bind=connection)
+            changes.append(f"created table {model.__tablename__}")
+
+    for model, name in ADDED_COLUMNS:
+        columns = {column['name'] for column in inspector.get_columns(model.__tablename__)}
+        if name not in columns:
+            _add_column(connection, model, name)
+            changes.append(f"added column {model.__tablename__}.{name}")
+
+    for statement in BACKFILLS:
+        updated = connection.execute(text(statement)).rowcount
+        if updated:
+            changes.append(f"backfilled {updated} rows: {statement.split(' SET ')[0]}")
+    return changes
+
+
+def init_schema(app):
+    """Register the `flask schema setup` command"""
+
+    @app.cli.group('schema')
+    def schema_cli():
+        """Database schema upgrades"""
+
+    @schema_cli.command('setup')
+    def schema_setup():
+        """Create the tables and columns added since the shipped schema; safe to run repeatedly"""
+        with db.engine.begin() as connection:
+            changes = apply_schema(connection)
+
+        for change in changes:
+            click.echo(change)
+        if not changes:
+            click.echo("The schema is up to date")
@@ -0,0 +1,316 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # only the local backend is available
+    boto3 = None
+
+# Read size when streaming an upload to disk
+STORAGE_CHUNK_SIZE = 64 * 1024
+
+# path is relative to the static folder, e.g. uploads/attachments/3f/3fa9...c2.pdf
+StoredFile = namedtuple('StoredFile', 'path sha256 size created')
+
+
+def static_path(relative_path):
+    """Absolute path of a file stored below the static folder"""
+    return os.path.join(current_app.static_folder, *relative_path.split('/'))
+
+
+def upload_relative_path(path):
+    """
+    A stored path in the uploads/... form, also accepting the static/uploads/..., /static/uploads/...
+    and static\\uploads\\... (saved on Windows) forms that rows written by older code hold
+    """
+    path = path.replace('\\', '/').lstrip('/')
+    if path.startswith('static/'):
+        path = path[len('static/'):]
+    return path
+
+
+def stored_path_forms(relative_path):
+    """Every form of a stored path (uploads/...) that rows may hold, for matching them in queries"""
+    legacy = f"static/{relative_path}"
+    return [relative_path, legacy, f"/{legacy}", legacy.replace('/', '\\')]
+
+
+def _content_type(relative_path):
+    return mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+
+
+class LocalStorage:
+    """Stored files below the static folder, sent by the app itself (or nginx, see MEDIA_ACCEL_REDIRECT)"""
+
+    # Downloads are answered by the media endpoint rather than redirected
+    redirects = False
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, relative_path):
+        return os.path.join(self.root, *relative_path.split('/'))
+
+    def exists(self, relative_path):
+        return os.path.isfile(self.path(relative_path))
+
+    def size(self, relative_path):
+        return os.path.getsize(self.path(relative_path))
+
+    def put_file(self, local_path, relative_path):
+        """Move a finished local file into storage"""
+        target = self.path(relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(local_path, target)
+
+    def put_bytes(self, relative_path, data):
+        target = self.path(relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write to a temporary name first so readers never see a partial file
+        temp_path = f"{target}.part"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+
+    def delete(self, relative_path):
+        path = self.path(relative_path)
+        if os.path.exists(path):
+            os.remove(path)
+
+    @contextmanager
+    def local_copy(self, relative_path):
+        """A readable local path of a stored file"""
+        yield self.path(relative_path)
+
+    def url(self, relative_path, expires_in):
+        return None
+
+    def list(self, prefix):
+        """(relative path, size, modified timestamp) of every file below a prefix such as uploads/attachments/"""
+        root = self.path(prefix)
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield '/'.join(os.path.relpath(path, self.root).split(os.sep)), stat.st_size, stat.st_mtime
+
+
+class S3Storage:
+    """
+    Stored files in an S3-compatible bucket (AWS S3, MinIO, ...), keyed by their relative path.
+    Downloads are redirected to short-lived presigned URLs so app workers never stream the bytes.
+    """
+
+    redirects = True
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, access_key=None, secret_key=None):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND 's3' requires boto3 to be installed")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            # MinIO and most self-hosted stores only understand path-style addressing
+            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path' if endpoint_url else 'auto'})
+        )
+
+    def key(self, relative_path):
+        return f"{self.prefix}{relative_path}"
+
+    def _head(self, relative_path):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(relative_path))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, relative_path):
+        return self._head(relative_path) is not None
+
+    def size(self, relative_path):
+        head = self._head(relative_path)
+        if head is None:
+            raise FileNotFoundError(relative_path)
+        return head['ContentLength']
+
+    def put_file(self, local_path, relative_path):
+        """Upload a finished local file (multipart when large) and remove the local copy"""
+        self.client.upload_file(
+            local_path, self.bucket, self.key(relative_path),
+            ExtraArgs={'ContentType': _content_type(relative_path)}
+        )
+        os.remove(local_path)
+
+    def put_bytes(self, relative_path, data):
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key(relative_path), Body=data, ContentType=_content_type(relative_path)
+        )
+
+    def delete(self, relative_path):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(relative_path))
+
+    @contextmanager
+    def local_copy(self, relative_path):
+        """Download a stored file to a temporary path for the duration of the block"""
+        temp = tempfile.NamedTemporaryFile(suffix=os.path.splitext(relative_path)[1], delete=False)
+        temp.close()
+        try:
+            self.client.download_file(self.bucket, self.key(relative_path), temp.name)
+            yield temp.name
+        finally:
+            os.remove(temp.name)
+
+    def url(self, relative_path, expires_in):
+        """Presigned GET URL of a stored file"""
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.key(relative_path)}, ExpiresIn=expires_in
+        )
+
+    def list(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.key(prefix)):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()
+
+
+def get_storage():
+    """The storage backend configured for the current app"""
+    return current_app.extensions['storage']
+
+
+def file_extension(filename):
+    """Lower-cased extension of the sanitised upload name ('' when there is none)"""
+    return os.path.splitext(secure_filename(filename or ''))[1].lower()
+
+
+def blob_path(folder, sha256, extension=''):
+    """
+    Content-addressed location of a blob: uploads/<folder>/<first two hex digits>/<sha256><extension>.
+    The extension is kept so the static server and templates can still tell file types apart.
+    """
+    return f"uploads/{folder}/{sha256[:2]}/{sha256}{extension}"
+
+
+def incoming_folder(folder):
+    """
+    Local scratch directory for partial uploads. With the local backend it sits next to the blobs,
+    so finishing an upload is an atomic rename. Partials never leave the server that received the
+    first chunk, so with several app servers every request of an upload must reach the same one.
+    """
+    incoming = os.path.join(current_app.static_folder, 'uploads', folder, '.incoming')
+    os.makedirs(incoming, exist_ok=True)
+    return incoming
+
+
+def commit_blob(temp_path, folder, sha256, size, extension=''):
+    """
+    Move a fully written and hashed temporary file to its content-addressed path in storage.
+    Identical content is stored once: when the blob already exists the temporary file is
+    discarded and the existing path returned (created=False).
+    """
+    relative_path = blob_path(folder, sha256, extension)
+    storage = get_storage()
+
+    if storage.exists(relative_path):
+        os.remove(temp_path)
+        return StoredFile(relative_path, sha256, size, False)
+
+    storage.put_file(temp_path, relative_path)
+    return StoredFile(relative_path, sha256, size, True)
+
+
+def store_upload(file, folder):
+    """Stream an uploaded file into content-addressed storage while hashing it; returns a StoredFile"""
+    incoming = incoming_folder(folder)
+
+    stream = getattr(file, 'stream', file)
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    # The temporary file lives next to the blobs so the final move is an atomic rename
+    with tempfile.NamedTemporaryFile(dir=incoming, suffix='.part', delete=False) as temp:
+        while True:
+            chunk = stream.read(STORAGE_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            temp.write(chunk)
+            size += len(chunk)
+
+    return commit_blob(temp.name, folder, digest.hexdigest(), size, file_extension(file.filename))
+
+
+# Inquiry and message attachments share one blob folder so a handout is stored once
+ATTACHMENT_FOLDER = 'attachments'
+
+
+def save_attachment(file):
+    """Store an inquiry or message attachment; returns a StoredFile"""
+    return store_upload(file, ATTACHMENT_FOLDER)
+
+
+def delete_stored_file(relative_path):
+    """
+    Remove a stored file.
+    Blobs are shared by content, so callers check that no other row still points at the path.
+    """
+    get_storage().delete(relative_path)
+
+
+def release_announcement_image(image):
+    """
+    Remove the stored file and derivatives of an announcement image that is being deleted,
+    unless another announcement image still uses the same blob.
+    """
+    from app.images import delete_variants
+    from app.models import AnnouncementImage
+
+    relative_path = upload_relative_path(image.image_path)
+    if AnnouncementImage.query.filter(
+        AnnouncementImage.image_path.in_(stored_path_forms(relative_path)),
+        AnnouncementImage.id != image.id
+    ).count():
+        return
+    delete_stored_file(relative_path)
+    delete_variants(relative_path)
+
+
+def init_storage(app):
+    """
+    Create the storage backend uploads are kept in: STORAGE_BACKEND 'local' (below static/, the default)
+    or 's3' (STORAGE_S3_BUCKET, with STORAGE_S3_ENDPOINT_URL pointing at MinIO or another S3-compatible
+    store). Presigned download URLs stay valid for STORAGE_URL_EXPIRES seconds.
+    """
+    app.config.setdefault('STORAGE_BACKEND', 'local')
+    app.config.setdefault('STORAGE_URL_EXPIRES', 300)
+
+    if app.config['STORAGE_BACKEND'] == 's3':
+        app.extensions['storage'] = S3Storage(
+            app.config['STORAGE_S3_BUCKET'],
+            prefix=app.config.get('STORAGE_S3_PREFIX') or '',
+            endpoint_url=app.config.get('STORAGE_S3_ENDPOINT_URL'),
+            region=app.config.get('STORAGE_S3_REGION'),
+            access_key=app.config.get('STORAGE_S3_ACCESS_KEY'),
+            secret_key=app.config.get('STORAGE_S3_SECRET_KEY')
+        )
+    else:
+        app.extensions['storage'] = LocalStorage(app.static_folder)
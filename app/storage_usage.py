@@ -0,0 +1,335 @@
+from collections import defaultdict
+from datetime import datetime
+import logging
+import os
+import re
+import time
+
+import click
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.images import IMAGE_FORMATS, IMAGE_VARIANTS, profile_pic_path
+from app.leader import leader_only
+from app.models import (
+    Announcement, AnnouncementImage, ChunkedUpload, CounselingSession, FileAttachment, Inquiry,
+    InquiryAttachment, InquiryMessage, MessageAttachment, SessionRecording, StorageUsage, User
+)
+from app.storage import get_storage, upload_relative_path
+
+logger = logging.getLogger(__name__)
+
+flask_app = None
+
+# Folders below static/uploads whose files are all referenced from a table
+SCRUBBED_FOLDERS = ('attachments', 'announcements', 'recordings', 'profile_pics')
+
+# Names the current upload code writes: content-addressed blobs and their derivatives, recordings
+# and partial files. Anything else (bundled samples, files from older code) is never scrubbed.
+SCRUBBABLE_NAME = re.compile(
+    r'^(?:[0-9a-f]{64}(?:_[a-z]+)?\.[a-z0-9]+'
+    r'|session_\d+_[0-9a-f]{32}\.webm(?:\.part)?)$'
+)
+PARTIAL_NAME = re.compile(r'^[0-9a-z_]+\.part$')
+
+DERIVATIVE_NAME = re.compile(
+    r'^(?P<stem>.+)_(%s)\.(%s)$' % (
+        '|'.join(name for name, _ in IMAGE_VARIANTS),
+        '|'.join(extension for extension, _, _ in IMAGE_FORMATS)
+    )
+)
+
+
+def _announcement_owners(session, image):
+    announcement = image.announcement or session.get(Announcement, image.announcement_id)
+    if not announcement:
+        return None, None
+    return announcement.author_id, announcement.target_office_id
+
+
+def _attachment_owners(session, attachment):
+    inquiry = None
+    if isinstance(attachment, InquiryAttachment):
+        inquiry = attachment.inquiry or session.get(Inquiry, attachment.inquiry_id)
+    elif isinstance(attachment, MessageAttachment):
+        message = attachment.message or session.get(InquiryMessage, attachment.message_id)
+        if message:
+            inquiry = message.inquiry or session.get(Inquiry, message.inquiry_id)
+    return attachment.uploaded_by_id, inquiry.office_id if inquiry else None
+
+
+def _recording_owners(session, recording):
+    counseling_session = recording.session or session.get(CounselingSession, recording.session_id)
+    if not counseling_session:
+        return None, None
+    return counseling_session.counselor_id, counseling_session.office_id
+
+
+# Model -> (user id, office id) its files are charged to
+TRACKED_MODELS = {
+    InquiryAttachment: _attachment_owners,
+    MessageAttachment: _attachment_owners,
+    SessionRecording: _recording_owners,
+    AnnouncementImage: _announcement_owners,
+}
+
+
+def _stored_size(session, row):
+    """file_size as last flushed; the attribute may have been expired by a commit before being changed"""
+    history = get_history(row, 'file_size')
+    if history.deleted or history.unchanged:
+        return (history.deleted or history.unchanged)[0] or 0
+    model = type(row)
+    return session.query(model.file_size).filter(model.id == row.id).scalar() or 0
+
+
+def _usage_changes(session):
+    # (owner type, owner id) -> [bytes, files]
+    changes = defaultdict(lambda: [0, 0])
+    with session.no_autoflush:
+        for rows, files in ((session.new, 1), (session.deleted, -1), (session.dirty, 0)):
+            for row in rows:
+                owners_of = TRACKED_MODELS.get(type(row))
+                if owners_of is None:
+                    continue
+                if files == 1:
+                    size = row.file_size or 0
+                elif files == -1:
+                    size = -_stored_size(session, row)
+                elif get_history(row, 'file_size').added:
+                    size = (row.file_size or 0) - _stored_size(session, row)
+                else:
+                    size = 0
+                if not size and not files:
+                    continue
+
+                user_id, office_id = owners_of(session, row)
+                for owner in (('user', user_id), ('office', office_id)):
+                    if owner[1] is not None:
+                        changes[owner][0] += size
+                        changes[owner][1] += files
+    return {owner: change for owner, change in changes.items() if change != [0, 0]}
+
+
+def apply_usage_changes(connection, changes):
+    """Add byte and file deltas to the ledger in the current transaction"""
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    table = StorageUsage.__table__
+    now = datetime.utcnow()
+    for (owner_type, owner_id), (size, files) in sorted(changes.items()):
+        statement = dialect.insert(table).values(
+            owner_type=owner_type, owner_id=owner_id, bytes_used=size, file_count=files, updated_at=now
+        )
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['owner_type', 'owner_id'],
+            set_={
+                'bytes_used': table.c.bytes_used + size,
+                'file_count': table.c.file_count + files,
+                'updated_at': now
+            }
+        ))
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_usage_changes(session, flush_context, instances):
+    # Before the flush, deleted rows can still reach their inquiry, session or announcement
+    changes = _usage_changes(session)
+    if changes:
+        apply_usage_changes(session.connection(), changes)
+
+
+def _usage_totals():
+    """Ledger contents recomputed from the tables"""
+    totals = defaultdict(lambda: [0, 0])
+
+    def add(owner_type, rows):
+        for owner_id, size, files in rows:
+            if owner_id is not None:
+                totals[(owner_type, owner_id)][0] += int(size or 0)
+                totals[(owner_type, owner_id)][1] += files
+
+    size, files = func.coalesce(func.sum(FileAttachment.file_size), 0), func.count(FileAttachment.id)
+    add('user', db.session.query(FileAttachment.uploaded_by_id, size, files).group_by(FileAttachment.uploaded_by_id))
+    add('office', db.session.query(Inquiry.office_id, size, files)
+        .select_from(InquiryAttachment).join(Inquiry, InquiryAttachment.inquiry_id == Inquiry.id)
+        .group_by(Inquiry.office_id))
+    add('office', db.session.query(Inquiry.office_id, size, files)
+        .select_from(MessageAttachment)
+        .join(InquiryMessage, MessageAttachment.message_id == InquiryMessage.id)
+        .join(Inquiry, InquiryMessage.inquiry_id == Inquiry.id)
+        .group_by(Inquiry.office_id))
+
+    size, files = func.coalesce(func.sum(SessionRecording.file_size), 0), func.count(SessionRecording.id)
+    for owner_type, column in (('user', CounselingSession.counselor_id), ('office', CounselingSession.office_id)):
+        add(owner_type, db.session.query(column, size, files)
+            .select_from(SessionRecording).join(CounselingSession, SessionRecording.session_id == CounselingSession.id)
+            .group_by(column))
+
+    size, files = func.coalesce(func.sum(AnnouncementImage.file_size), 0), func.count(AnnouncementImage.id)
+    for owner_type, column in (('user', Announcement.author_id), ('office', Announcement.target_office_id)):
+        add(owner_type, db.session.query(column, size, files)
+            .select_from(AnnouncementImage).join(Announcement, AnnouncementImage.announcement_id == Announcement.id)
+            .group_by(column))
+    return totals
+
+
+def fill_missing_sizes():
+    """
+    Record the stored size of announcement images and finished recordings saved before sizes
+    were tracked; rows whose file is gone keep no size. Returns how many rows were updated.
+    """
+    storage = get_storage()
+    updated = 0
+    for model, path_column in ((AnnouncementImage, 'image_path'), (SessionRecording, 'recording_path')):
+        query = model.query.filter(model.file_size.is_(None))
+        if model is SessionRecording:
+            query = query.filter(SessionRecording.status != 'recording')
+        for row in query:
+            try:
+                row.file_size = storage.size(upload_relative_path(getattr(row, path_column)))
+            except FileNotFoundError:
+                continue
+            updated += 1
+    db.session.commit()
+    return updated
+
+
+def rebuild_usage():
+    """Replace the ledger with totals recomputed from the tables; corrects drift from bulk or raw SQL deletes"""
+    totals = _usage_totals()
+    now = datetime.utcnow()
+    StorageUsage.query.delete()
+    db.session.add_all(
+        StorageUsage(owner_type=owner_type, owner_id=owner_id, bytes_used=size, file_count=files, updated_at=now)
+        for (owner_type, owner_id), (size, files) in totals.items()
+    )
+    db.session.commit()
+    return len(totals)
+
+
+def usage_report(owner_type, limit=None):
+    """Ledger rows of one owner type, largest first"""
+    query = StorageUsage.query.filter_by(owner_type=owner_type).order_by(StorageUsage.bytes_used.desc())
+    return query.limit(limit).all() if limit else query.all()
+
+
+def referenced_paths():
+    """Every stored path a table points at, plus the partial files of uploads and recordings in progress"""
+    paths = set()
+    for query in (
+        db.session.query(FileAttachment.file_path),
+        db.session.query(ChunkedUpload.file_path).filter(ChunkedUpload.file_path.isnot(None)),
+        db.session.query(AnnouncementImage.image_path),
+        db.session.query(SessionRecording.recording_path),
+    ):
+        # Rows written by older code hold static/uploads/... paths
+        paths.update(upload_relative_path(path) for (path,) in query)
+
+    paths.update(
+        profile_pic_path(profile_pic)
+        for (profile_pic,) in db.session.query(User.profile_pic).filter(User.profile_pic.isnot(None))
+    )
+    paths.update(
+        f"uploads/attachments/.incoming/{upload_id}.part"
+        for (upload_id,) in db.session.query(ChunkedUpload.id).filter_by(status='uploading')
+    )
+    paths.update(
+        f"{upload_relative_path(path)}.part"
+        for (path,) in db.session.query(SessionRecording.recording_path).filter_by(status='recording')
+    )
+    return paths
+
+
+def _scrubbable(relative_path):
+    directory, _, name = relative_path.rpartition('/')
+    if directory.endswith('/.incoming'):
+        return PARTIAL_NAME.match(name) is not None
+    return SCRUBBABLE_NAME.match(name) is not None
+
+
+def find_orphans(grace_seconds):
+    """
+    Stored files below the scrubbed upload folders that no row references (directly or as an image
+    derivative) and that are older than the grace period, which covers files written just
+    before their row is committed. Only names the upload code writes are considered.
+    Yields (relative path, size).
+    """
+    referenced = referenced_paths()
+    referenced_stems = {os.path.splitext(path)[0] for path in referenced}
+    cutoff = time.time() - grace_seconds
+
+    storage = get_storage()
+    for folder in SCRUBBED_FOLDERS:
+        for relative_path, size, modified in storage.list(f"uploads/{folder}/"):
+            if relative_path in referenced or not _scrubbable(relative_path):
+                continue
+            derivative = DERIVATIVE_NAME.match(relative_path)
+            if derivative and derivative.group('stem') in referenced_stems:
+                continue
+            if modified > cutoff:
+                continue
+            yield relative_path, size
+
+
+def scrub_orphans(grace_seconds=None, dry_run=False):
+    """Delete orphaned upload files; returns (files, bytes) reclaimed (or reclaimable when dry_run)"""
+    if grace_seconds is None:
+        grace_seconds = current_app.config['STORAGE_ORPHAN_GRACE_SECONDS']
+    storage = get_storage()
+    files = size = 0
+    for relative_path, file_size in list(find_orphans(grace_seconds)):
+        if not dry_run:
+            try:
+                storage.delete(relative_path)
+            except Exception as e:
+                logger.warning(f"Could not remove orphaned file {relative_path}: {str(e)}")
+                continue
+        files += 1
+        size += file_size
+    return files, size
+
+
+@leader_only
+def run_storage_scrub():
+    """Scheduler job; reclaims orphaned upload files and reconciles the usage ledger"""
+    with flask_app.app_context():
+        try:
+            files, size = scrub_orphans()
+            if files:
+                logger.info(f"Removed {files} orphaned upload files ({size} bytes)")
+            rebuild_usage()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error scrubbing upload storage: {str(e)}")
+
+
+def init_storage_usage(app):
+    """Register the `flask storage` commands and the orphan grace period"""
+    global flask_app
+    flask_app = app
+
+    app.config.setdefault('STORAGE_ORPHAN_GRACE_SECONDS', 24 * 3600)
+
+    @app.cli.group('storage')
+    def storage_cli():
+        """Upload storage accounting"""
+
+    @storage_cli.command('rebuild-usage')
+    def rebuild_usage_command():
+        """Recompute the per-user and per-office usage ledger from the tables"""
+        filled = fill_missing_sizes()
+        if filled:
+            click.echo(f"Recorded the size of {filled} older images and recordings")
+        click.echo(f"{rebuild_usage()} ledger rows written")
+
+    @storage_cli.command('scrub')
+    @click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+    @click.option('--grace-seconds', type=int, default=None, help='Skip files modified more recently than this.')
+    def scrub_command(dry_run, grace_seconds):
+        """Remove upload files no row references"""
+        files, size = scrub_orphans(grace_seconds, dry_run=dry_run)
+        click.echo(f"{'Would remove' if dry_run else 'Removed'} {files} files ({size} bytes)")
@@ -47,15 +47,12 @@ def announcements():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed announcements",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/announcements.html',
@@ -100,15 +97,12 @@ def view_announcement(announcement_id):
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Viewed announcement #{announcement_id}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/view_announcement.html',
@@ -10,6 +10,7 @@ from app.models import (
 )
 from app.extensions import db
 from app.utils import role_required
+from app.scheduler import schedule_session_reminders, cancel_session_reminders
 
 @student_bp.route('/counseling-sessions')
 @login_required
@@ -39,15 +40,12 @@ def counseling_sessions():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed counseling sessions",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/counseling_sessions.html',
@@ -83,15 +81,12 @@ def view_session(session_id):
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Viewed counseling session #{session_id}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     # Placeholder - return a simple template
     return render_template(
@@ -152,18 +147,20 @@ def schedule_session():
         db.session.add(new_session)
         
         # Log this activity
-        log_entry = StudentActivityLog(
-            student_id=student.id,
+        StudentActivityLog.log_action(
+            student,
             action="Scheduled new counseling session",
             related_id=new_session.id,
             related_type="counseling_session",
-            timestamp=datetime.utcnow(),
             ip_address=request.remote_addr,
             user_agent=request.user_agent.string
         )
-        db.session.add(log_entry)
         
         db.session.commit()
+        
+        # Register the one-shot reminder jobs for video sessions
+        schedule_session_reminders(new_session)
+        
         flash('Counseling session requested successfully. An office administrator will review and confirm your request.', 'success')
         return redirect(url_for('student.view_session', session_id=new_session.id))
         
@@ -211,15 +208,12 @@ def request_counseling_session():
     max_date = (datetime.utcnow() + timedelta(days=30)).date().strftime('%Y-%m-%d')
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed counseling session request form",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/request_counseling.html',
@@ -240,15 +234,12 @@ def check_office_video_support(office_id):
     
     # Log this API call
     student = Student.query.filter_by(user_id=current_user.id).first()
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Checked video support for office: {office.name}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return jsonify({
         'supports_video': office.supports_video,
@@ -288,18 +279,17 @@ def cancel_session(session_id):
             session.notes = f"Cancellation reason: {reason}"
         
         # Log this activity
-        log_entry = StudentActivityLog(
-            student_id=student.id,
+        StudentActivityLog.log_action(
+            student,
             action=f"Cancelled counseling session #{session_id}",
             related_id=session.id,
             related_type="counseling_session",
-            timestamp=datetime.utcnow(),
             ip_address=request.remote_addr,
             user_agent=request.user_agent.string
         )
-        db.session.add(log_entry)
         
         db.session.commit()
+        cancel_session_reminders(session.id)
         flash('Counseling session cancelled successfully.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -362,16 +352,14 @@ def request_recording(session_id):
         db.session.add(notification)
         
         # Log this activity
-        log_entry = StudentActivityLog(
-            student_id=student.id,
+        StudentActivityLog.log_action(
+            student,
             action=f"Requested recording for counseling session #{session_id}",
             related_id=session.id,
             related_type="counseling_session",
-            timestamp=datetime.utcnow(),
             ip_address=request.remote_addr,
             user_agent=request.user_agent.string
         )
-        db.session.add(log_entry)
         
         db.session.commit()
         return jsonify({
@@ -435,16 +423,14 @@ def join_video_session(session_id):
         db.session.add(participation)
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Joined video session #{session_id}",
         related_id=session.id,
         related_type="counseling_session",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
     db.session.commit()
     
     # Get unread notifications count for navbar
@@ -531,15 +517,12 @@ def counseling_dashboard():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed counseling dashboard",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/counseling_dashboard.html',
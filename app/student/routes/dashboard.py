@@ -119,15 +119,12 @@ def dashboard():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Record this dashboard view as activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed dashboard",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/student_dashboard.html',
@@ -10,6 +10,9 @@ from app.models import (
 )
 from app.extensions import db
 from app.utils import role_required
+from app.storage import save_attachment
+from app.uploads import attach_uploads
+from app.versioning import versioned_json, current_versions, inquiry_scope
 import os
 from werkzeug.utils import secure_filename
 
@@ -19,18 +22,6 @@ try:
 except ImportError:
     broadcast_new_inquiry = None
 
-def save_attachment(file, folder_name):
-    """Save an uploaded file to the specified folder and return the file path."""
-    upload_folder = os.path.join('static', 'uploads', folder_name)
-    os.makedirs(upload_folder, exist_ok=True)
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    unique_filename = f"{timestamp}_{filename}"
-    file_path = os.path.join(upload_folder, unique_filename)
-    # Fix invalid escape sequence by using raw string or double backslashes
-    file.save(os.path.join(r'd:\SystemProject\KapiyuGuide_System', file_path))
-    return file_path
-
 # Inquiry list view
 @student_bp.route('/inquiries')
 @login_required
@@ -86,15 +77,12 @@ def inquiries():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed inquiries list",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/inquiries.html',
@@ -153,17 +141,14 @@ def view_inquiry(inquiry_id):
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Viewed inquiry #{inquiry.id}",
         related_id=inquiry.id,
         related_type="inquiry",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/view_inquiry.html',
@@ -205,15 +190,12 @@ def submit_inquiry(office_id):
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Viewed submission form for {office.name}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/submit_inquiry.html',
@@ -289,22 +271,25 @@ def create_inquiry():
             files = request.files.getlist('attachments')
             for file in files:
                 if file and file.filename:
-                    file_path = save_attachment(file, 'inquiries')
-                    if file_path:
-                        # Create file attachment with proper fields
-                        attachment = InquiryAttachment(
-                            filename=secure_filename(file.filename),
-                            file_path=file_path,
-                            file_size=len(file.read()),
-                            file_type=file.content_type if hasattr(file, 'content_type') else None,
-                            uploaded_by_id=current_user.id,  # Pass the user ID to uploaded_by_id
-                            uploaded_at=datetime.utcnow(),
-                            inquiry_id=new_inquiry.id
-                        )
-                        # Reset file pointer after reading size
-                        file.seek(0)
-                        db.session.add(attachment)        # Log this activity
-        log_entry = StudentActivityLog.log_action(
+                    stored = save_attachment(file)
+                    # Create file attachment with proper fields
+                    attachment = InquiryAttachment(
+                        filename=secure_filename(file.filename),
+                        file_path=stored.path,
+                        file_size=stored.size,
+                        sha256=stored.sha256,
+                        file_type=file.content_type if hasattr(file, 'content_type') else None,
+                        uploaded_by_id=current_user.id,  # Pass the user ID to uploaded_by_id
+                        uploaded_at=datetime.utcnow(),
+                        inquiry_id=new_inquiry.id
+                    )
+                    db.session.add(attachment)
+
+        # Files sent ahead through the chunked upload API
+        attach_uploads(request.form.getlist('upload_ids'), current_user, InquiryAttachment, inquiry_id=new_inquiry.id)
+
+        # Log this activity
+        StudentActivityLog.log_action(
             student=student,
             action="Created new inquiry",
             related_id=new_inquiry.id,
@@ -377,22 +362,24 @@ def reply_to_inquiry(inquiry_id):
             files = request.files.getlist('attachments')
             for file in files:
                 if file and file.filename:
-                    file_path = save_attachment(file, 'inquiries')
-                    if file_path:
-                        # Create file attachment with proper fields
-                        from app.models import MessageAttachment
-                        attachment = MessageAttachment(
-                            filename=secure_filename(file.filename),
-                            file_path=file_path,
-                            file_size=len(file.read()),
-                            file_type=file.content_type if hasattr(file, 'content_type') else None,
-                            uploaded_by_id=current_user.id,
-                            uploaded_at=datetime.utcnow(),
-                            message_id=new_message.id
-                        )
-                        # Reset file pointer after reading size
-                        file.seek(0)
-                        db.session.add(attachment)
+                    stored = save_attachment(file)
+                    # Create file attachment with proper fields
+                    from app.models import MessageAttachment
+                    attachment = MessageAttachment(
+                        filename=secure_filename(file.filename),
+                        file_path=stored.path,
+                        file_size=stored.size,
+                        sha256=stored.sha256,
+                        file_type=file.content_type if hasattr(file, 'content_type') else None,
+                        uploaded_by_id=current_user.id,
+                        uploaded_at=datetime.utcnow(),
+                        message_id=new_message.id
+                    )
+                    db.session.add(attachment)
+
+        # Files sent ahead through the chunked upload API
+        from app.models import MessageAttachment
+        attach_uploads(request.form.getlist('upload_ids'), current_user, MessageAttachment, message_id=new_message.id)
         
         # Create notification for office admin
         # Find office admins for this inquiry's office
@@ -407,7 +394,7 @@ def reply_to_inquiry(inquiry_id):
             db.session.add(notification)
         
         # Log this activity using the log_action helper method
-        log_entry = StudentActivityLog.log_action(
+        StudentActivityLog.log_action(
             student=student,
             action=f"Replied to inquiry",
             related_id=inquiry.id,
@@ -433,6 +420,8 @@ def reply_to_inquiry(inquiry_id):
 @student_bp.route('/api/inquiry/<int:inquiry_id>/messages', methods=['GET'])
 @login_required
 @role_required(['student'])
+# The user id keeps one user's cached history (and access check) from answering another
+@versioned_json(lambda inquiry_id: (current_user.id, current_versions(inquiry_scope(inquiry_id))))
 def get_older_messages(inquiry_id):
     """API to fetch older messages for infinite scrolling"""
     try:
@@ -35,15 +35,12 @@ def university_offices():
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action="Viewed university offices",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/university_offices.html',
@@ -76,15 +73,12 @@ def view_office_detail(office_id):
     ).order_by(desc(Notification.created_at)).limit(5).all()
     
     # Log this activity
-    log_entry = StudentActivityLog(
-        student_id=student.id,
+    StudentActivityLog.log_action(
+        student,
         action=f"Viewed office details: {office.name}",
-        timestamp=datetime.utcnow(),
         ip_address=request.remote_addr,
         user_agent=request.user_agent.string
     )
-    db.session.add(log_entry)
-    db.session.commit()
     
     return render_template(
         'student/office_detail.html',
@@ -0,0 +1,256 @@
+from datetime import datetime, timedelta
+from threading import Lock
+import hashlib
+import logging
+import os
+import uuid
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from app.extensions import db
+from app.leader import leader_only
+from app.models import ChunkedUpload
+from app.storage import (
+    ATTACHMENT_FOLDER, STORAGE_CHUNK_SIZE, commit_blob, file_extension, incoming_folder
+)
+
+logger = logging.getLogger(__name__)
+
+flask_app = None
+
+# upload id -> (bytes hashed, sha256 object); saves re-reading the partial file on every chunk.
+# Another worker (or a restart) rebuilds the hash from the file, so the cache is only an optimisation.
+_hashers = {}
+_hashers_lock = Lock()
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be applied; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400, upload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.upload = upload
+
+
+def partial_path(upload):
+    return os.path.join(incoming_folder(ATTACHMENT_FOLDER), f"{upload.id}.part")
+
+
+def _existing_partial(upload):
+    path = partial_path(upload)
+    if os.path.exists(path):
+        return path
+    if upload.expires_at and upload.expires_at < datetime.utcnow():
+        raise UploadError("The partial upload has expired; start again", 410, upload)
+    # Partials are scratch files on the server that started the upload, see docs/UPGRADING.md
+    logger.warning(f"Upload {upload.id} has no partial file on this server; is upload routing sticky?")
+    raise UploadError("The partial upload is not on this server; start again", 410, upload)
+
+
+def _expiry():
+    return datetime.utcnow() + timedelta(seconds=current_app.config['UPLOAD_TTL_SECONDS'])
+
+
+def initiate_upload(user, filename, total_size, content_type=None):
+    """Start a chunked upload of `total_size` bytes and create its empty partial file"""
+    filename = secure_filename(filename or '')
+    if not filename:
+        raise UploadError("A file name is required")
+    if not total_size or total_size <= 0:
+        raise UploadError("The file size must be given in bytes")
+    if total_size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError("The file is larger than the upload limit", 413)
+
+    upload = ChunkedUpload(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        filename=filename,
+        content_type=content_type,
+        total_size=total_size,
+        received_size=0,
+        status='uploading',
+        expires_at=_expiry()
+    )
+    open(partial_path(upload), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def _hasher_for(upload, path):
+    with _hashers_lock:
+        cached = _hashers.get(upload.id)
+    if cached and cached[0] == upload.received_size:
+        return cached[1].copy()
+
+    # Rebuild from the bytes already accepted
+    hasher = hashlib.sha256()
+    remaining = upload.received_size
+    with open(path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(STORAGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise UploadError("The partial upload is missing data; start again", 410, upload)
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def append_chunk(upload, offset, stream):
+    """
+    Write one chunk at `offset`, which must equal the bytes received so far.
+    A mismatch answers 409 with the current offset so the client can resume from there.
+    """
+    if upload.status != 'uploading':
+        raise UploadError("The upload is already finalized", 409, upload)
+    if offset != upload.received_size:
+        raise UploadError("The chunk offset does not match the bytes received", 409, upload)
+
+    path = _existing_partial(upload)
+    hasher = _hasher_for(upload, path)
+    received = upload.received_size
+    with open(path, 'r+b') as f:
+        # Drop bytes left behind by an interrupted chunk
+        f.seek(received)
+        f.truncate()
+        while True:
+            chunk = stream.read(STORAGE_CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > upload.total_size:
+                f.truncate(upload.received_size)
+                raise UploadError("The chunk runs past the declared file size", 413, upload)
+            hasher.update(chunk)
+            f.write(chunk)
+
+    upload.received_size = received
+    upload.updated_at = datetime.utcnow()
+    upload.expires_at = _expiry()
+    db.session.commit()
+
+    with _hashers_lock:
+        _hashers[upload.id] = (received, hasher)
+    return upload
+
+
+def finalize_upload(upload, expected_sha256=None):
+    """
+    Move a fully received upload into content-addressed attachment storage.
+    Finalizing twice returns the same result.
+    """
+    if upload.status != 'uploading':
+        return upload
+    if upload.received_size != upload.total_size:
+        raise UploadError("The upload is incomplete", 409, upload)
+
+    path = _existing_partial(upload)
+    sha256 = _hasher_for(upload, path).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        # Corrupted in transit; the client has to send it again
+        discard_upload(upload)
+        raise UploadError("The file hash does not match; upload it again", 422)
+
+    stored = commit_blob(path, ATTACHMENT_FOLDER, sha256, upload.total_size, file_extension(upload.filename))
+    upload.sha256 = stored.sha256
+    upload.file_path = stored.path
+    upload.status = 'complete'
+    upload.updated_at = datetime.utcnow()
+    upload.expires_at = _expiry()
+    db.session.commit()
+
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    return upload
+
+
+def discard_upload(upload):
+    """Delete an upload and its partial file"""
+    with _hashers_lock:
+        _hashers.pop(upload.id, None)
+    if upload.status == 'uploading':
+        path = partial_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+    db.session.delete(upload)
+    db.session.commit()
+
+
+def attach_uploads(upload_ids, user, attachment_model, **parent):
+    """
+    Turn the user's finalized uploads into attachment rows (e.g. InquiryAttachment with
+    inquiry_id=...). Unknown, foreign or unfinished ids are skipped. The caller commits.
+    """
+    if not upload_ids:
+        return []
+
+    uploads = ChunkedUpload.query.filter(
+        ChunkedUpload.id.in_(upload_ids),
+        ChunkedUpload.user_id == user.id,
+        ChunkedUpload.status == 'complete'
+    ).all()
+
+    attachments = []
+    for upload in uploads:
+        attachment = attachment_model(
+            filename=upload.filename,
+            file_path=upload.file_path,
+            file_size=upload.total_size,
+            sha256=upload.sha256,
+            file_type=upload.content_type,
+            uploaded_by_id=user.id,
+            uploaded_at=datetime.utcnow(),
+            **parent
+        )
+        db.session.add(attachment)
+        upload.status = 'attached'
+        attachments.append(attachment)
+    return attachments
+
+
+def purge_stale_uploads(now=None):
+    """Forget uploads past their expiry and delete unfinished partial files; returns the number removed"""
+    now = now or datetime.utcnow()
+    stale = ChunkedUpload.query.filter(ChunkedUpload.expires_at <= now).all()
+
+    for upload in stale:
+        if upload.status == 'uploading':
+            path = partial_path(upload)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove partial upload {path}: {str(e)}")
+                    continue
+        with _hashers_lock:
+            _hashers.pop(upload.id, None)
+        db.session.delete(upload)
+
+    db.session.commit()
+    return len(stale)
+
+
+@leader_only
+def run_upload_cleanup():
+    """Scheduler job; removes abandoned chunked uploads"""
+    with flask_app.app_context():
+        try:
+            removed = purge_stale_uploads()
+            if removed:
+                logger.info(f"Removed {removed} stale chunked uploads")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error removing stale chunked uploads: {str(e)}")
+
+
+def init_uploads(app):
+    """Configure chunked upload limits and how long unfinished uploads are kept"""
+    global flask_app
+    flask_app = app
+
+    # A whole file may exceed MAX_CONTENT_LENGTH; each chunk request still has to fit under it
+    app.config.setdefault('UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+    app.config.setdefault('UPLOAD_CHUNK_SIZE', 1024 * 1024)
+    app.config.setdefault('UPLOAD_TTL_SECONDS', 24 * 3600)
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from threading import Lock
+import hashlib
+
+from flask import current_app, make_response, request
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Announcement, AnnouncementImage, CacheVersion, CounselingSession, Inquiry, InquiryMessage
+)
+
+ANNOUNCEMENTS_SCOPE = 'announcements'
+
+
+def office_scope(office_id):
+    return f"office:{office_id}"
+
+
+def inquiry_scope(inquiry_id):
+    return f"inquiry:{inquiry_id}"
+
+
+# Model -> scopes a change to one of its rows invalidates
+VERSIONED_MODELS = {
+    Inquiry: lambda row: [office_scope(row.office_id)],
+    CounselingSession: lambda row: [office_scope(row.office_id)],
+    InquiryMessage: lambda row: [inquiry_scope(row.inquiry_id)],
+    Announcement: lambda row: [ANNOUNCEMENTS_SCOPE],
+    AnnouncementImage: lambda row: [ANNOUNCEMENTS_SCOPE],
+}
+
+# ETag -> serialized body; per process, so a restart or another worker only costs one recompute
+_bodies = OrderedDict()
+_bodies_lock = Lock()
+
+
+def _changed_scopes(session):
+    scopes = set()
+    for rows, check in ((session.new, False), (session.dirty, True), (session.deleted, False)):
+        for row in rows:
+            scopes_for = VERSIONED_MODELS.get(type(row))
+            if scopes_for is None:
+                continue
+            if check and not session.is_modified(row, include_collections=False):
+                continue
+            scopes.update(scope for scope in scopes_for(row) if not scope.endswith(':None'))
+    return scopes
+
+
+def bump_versions(connection, scopes):
+    """Increment the counters of `scopes` in the current transaction"""
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    now = datetime.utcnow()
+    for scope in sorted(scopes):  # Fixed order so concurrent flushes lock rows the same way
+        statement = dialect.insert(CacheVersion.__table__).values(key=scope, version=1, updated_at=now)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'version': CacheVersion.__table__.c.version + 1, 'updated_at': now}
+        ))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_scopes(session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    scopes = _changed_scopes(session)
+    if scopes:
+        bump_versions(session.connection(), scopes)
+
+
+def current_versions(*scopes):
+    """Counters of the given scopes, 0 for scopes that never changed"""
+    rows = dict(
+        CacheVersion.query.with_entities(CacheVersion.key, CacheVersion.version)
+        .filter(CacheVersion.key.in_(scopes)).all()
+    )
+    return tuple(rows.get(scope, 0) for scope in scopes)
+
+
+def _cache_body(etag, body):
+    with _bodies_lock:
+        _bodies[etag] = body
+        _bodies.move_to_end(etag)
+        while len(_bodies) > current_app.config['VERSIONED_BODY_CACHE_SIZE']:
+            _bodies.popitem(last=False)
+
+
+def _cached_body(etag):
+    with _bodies_lock:
+        body = _bodies.get(etag)
+        if body is not None:
+            _bodies.move_to_end(etag)
+        return body
+
+
+def _tag(response, etag):
+    response.set_etag(etag)
+    # Stored by the browser but revalidated on every poll
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def versioned_json(version_key):
+    """
+    Answer a JSON polling endpoint from its version instead of recomputing it.
+
+    `version_key` receives the view arguments and returns a cheap tuple that changes whenever the
+    body would (e.g. current_versions(office_scope(id)) plus the user id when the body depends on it),
+    or None to always run the view. The ETag covers the endpoint, that key and the query string.
+    A matching If-None-Match gets 304; otherwise a body cached for the same ETag is returned
+    without running the view. Only 200 responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = version_key(*args, **kwargs)
+            if key is None:
+                return view(*args, **kwargs)
+
+            etag = hashlib.sha1(
+                repr((request.endpoint, key, sorted(request.args.items(multi=True)))).encode('utf-8')
+            ).hexdigest()
+
+            # Weak comparison: the compression middleware weakens ETags of compressed bodies
+            if request.if_none_match.contains_weak(etag):
+                return _tag(current_app.response_class(status=304), etag)
+
+            body = _cached_body(etag)
+            if body is not None:
+                return _tag(current_app.response_class(body, mimetype='application/json'), etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.mimetype != 'application/json':
+                return response
+            _cache_body(etag, response.get_data())
+            return _tag(response, etag)
+        return wrapper
+    return decorator
+
+
+def init_versioning(app):
+    """Configure how many serialized polling bodies each process keeps"""
+    app.config.setdefault('VERSIONED_BODY_CACHE_SIZE', 512)
@@ -3,6 +3,7 @@ from flask import request, session
 from flask_login import current_user
 from app.extensions import socketio, db
 from app.models import User, InquiryMessage, Inquiry, Student, Office, OfficeAdmin, Notification
+from app.jobs.tasks import notify_office_admins
 from datetime import datetime
 
 @socketio.on('connect', namespace='/chat')
@@ -145,20 +146,8 @@ def handle_send_message(data):
         
         # Create a notification for the recipient
         if current_user.role == 'student':
-            # Message is from student to office, notify office admin(s)
-            office = Office.query.get(inquiry.office_id)
-            office_admins = OfficeAdmin.query.filter_by(office_id=office.id).all()
-            
-            for admin in office_admins:
-                notification = Notification(
-                    user_id=admin.user_id,
-                    title="New Message",
-                    message=f"New message from {current_user.get_full_name()} in inquiry '{inquiry.subject}'",
-                    is_read=False,
-                    notification_type='inquiry_reply',
-                    inquiry_id=inquiry_id
-                )
-                db.session.add(notification)
+            # Message is from student to office; fan out to the office admin(s) in the job queue
+            notify_office_admins.delay(inquiry_id=inquiry.id, sender_name=current_user.get_full_name())
         else:
             # Message is from office to student, notify student
             notification = Notification(
@@ -1,7 +1,11 @@
 from flask_socketio import emit, join_room, leave_room, disconnect, rooms
 from flask_login import current_user
 from app.extensions import socketio, db
-from app.models import CounselingSession, SessionParticipation, Student, User, OfficeAdmin
+from app.models import CounselingSession, SessionParticipation, SessionRecording, Student, User, OfficeAdmin
+from app.websockets.quality import quality_aggregator
+from app.recordings import (
+    RecordingError, start_recording, append_chunk, finalize_session_recording
+)
 from datetime import datetime
 import uuid
 import logging
@@ -479,9 +483,18 @@ def handle_toggle_video(data):
         'name': current_user.get_full_name()
     }, room=room_name, include_self=False)
 
+def _recording_session(session_id):
+    """The session if the current user may record it (its counselor or a super admin)"""
+    session = CounselingSession.query.get(session_id)
+    if not session:
+        return None
+    if session.counselor_id != current_user.id and current_user.role != 'super_admin':
+        return None
+    return session
+
 @socketio.on('start_recording', namespace='/video-counseling')
 def handle_start_recording(data):
-    """Handle recording start (counselor only)"""
+    """Handle recording start (counselor only); opens the file that chunks are appended to"""
     if current_user.role not in ['office_admin', 'super_admin']:
         emit('error', {'message': 'Only counselors can start recording'})
         return
@@ -490,6 +503,22 @@ def handle_start_recording(data):
     if not session_id:
         return
     
+    session = _recording_session(session_id)
+    if not session:
+        emit('error', {'message': 'Access denied or session not found'})
+        return
+    
+    try:
+        recording = start_recording(session, student_consent=bool(data.get('student_consent')))
+    except RecordingError as e:
+        emit('error', {'message': str(e)})
+        return
+    except Exception as e:
+        db.session.rollback()
+        emit('error', {'message': 'Failed to start recording'})
+        logger.error(f"Error starting recording for session {session_id}: {str(e)}")
+        return
+    
     room_name = f"video_session_{session_id}"
     
     # Notify all participants that recording has started
@@ -500,10 +529,44 @@ def handle_start_recording(data):
     }, room=room_name)
     
     logger.info(f"Recording started by {current_user.id} in session {session_id}")
+    # The offset tells a reconnecting recorder where to continue
+    return {'offset': recording.file_size}
+
+@socketio.on('recording_chunk', namespace='/video-counseling')
+def handle_recording_chunk(data):
+    """
+    Append one MediaRecorder chunk to the session's recording file.
+    Acknowledged with the stored offset; on error the client resends from that offset.
+    """
+    if current_user.role not in ['office_admin', 'super_admin']:
+        return {'error': 'Only counselors can record'}
+    
+    session_id = data.get('session_id')
+    chunk = data.get('chunk')
+    if not session_id or not isinstance(chunk, (bytes, bytearray)):
+        return {'error': 'Session ID and binary chunk required'}
+    
+    if not _recording_session(session_id):
+        return {'error': 'Access denied or session not found'}
+    
+    recording = SessionRecording.query.filter_by(session_id=session_id, status='recording').first()
+    if not recording:
+        return {'error': 'Recording is not in progress'}
+    
+    try:
+        append_chunk(recording, int(data.get('offset', -1)), bytes(chunk))
+    except RecordingError as e:
+        return {'error': str(e), 'offset': recording.file_size}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error storing recording chunk for session {session_id}: {str(e)}")
+        return {'error': 'Failed to store chunk', 'offset': recording.file_size}
+    
+    return {'offset': recording.file_size}
 
 @socketio.on('stop_recording', namespace='/video-counseling')
 def handle_stop_recording(data):
-    """Handle recording stop (counselor only)"""
+    """Handle recording stop (counselor only); finalizes the recording file"""
     if current_user.role not in ['office_admin', 'super_admin']:
         emit('error', {'message': 'Only counselors can stop recording'})
         return
@@ -512,6 +575,17 @@ def handle_stop_recording(data):
     if not session_id:
         return
     
+    if not _recording_session(session_id):
+        emit('error', {'message': 'Access denied or session not found'})
+        return
+    
+    recording = None
+    try:
+        recording = finalize_session_recording(session_id, data.get('duration_seconds'))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error finalizing recording for session {session_id}: {str(e)}")
+    
     room_name = f"video_session_{session_id}"
     
     # Notify all participants that recording has stopped
@@ -522,6 +596,9 @@ def handle_stop_recording(data):
     }, room=room_name)
     
     logger.info(f"Recording stopped by {current_user.id} in session {session_id}")
+    if recording:
+        return {'duration_seconds': recording.duration_seconds, 'file_size': recording.file_size}
+    return {}
 
 @socketio.on('save_notes', namespace='/video-counseling')
 def handle_save_notes(data):
@@ -591,12 +668,21 @@ def handle_end_session(data):
                     session.notes += f"\n\nFinal notes: {final_notes}"
                 else:
                     session.notes = f"Final notes: {final_notes}"
-            
-            db.session.commit()
+        
+        # Persist the call quality history collected during the session
+        quality_aggregator.flush_session(session.id)
+        db.session.commit()
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error ending session: {str(e)}")
     
+    # Close a recording the counselor did not stop; its chunks are already on disk
+    try:
+        finalize_session_recording(session.id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error finalizing recording for session {session_id}: {str(e)}")
+    
     # Notify all participants
     emit('session_ended', {
         'session_id': session_id,
@@ -643,6 +729,13 @@ def handle_connection_quality(data):
     if not session_id or not quality_data:
         return
     
+    # Only aggregate samples from users who actually joined the session
+    if session_id in active_sessions and current_user.id in active_sessions[session_id]:
+        try:
+            quality_aggregator.add_sample(int(session_id), current_user.id, quality_data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring quality sample for invalid session id {session_id}")
+    
     room_name = f"video_session_{session_id}"
     
     # Forward quality data to other participants
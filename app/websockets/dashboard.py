@@ -35,6 +35,22 @@ def dashboard_disconnect():
         print(f"Dashboard disconnected: {current_user.email}")
         leave_room('dashboard_room', namespace='/dashboard')
 
+@socketio.on('watch_export', namespace='/dashboard')
+def handle_watch_export(data):
+    """Subscribe to progress events for a background export"""
+    from app.models import ExportJob
+
+    if not current_user.is_authenticated or current_user.role != 'super_admin':
+        return
+
+    export = ExportJob.query.get((data or {}).get('export_id'))
+    if not export:
+        return
+
+    join_room(f"export_{export.id}", namespace='/dashboard')
+    # The export may have finished before the client subscribed
+    emit('export_progress', export_progress_data(export, export.total_rows if export.status == 'completed' else 0), namespace='/dashboard')
+
 @socketio.on('request_dashboard_update', namespace='/dashboard')
 def handle_dashboard_update_request():
     """Handle request for fresh dashboard data"""
@@ -179,3 +195,21 @@ def broadcast_dashboard_update():
     """Broadcast full dashboard update to all connected clients"""
     dashboard_data = get_dashboard_stats()
     socketio.emit('dashboard_update', dashboard_data, room='dashboard_room', namespace='/dashboard')
+
+
+def export_progress_data(export, rows_written):
+    total = export.total_rows or 0
+    return {
+        'export_id': export.id,
+        'status': export.status,
+        'rows_written': rows_written,
+        'total_rows': total,
+        'percent': 100 if export.status == 'completed' else (int(rows_written * 100 / total) if total else 0),
+        'error': export.error,
+        'download_url': f"/admin/exports/{export.id}/download" if export.status == 'completed' else None,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def broadcast_export_progress(export, rows_written):
+    """Push background export progress to the clients watching it"""
+    socketio.emit('export_progress', export_progress_data(export, rows_written), room=f"export_{export.id}", namespace='/dashboard')
@@ -0,0 +1,252 @@
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+import atexit
+import logging
+import math
+
+from app.extensions import db
+from app.models import SessionParticipation, SessionQualitySummary
+
+logger = logging.getLogger(__name__)
+
+# Metrics reported by the clients in each connection_quality event
+METRICS = ('rtt', 'packet_loss', 'bitrate')
+
+# Samples kept per participant for percentile calculation (~1 hour at one sample every 5 seconds)
+WINDOW_SIZE = 720
+
+QUALITY_RANK = {'poor': 0, 'fair': 1, 'good': 2, 'excellent': 3}
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class _MetricStats:
+    """Running min/sum/count plus a bounded window for percentiles"""
+    __slots__ = ('count', 'total', 'minimum', 'window')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.window = deque(maxlen=WINDOW_SIZE)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        self.window.append(value)
+
+    def summary(self):
+        if not self.count:
+            return None, None, None
+        return self.minimum, self.total / self.count, _percentile(self.window, 95)
+
+
+class _ParticipantQuality:
+    """Quality samples collected for one user in one session"""
+
+    def __init__(self):
+        self.sample_count = 0
+        self.first_sample_at = None
+        self.last_sample_at = None
+        self.metrics = {name: _MetricStats() for name in METRICS}
+        self.levels = {}
+        # minute -> {'count': {metric: n}, 'sum': {metric: total}, 'level': last level}
+        self.minutes = {}
+
+    def add(self, sample, received_at):
+        self.sample_count += 1
+        if self.first_sample_at is None:
+            self.first_sample_at = received_at
+        self.last_sample_at = received_at
+
+        bucket = self.minutes.setdefault(
+            received_at.replace(second=0, microsecond=0),
+            {'count': {}, 'sum': {}, 'level': None}
+        )
+
+        for name in METRICS:
+            value = sample.get(name)
+            if value is None:
+                continue
+            self.metrics[name].add(value)
+            bucket['count'][name] = bucket['count'].get(name, 0) + 1
+            bucket['sum'][name] = bucket['sum'].get(name, 0.0) + value
+
+        level = sample.get('level')
+        if level:
+            self.levels[level] = self.levels.get(level, 0) + 1
+            bucket['level'] = level
+
+    def overall_quality(self):
+        """Most frequently reported level, ties resolved towards the worse level"""
+        if not self.levels:
+            return None
+        return max(self.levels, key=lambda level: (self.levels[level], -QUALITY_RANK.get(level, 0)))
+
+    def time_series(self):
+        series = []
+        for minute in sorted(self.minutes):
+            bucket = self.minutes[minute]
+            point = {'t': minute.isoformat()}
+            for name in METRICS:
+                if bucket['count'].get(name):
+                    point[name] = round(bucket['sum'][name] / bucket['count'][name], 4)
+            if bucket['level']:
+                point['level'] = bucket['level']
+            series.append(point)
+        return series
+
+
+class QualityAggregator:
+    """
+    Collects connection quality samples from the video counseling socket in memory
+    and writes a single summary row per participant when the session ends.
+    Samples live in the process whose socket received them, so each process also flushes
+    sessions that went quiet without being ended there (a closed tab, a crash, the other
+    participant ending the call on another server).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = Lock()
+        self.app = None
+        self._stop = Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Start this process's flush of sessions with no sample for QUALITY_IDLE_SECONDS"""
+        app.config.setdefault('QUALITY_IDLE_SECONDS', 600)
+        self.app = app
+        self.idle_seconds = app.config['QUALITY_IDLE_SECONDS']
+
+        self._thread = Thread(target=self._run, name='quality-idle-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self._stop.set)
+
+    def add_sample(self, session_id, user_id, quality_data, received_at=None):
+        """Record one quality report; returns False if the payload had nothing usable"""
+        sample = self._parse_sample(quality_data)
+        if not sample:
+            return False
+
+        received_at = received_at or datetime.utcnow()
+        with self._lock:
+            participants = self._sessions.setdefault(session_id, {})
+            participant = participants.get(user_id)
+            if participant is None:
+                participant = participants[user_id] = _ParticipantQuality()
+            participant.add(sample, received_at)
+        return True
+
+    def flush_session(self, session_id):
+        """
+        Persist the collected summaries for a session and drop them from memory.
+        The caller is responsible for committing the database session.
+        """
+        with self._lock:
+            participants = self._sessions.pop(session_id, None)
+
+        if not participants:
+            return []
+
+        summaries = []
+        for user_id, participant in participants.items():
+            rtt = participant.metrics['rtt'].summary()
+            packet_loss = participant.metrics['packet_loss'].summary()
+            bitrate = participant.metrics['bitrate'].summary()
+            overall_quality = participant.overall_quality()
+
+            summary = SessionQualitySummary(
+                session_id=session_id,
+                user_id=user_id,
+                sample_count=participant.sample_count,
+                first_sample_at=participant.first_sample_at,
+                last_sample_at=participant.last_sample_at,
+                rtt_min=rtt[0],
+                rtt_avg=rtt[1],
+                rtt_p95=rtt[2],
+                packet_loss_min=packet_loss[0],
+                packet_loss_avg=packet_loss[1],
+                packet_loss_p95=packet_loss[2],
+                bitrate_min=bitrate[0],
+                bitrate_avg=bitrate[1],
+                bitrate_p95=bitrate[2],
+                overall_quality=overall_quality,
+                time_series=participant.time_series()
+            )
+            db.session.add(summary)
+            summaries.append(summary)
+
+            # Keep the single-column quality on the participation record in sync
+            if overall_quality:
+                participation = SessionParticipation.query.filter_by(
+                    session_id=session_id,
+                    user_id=user_id
+                ).order_by(SessionParticipation.joined_at.desc()).first()
+                if participation:
+                    participation.connection_quality = overall_quality
+
+        logger.info(f"Flushed quality summaries for {len(summaries)} participant(s) in session {session_id}")
+        return summaries
+
+    def flush_idle(self, now=None):
+        """Persist and drop the sessions whose last sample is older than the idle timeout; commits"""
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=self.idle_seconds)
+        with self._lock:
+            idle = [
+                session_id for session_id, participants in self._sessions.items()
+                if max(participant.last_sample_at for participant in participants.values()) <= cutoff
+            ]
+
+        for session_id in idle:
+            self.flush_session(session_id)
+        if idle:
+            db.session.commit()
+        return idle
+
+    def _run(self):
+        while not self._stop.wait(min(60, self.idle_seconds)):
+            with self.app.app_context():
+                try:
+                    self.flush_idle()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error flushing idle quality samples: {str(e)}")
+
+    @staticmethod
+    def _parse_sample(quality_data):
+        if isinstance(quality_data, str):
+            return {'level': quality_data} if quality_data in QUALITY_RANK else None
+        if not isinstance(quality_data, dict):
+            return None
+
+        sample = {}
+        level = quality_data.get('level')
+        if isinstance(level, str) and level in QUALITY_RANK:
+            sample['level'] = level
+
+        for name in METRICS:
+            value = quality_data.get(name)
+            if isinstance(value, bool):
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if value >= 0:
+                sample[name] = value
+
+        return sample
+
+
+quality_aggregator = QualityAggregator()
@@ -89,6 +89,10 @@ class SocketManager {
             console.log('System log event:', data);
             this.triggerEvent('system_log', data);
         });
+
+        this.socket.on('export_progress', (data) => {
+            this.triggerEvent('export_progress', data);
+        });
     }
 
     handleReconnection() {
@@ -303,4 +307,101 @@ function getNotificationColor(type) {
 // Make notification function globally available
 window.showNotification = showNotification;
 
-console.log('Admin base JavaScript initialized');
\ No newline at end of file
+console.log('Admin base JavaScript initialized');
+
+// Background exports: links and forms marked with data-background-export are queued
+// through /admin/exports and downloaded once the export_progress event says they are done
+function startBackgroundExport(kind, formData) {
+    const csrfToken = document.querySelector('meta[name="csrf-token"]');
+    formData.set('kind', kind);
+
+    fetch('/admin/exports', {
+        method: 'POST',
+        body: formData,
+        headers: csrfToken ? { 'X-CSRFToken': csrfToken.getAttribute('content') } : {}
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                showNotification('Export failed', data.message || 'Could not start the export', 'error');
+                return;
+            }
+            if (data.status === 'completed') {
+                window.location = data.download_url;
+                return;
+            }
+            showNotification('Export started', 'Your file is being prepared. The download starts when it is ready.', 'info');
+            watchBackgroundExport(data);
+        })
+        .catch(error => {
+            console.error('Error starting export:', error);
+            showNotification('Export failed', 'Could not start the export', 'error');
+        });
+}
+
+function watchBackgroundExport(exportData) {
+    const exportId = exportData.export_id;
+    const socketConnected = window.socketManager && window.socketManager.isConnected;
+    let finished = false;
+    let poll = null;
+    let handler = null;
+
+    const finish = (status, error) => {
+        if (finished) return;
+        finished = true;
+        clearInterval(poll);
+        if (handler) window.socketManager.off('export_progress', handler);
+
+        if (status === 'completed') {
+            window.location = exportData.download_url;
+        } else {
+            showNotification('Export failed', error || 'The export could not be created', 'error');
+        }
+    };
+
+    if (socketConnected) {
+        handler = (data) => {
+            if (data.export_id === exportId && (data.status === 'completed' || data.status === 'failed')) {
+                finish(data.status, data.error);
+            }
+        };
+        window.socketManager.on('export_progress', handler);
+        window.socketManager.emit('watch_export', { export_id: exportId });
+    }
+
+    // Progress events only reach this page when the export runs in the web process,
+    // so keep polling as well; less often when the socket is up
+    poll = setInterval(() => {
+        fetch(exportData.status_url)
+            .then(response => response.json())
+            .then(data => {
+                const status = data.export && data.export.status;
+                if (status === 'completed' || status === 'failed') {
+                    finish(status, data.export.error);
+                }
+            })
+            .catch(() => clearInterval(poll));
+    }, socketConnected ? 10000 : 3000);
+}
+
+document.addEventListener('click', function(event) {
+    const link = event.target.closest('a[data-background-export]');
+    if (!link) return;
+    event.preventDefault();
+
+    const formData = new FormData();
+    new URL(link.href, window.location.origin).searchParams.forEach((value, key) => formData.set(key, value));
+    startBackgroundExport(link.dataset.backgroundExport, formData);
+});
+
+document.addEventListener('submit', function(event) {
+    const form = event.target.closest('form[data-background-export]');
+    if (!form) return;
+    event.preventDefault();
+
+    const formData = new FormData(form);
+    if (event.submitter && event.submitter.name) {
+        formData.set(event.submitter.name, event.submitter.value);
+    }
+    startBackgroundExport(form.dataset.backgroundExport, formData);
+});
@@ -15,6 +15,11 @@ class VideoCounselingClientOffice {
         this.isVideoEnabled = true;
         this.isScreenSharing = false;
         this.isRecording = false;
+        this.mediaRecorder = null;
+        this.recordingChunks = [];  // Recorded blobs not yet acknowledged by the server
+        this.recordingOffset = 0;   // Bytes the server has stored
+        this.recordingSender = null;
+        this.recordingStartedAt = null;
         this.isConnected = false;
         this.sessionTimer = null;
         this.startTime = null;
@@ -1143,27 +1148,153 @@ async handleIceCandidate(candidate) {
         }
     }
     
+    /**
+     * Record the call with MediaRecorder and stream each chunk to the server as it is produced,
+     * so the browser only holds chunks that are not yet acknowledged and the file is already
+     * on disk when the call ends.
+     */
     startRecording() {
         console.log('Starting session recording...');
         
+        if (typeof MediaRecorder === 'undefined') {
+            this.showError('Recording is not supported in this browser');
+            return;
+        }
+        
         this.socket.emit('start_recording', {
             session_id: this.sessionId
+        }, (response) => {
+            if (!response || typeof response.offset !== 'number') {
+                this.showError('Failed to start recording');
+                return;
+            }
+            
+            try {
+                this.mediaRecorder = new MediaRecorder(this.buildRecordingStream(), this.recordingOptions());
+            } catch (error) {
+                console.error('❌ Error creating recorder:', error);
+                this.showError('Failed to start recording');
+                return;
+            }
+            
+            this.recordingChunks = [];
+            this.recordingOffset = response.offset;
+            this.recordingStartedAt = Date.now();
+            this.mediaRecorder.ondataavailable = (event) => {
+                if (event.data && event.data.size > 0) {
+                    this.recordingChunks.push(event.data);
+                    this.sendRecordingChunks();
+                }
+            };
+            // Small timeslices keep each chunk well under the socket's message size limit
+            this.mediaRecorder.start(2000);
+            
+            this.isRecording = true;
+            this.updateRecordingButtons();
+            this.showNotification('Recording started', 'success');
         });
+    }
+    
+    buildRecordingStream() {
+        const videoSource = this.remoteStream || this.localStream;
+        const tracks = videoSource ? videoSource.getVideoTracks().slice(0, 1) : [];
         
-        this.isRecording = true;
-        this.updateRecordingButtons();
-        this.showNotification('Recording started', 'success');
+        // Mix both sides of the conversation into one audio track
+        const audioStreams = [this.localStream, this.remoteStream].filter(
+            (stream) => stream && stream.getAudioTracks().length > 0
+        );
+        if (audioStreams.length > 0 && window.AudioContext) {
+            this.recordingAudioContext = new AudioContext();
+            const destination = this.recordingAudioContext.createMediaStreamDestination();
+            audioStreams.forEach((stream) => {
+                this.recordingAudioContext.createMediaStreamSource(stream).connect(destination);
+            });
+            tracks.push(...destination.stream.getAudioTracks());
+        }
+        
+        return new MediaStream(tracks);
+    }
+    
+    recordingOptions() {
+        const mimeType = ['video/webm;codecs=vp8,opus', 'video/webm'].find(
+            (type) => MediaRecorder.isTypeSupported(type)
+        );
+        const options = { videoBitsPerSecond: 1000000, audioBitsPerSecond: 64000 };
+        if (mimeType) options.mimeType = mimeType;
+        return options;
+    }
+    
+    sendRecordingChunks() {
+        if (this.recordingSender) return this.recordingSender;
+        
+        // Chunks are sent one at a time in order; each must land at the offset the server acknowledged
+        this.recordingSender = (async () => {
+            while (this.recordingChunks.length > 0) {
+                const blob = this.recordingChunks[0];
+                const chunk = await blob.arrayBuffer();
+                let response;
+                try {
+                    response = await this.socket.timeout(15000).emitWithAck('recording_chunk', {
+                        session_id: this.sessionId,
+                        offset: this.recordingOffset,
+                        chunk: chunk
+                    });
+                } catch (error) {
+                    // No ack (disconnected); keep the chunk and retry once the socket is back
+                    await new Promise((resolve) => setTimeout(resolve, 2000));
+                    continue;
+                }
+                
+                if (response && !response.error) {
+                    this.recordingOffset = response.offset;
+                    this.recordingChunks.shift();
+                } else if (response && typeof response.offset === 'number' &&
+                           response.offset === this.recordingOffset + blob.size) {
+                    // Stored before the ack was lost
+                    this.recordingOffset = response.offset;
+                    this.recordingChunks.shift();
+                } else {
+                    console.error('❌ Recording chunk rejected:', response && response.error);
+                    this.recordingChunks = [];
+                    this.showError('Recording was interrupted');
+                }
+            }
+            this.recordingSender = null;
+        })();
+        return this.recordingSender;
     }
     
-    stopRecording() {
+    async stopRecording() {
         console.log('Stopping session recording...');
         
+        this.isRecording = false;
+        this.updateRecordingButtons();
+        
+        if (this.mediaRecorder && this.mediaRecorder.state !== 'inactive') {
+            // The recorder emits its last chunk before 'stop'
+            await new Promise((resolve) => {
+                this.mediaRecorder.addEventListener('stop', resolve, { once: true });
+                this.mediaRecorder.stop();
+            });
+        }
+        this.mediaRecorder = null;
+        if (this.recordingAudioContext) {
+            this.recordingAudioContext.close();
+            this.recordingAudioContext = null;
+        }
+        
+        await this.sendRecordingChunks();
+        
+        const durationSeconds = this.recordingStartedAt
+            ? Math.round((Date.now() - this.recordingStartedAt) / 1000)
+            : null;
+        this.recordingStartedAt = null;
+        
         this.socket.emit('stop_recording', {
-            session_id: this.sessionId
+            session_id: this.sessionId,
+            duration_seconds: durationSeconds
         });
         
-        this.isRecording = false;
-        this.updateRecordingButtons();
         this.showNotification('Recording stopped', 'info');
     }
     
@@ -1537,13 +1668,18 @@ async handleIceCandidate(candidate) {
         }
     }
     
-    endSession() {
+    async endSession() {
         console.log('Ending session...');
         
         // Get final notes
         const finalNotesTextarea = document.getElementById('finalNotes');
         const finalNotes = finalNotesTextarea ? finalNotesTextarea.value : this.sessionNotes;
         
+        // Flush the last recorded chunks before the server closes the session
+        if (this.isRecording) {
+            await this.stopRecording();
+        }
+        
         this.socket.emit('end_session', {
             session_id: this.sessionId,
             final_notes: finalNotes
@@ -2329,16 +2465,19 @@ async handleIceCandidate(candidate) {
             try {
                 const stats = await this.peerConnection.getStats();
                 let inboundRtp = null;
+                let candidatePair = null;
                 
                 stats.forEach(report => {
                     if (report.type === 'inbound-rtp' && report.kind === 'video') {
                         inboundRtp = report;
+                    } else if (report.type === 'candidate-pair' && report.nominated && report.state === 'succeeded') {
+                        candidatePair = report;
                     }
                 });
                 
                 if (inboundRtp) {
                     const quality = this.calculateConnectionQuality(inboundRtp);
-                    this.updateConnectionQuality(quality);
+                    this.updateConnectionQuality(quality, this.collectQualityMetrics(inboundRtp, candidatePair));
                 }
                 
             } catch (error) {
@@ -2361,7 +2500,33 @@ async handleIceCandidate(candidate) {
         }
     }
     
-    updateConnectionQuality(quality) {
+    collectQualityMetrics(inboundRtp, candidatePair) {
+        // Raw samples for the server-side quality aggregator
+        const received = inboundRtp.packetsReceived || 0;
+        const lost = inboundRtp.packetsLost || 0;
+        const metrics = {
+            packet_loss: received + lost > 0 ? lost / (received + lost) : 0
+        };
+        
+        if (candidatePair && candidatePair.currentRoundTripTime !== undefined) {
+            metrics.rtt = Math.round(candidatePair.currentRoundTripTime * 1000);
+        }
+        
+        // Bitrate is derived from the byte counter delta since the last sample
+        if (this.lastInboundRtp && inboundRtp.timestamp > this.lastInboundRtp.timestamp) {
+            const bytes = inboundRtp.bytesReceived - this.lastInboundRtp.bytesReceived;
+            const seconds = (inboundRtp.timestamp - this.lastInboundRtp.timestamp) / 1000;
+            metrics.bitrate = Math.round((bytes * 8) / seconds / 1000);
+        }
+        this.lastInboundRtp = {
+            bytesReceived: inboundRtp.bytesReceived,
+            timestamp: inboundRtp.timestamp
+        };
+        
+        return metrics;
+    }
+    
+    updateConnectionQuality(quality, metrics = {}) {
         this.connectionQuality = quality;
         
         // Emit quality data to other participants
@@ -2370,7 +2535,8 @@ async handleIceCandidate(candidate) {
                 session_id: this.sessionId,
                 quality: {
                     level: quality,
-                    timestamp: Date.now()
+                    timestamp: Date.now(),
+                    ...metrics
                 }
             });
         }
@@ -0,0 +1,96 @@
+/**
+ * Chunked, resumable attachment uploads.
+ *
+ *   POST /uploads                    {filename, size, content_type} -> {upload_id, chunk_size, offset}
+ *   PUT  /uploads/<id>?offset=N      raw chunk bytes                -> {offset}
+ *   POST /uploads/<id>/finalize                                     -> {sha256, status: 'complete'}
+ *
+ * A failed chunk is retried from the offset the server reports, so a dropped connection only
+ * costs the chunk in flight. The resulting upload ids are submitted with the form as `upload_ids`.
+ */
+window.ChunkedUpload = (function () {
+  const MAX_RETRIES = 5;
+
+  function sleep(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+  }
+
+  async function request(method, url, csrfToken, body, contentType) {
+    const headers = { 'X-CSRFToken': csrfToken };
+    if (contentType) headers['Content-Type'] = contentType;
+    const response = await fetch(url, { method, headers, body, credentials: 'same-origin' });
+    const data = await response.json().catch(() => ({}));
+    return { ok: response.ok, status: response.status, data };
+  }
+
+  async function upload(file, options = {}) {
+    const csrfToken = options.csrfToken || '';
+    const onProgress = options.onProgress || function () {};
+
+    const started = await request('POST', '/uploads', csrfToken, JSON.stringify({
+      filename: file.name,
+      size: file.size,
+      content_type: file.type || null
+    }), 'application/json');
+    if (!started.ok) throw new Error(started.data.message || 'Could not start the upload');
+
+    const uploadUrl = started.data.upload_url;
+    const chunkSize = started.data.chunk_size;
+    let offset = started.data.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+      const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+      let result;
+      try {
+        result = await request('PUT', `${uploadUrl}?offset=${offset}`, csrfToken, chunk, 'application/octet-stream');
+      } catch (error) {
+        result = { ok: false, status: 0, data: {} };
+      }
+
+      if (result.ok) {
+        offset = result.data.offset;
+        retries = 0;
+        onProgress(offset, file.size);
+        continue;
+      }
+
+      // 409 carries the server's offset; other failures are retried after asking for it
+      if (result.status !== 409 && result.status !== 0 && result.status < 500) {
+        throw new Error(result.data.message || 'Upload failed');
+      }
+      if (++retries > MAX_RETRIES) throw new Error('Upload failed after several retries');
+      await sleep(1000 * 2 ** (retries - 1));
+
+      if (result.status === 409 && typeof result.data.offset === 'number') {
+        offset = result.data.offset;
+      } else {
+        const status = await request('GET', uploadUrl, csrfToken).catch(() => null);
+        if (status && status.ok) offset = status.data.offset;
+      }
+    }
+
+    const finished = await request('POST', started.data.finalize_url, csrfToken, '{}', 'application/json');
+    if (!finished.ok) throw new Error(finished.data.message || 'Could not finish the upload');
+    return finished.data;
+  }
+
+  /**
+   * Upload every file of `fileInput` in chunks, add hidden `upload_ids` inputs to `form`
+   * and clear the input so the files are not posted a second time.
+   */
+  async function uploadInputFiles(form, fileInput, options = {}) {
+    const files = Array.from(fileInput.files || []);
+    for (const file of files) {
+      const result = await upload(file, options);
+      const hidden = document.createElement('input');
+      hidden.type = 'hidden';
+      hidden.name = 'upload_ids';
+      hidden.value = result.upload_id;
+      form.appendChild(hidden);
+    }
+    fileInput.value = '';
+  }
+
+  return { upload, uploadInputFiles };
+})();
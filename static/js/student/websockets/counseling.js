@@ -1763,16 +1763,19 @@ class VideoCounselingClient {
             try {
                 const stats = await this.peerConnection.getStats();
                 let inboundRtp = null;
+                let candidatePair = null;
                 
                 stats.forEach(report => {
                     if (report.type === 'inbound-rtp' && report.kind === 'video') {
                         inboundRtp = report;
+                    } else if (report.type === 'candidate-pair' && report.nominated && report.state === 'succeeded') {
+                        candidatePair = report;
                     }
                 });
                 
                 if (inboundRtp) {
                     const quality = this.calculateConnectionQuality(inboundRtp);
-                    this.updateConnectionQuality(quality);
+                    this.updateConnectionQuality(quality, this.collectQualityMetrics(inboundRtp, candidatePair));
                 }
                 
             } catch (error) {
@@ -1795,7 +1798,33 @@ class VideoCounselingClient {
         }
     }
     
-    updateConnectionQuality(quality) {
+    collectQualityMetrics(inboundRtp, candidatePair) {
+        // Raw samples for the server-side quality aggregator
+        const received = inboundRtp.packetsReceived || 0;
+        const lost = inboundRtp.packetsLost || 0;
+        const metrics = {
+            packet_loss: received + lost > 0 ? lost / (received + lost) : 0
+        };
+        
+        if (candidatePair && candidatePair.currentRoundTripTime !== undefined) {
+            metrics.rtt = Math.round(candidatePair.currentRoundTripTime * 1000);
+        }
+        
+        // Bitrate is derived from the byte counter delta since the last sample
+        if (this.lastInboundRtp && inboundRtp.timestamp > this.lastInboundRtp.timestamp) {
+            const bytes = inboundRtp.bytesReceived - this.lastInboundRtp.bytesReceived;
+            const seconds = (inboundRtp.timestamp - this.lastInboundRtp.timestamp) / 1000;
+            metrics.bitrate = Math.round((bytes * 8) / seconds / 1000);
+        }
+        this.lastInboundRtp = {
+            bytesReceived: inboundRtp.bytesReceived,
+            timestamp: inboundRtp.timestamp
+        };
+        
+        return metrics;
+    }
+    
+    updateConnectionQuality(quality, metrics = {}) {
         this.connectionQuality = quality;
         
         // Emit quality data to other participants
@@ -1804,7 +1833,8 @@ class VideoCounselingClient {
                 session_id: this.sessionId,
                 quality: {
                     level: quality,
-                    timestamp: Date.now()
+                    timestamp: Date.now(),
+                    ...metrics
                 }
             });
         }
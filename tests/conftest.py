@@ -0,0 +1,3 @@
+# The app package monkey-patches the standard library with eventlet when it is imported, which
+# has to happen before boto3 or moto import ssl and socket
+import app  # noqa: F401
@@ -0,0 +1,147 @@
+"""
+The S3 storage backend against moto's in-process S3 stand-in.
+
+    pip install pytest "moto[s3]"
+    python -m pytest tests/test_storage_s3.py
+
+Skipped when boto3 or moto is not installed.
+"""
+import io
+import os
+
+import pytest
+from flask import Flask
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from app.images import IMAGE_FORMATS, IMAGE_VARIANTS, build_variants, delete_variants
+from app.storage import S3Storage, get_storage, incoming_folder, init_storage, store_upload
+
+BUCKET = 'kapiyu-test'
+PREFIX = 'media/'
+
+
+@pytest.fixture
+def app(tmp_path):
+    with moto.mock_aws():
+        app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+        app.config.update(
+            STORAGE_BACKEND='s3',
+            STORAGE_S3_BUCKET=BUCKET,
+            STORAGE_S3_PREFIX=PREFIX,
+            STORAGE_S3_REGION='us-east-1',
+            STORAGE_S3_ACCESS_KEY='test',
+            STORAGE_S3_SECRET_KEY='test'
+        )
+        init_storage(app)
+        with app.app_context():
+            get_storage().client.create_bucket(Bucket=BUCKET)
+            yield app
+
+
+@pytest.fixture
+def storage(app):
+    return get_storage()
+
+
+def stored_keys(storage):
+    return sorted(item['Key'] for item in storage.client.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def test_backend_is_s3(storage):
+    assert isinstance(storage, S3Storage)
+
+
+def test_put_bytes_round_trip(storage):
+    storage.put_bytes('uploads/announcements/a.png', b'abc')
+
+    assert stored_keys(storage) == ['media/uploads/announcements/a.png']
+    assert storage.exists('uploads/announcements/a.png')
+    assert storage.size('uploads/announcements/a.png') == 3
+    head = storage.client.head_object(Bucket=BUCKET, Key='media/uploads/announcements/a.png')
+    assert head['ContentType'] == 'image/png'
+
+    storage.delete('uploads/announcements/a.png')
+    assert not storage.exists('uploads/announcements/a.png')
+
+
+def test_size_of_missing_file(storage):
+    with pytest.raises(FileNotFoundError):
+        storage.size('uploads/attachments/missing.pdf')
+
+
+def test_put_file_moves_the_local_file(storage, tmp_path):
+    local = tmp_path / 'upload.part'
+    local.write_bytes(b'x' * 1000)
+
+    storage.put_file(str(local), 'uploads/recordings/session_1.webm')
+
+    assert not local.exists()
+    assert storage.size('uploads/recordings/session_1.webm') == 1000
+
+
+def test_list_strips_the_prefix(storage):
+    storage.put_bytes('uploads/attachments/ab/one.pdf', b'1')
+    storage.put_bytes('uploads/attachments/cd/two.pdf', b'22')
+    storage.put_bytes('uploads/recordings/three.webm', b'333')
+
+    listed = {path: size for path, size, _ in storage.list('uploads/attachments/')}
+    assert listed == {'uploads/attachments/ab/one.pdf': 1, 'uploads/attachments/cd/two.pdf': 2}
+
+
+def test_local_copy_is_removed_afterwards(storage):
+    storage.put_bytes('uploads/attachments/ab/file.pdf', b'content')
+
+    with storage.local_copy('uploads/attachments/ab/file.pdf') as path:
+        with open(path, 'rb') as f:
+            assert f.read() == b'content'
+    assert not os.path.exists(path)
+
+
+def test_url_is_presigned(storage):
+    url = storage.url('uploads/attachments/ab/file.pdf', 300)
+
+    assert url.split('?')[0] == f"https://{BUCKET}.s3.amazonaws.com/media/uploads/attachments/ab/file.pdf"
+    assert 'X-Amz-Signature=' in url
+    assert 'X-Amz-Expires=300' in url
+
+
+def test_custom_endpoint_uses_path_style_urls(app):
+    # MinIO and most self-hosted stores only serve http://host/bucket/key
+    storage = S3Storage(BUCKET, prefix=PREFIX, endpoint_url='http://minio:9000', region='us-east-1',
+                        access_key='test', secret_key='test')
+
+    url = storage.url('uploads/attachments/ab/file.pdf', 300)
+
+    assert url.split('?')[0] == f"http://minio:9000/{BUCKET}/media/uploads/attachments/ab/file.pdf"
+
+
+def test_store_upload_is_content_addressed(app, storage):
+    first = store_upload(FileStorage(io.BytesIO(b'handout' * 1000), filename='a.PDF'), 'attachments')
+    second = store_upload(FileStorage(io.BytesIO(b'handout' * 1000), filename='b.pdf'), 'attachments')
+
+    assert first.created and not second.created
+    assert first.path == second.path == f"uploads/attachments/{first.sha256[:2]}/{first.sha256}.pdf"
+    assert stored_keys(storage) == [f"media/{first.path}"]
+    assert storage.size(first.path) == first.size == 7000
+    # Nothing is left behind in the local scratch folder
+    assert os.listdir(incoming_folder('attachments')) == []
+
+
+def test_image_variants(storage):
+    image = io.BytesIO()
+    Image.new('RGB', (1200, 800), 'teal').save(image, 'PNG')
+    storage.put_bytes('uploads/announcements/ab/source.png', image.getvalue())
+
+    variants = build_variants('uploads/announcements/ab/source.png')
+
+    assert set(variants) == {name for name, _ in IMAGE_VARIANTS}
+    for name, _ in IMAGE_VARIANTS:
+        for extension, _, _ in IMAGE_FORMATS:
+            assert storage.exists(variants[name][extension])
+
+    delete_variants('uploads/announcements/ab/source.png')
+    assert stored_keys(storage) == ['media/uploads/announcements/ab/source.png']